@@ -1,17 +1,24 @@
-from typing import Annotated
+from typing import Annotated, cast
 
-from fastapi import APIRouter, Depends, Path, Query
+from fastapi import APIRouter, Depends, Path, Query, Request
+from fastapi.responses import StreamingResponse
 
 from api.middlewares import get_current_user
+from lib.fastapi_ import decode_rows, stream_batches
 from lib.pydantic_ import FieldsQuery
+from lib.types_ import BulkCreateResult, ExportFormat, SignedUpload
 from models.cruds import CrudsPlace, PlaceOptions
 from models.schemas import (
+    ImageFinalizeForm,
+    ImageUploadForm,
     PlaceMultipartPost,
     PlacePutSchema,
     PlaceReadSchema,
     PlaceSearchSchema,
     PlaceSelectableFields,
+    PlaceSemanticSchema,
     PlacesPaginatedSchema,
+    PlacesSemanticPaginatedSchema,
     UserReadSchema,
 )
 
@@ -25,6 +32,12 @@ place_id_param = Path(
     description="The ID of the place",
 )
 
+export_format_param = Path(
+    ...,
+    examples=["ndjson"],
+    description="The export format: ndjson, csv or arrow",
+)
+
 
 @place_router.get(
     "/",
@@ -53,6 +66,42 @@ async def get_places_from_post(
     return await cruds.paginate(query.to_search())
 
 
+@place_router.get(
+    "/semantic",
+    summary="Places closest in meaning to a text, most similar first",
+    response_model=PlacesSemanticPaginatedSchema,
+)
+async def get_places_semantic(
+    query: Annotated[PlaceSemanticSchema, Query()],
+    cruds: CrudsPlace = Depends(get_cruds_place),
+    user: UserReadSchema = Depends(get_current_user),
+):
+    options = PlaceOptions(process=True, fields=None)
+    return await cruds.user_semantic_search(
+        user, query.q, query.to_search(), options
+    )
+
+
+@place_router.get(
+    "/export/{export_format}",
+    summary="Export all places matching the filters",
+    response_class=StreamingResponse,
+)
+async def export_places(
+    query: Annotated[PlaceSearchSchema, Query()],
+    export_format: ExportFormat = export_format_param,
+    cruds: CrudsPlace = Depends(get_cruds_place),
+    user: UserReadSchema = Depends(get_current_user),
+):
+    options = PlaceOptions(process=True, fields=None)
+    search = query.to_search()
+    fields = cast(list[str], search.select or cruds.default_select)
+    batches = cruds.user_stream_partial(user, search, options)
+    return stream_batches(
+        batches, export_format, "places", cruds.read_schema, fields
+    )
+
+
 @place_router.post(
     "/", summary="Place creation", response_model=PlaceReadSchema
 )
@@ -65,6 +114,19 @@ async def create_place(
     return await cruds.user_post(user, multipart_form.to_post_schema(), options)
 
 
+@place_router.post(
+    "/bulk",
+    summary="Bulk place creation from a json array or ndjson body",
+    response_model=BulkCreateResult,
+)
+async def create_places_bulk(
+    request: Request,
+    cruds: CrudsPlace = Depends(get_cruds_place),
+    user: UserReadSchema = Depends(get_current_user),
+):
+    return await cruds.user_post_stream(user, decode_rows(request))
+
+
 @place_router.get(
     "/{place_id}",
     summary="Search and Retrieve place by id",
@@ -93,6 +155,37 @@ async def update_place(
     return await cruds.user_put(current_user, place_id, form, options)
 
 
+@place_router.post(
+    "/{place_id}/image/upload-url",
+    summary="Upload url to send the place image straight to the bucket",
+    response_model=SignedUpload,
+)
+async def get_place_image_upload_url(
+    form: ImageUploadForm,
+    place_id: str = place_id_param,
+    cruds: CrudsPlace = Depends(get_cruds_place),
+    current_user: UserReadSchema = Depends(get_current_user),
+):
+    return await cruds.user_image_upload(current_user, place_id, form)
+
+
+@place_router.post(
+    "/{place_id}/image",
+    summary="Attach the uploaded image to the place",
+    response_model=PlaceReadSchema,
+)
+async def finalize_place_image(
+    form: ImageFinalizeForm,
+    place_id: str = place_id_param,
+    cruds: CrudsPlace = Depends(get_cruds_place),
+    current_user: UserReadSchema = Depends(get_current_user),
+):
+    options = PlaceOptions(fields=None, process=True)
+    return await cruds.user_image_finalize(
+        current_user, place_id, form, options
+    )
+
+
 @place_router.delete(
     "/{place_id}",
     summary="Delete place by id",
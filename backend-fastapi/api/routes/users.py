@@ -1,11 +1,16 @@
-from typing import Annotated
+from typing import Annotated, cast
 
 from fastapi import APIRouter, Depends, Path, Query
+from fastapi.responses import StreamingResponse
 
 from api.middlewares import get_current_admin, get_current_user
+from lib.fastapi_ import stream_batches
 from lib.pydantic_ import FieldsQuery
-from models.cruds import CrudsUser, UserOptions
+from lib.types_ import ExportFormat, SignedUpload
+from models.cruds import CrudsUser, UserOptions, user_cache
 from models.schemas import (
+    ImageFinalizeForm,
+    ImageUploadForm,
     UserMultipartPost,
     UserPutSchema,
     UserReadSchema,
@@ -22,6 +27,12 @@ user_id_param = Path(
     ..., examples=["507f1f77bcf86cd799439011"], description="The ID of the user"
 )
 
+export_format_param = Path(
+    ...,
+    examples=["ndjson"],
+    description="The export format: ndjson, csv or arrow",
+)
+
 
 @user_router.get(
     "/", summary="Search and Filter users", response_model=UsersPaginatedSchema
@@ -48,6 +59,26 @@ async def get_users_from_post(
     return await cruds.paginate(query.to_search())
 
 
+@user_router.get(
+    "/export/{export_format}",
+    summary="Export all users matching the filters",
+    response_class=StreamingResponse,
+)
+async def export_users(
+    query: Annotated[UserSearchSchema, Query()],
+    export_format: ExportFormat = export_format_param,
+    cruds: CrudsUser = Depends(get_cruds_user),
+    user: UserReadSchema = Depends(get_current_user),
+):
+    options = UserOptions(process=True, fields=None)
+    search = query.to_search()
+    fields = cast(list[str], search.select or cruds.default_select)
+    batches = cruds.user_stream_partial(user, search, options)
+    return stream_batches(
+        batches, export_format, "users", cruds.read_schema, fields
+    )
+
+
 @user_router.post("/", summary="User creation", response_model=UserReadSchema)
 async def create_user(
     cruds: CrudsUser = Depends(get_cruds_user),
@@ -60,6 +91,26 @@ async def create_user(
     )
 
 
+@user_router.get(
+    "/cache-stats",
+    summary="Hits and misses of the authenticated users cache",
+    responses={
+        200: {
+            "content": {
+                "application/json": {
+                    "example": {"hits": 120, "misses": 3, "size": 3}
+                }
+            },
+        }
+    },
+)
+async def get_user_cache_stats(
+    _: UserReadSchema = Depends(get_current_admin),
+):
+    """The counters of the process serving the request"""
+    return user_cache.stats()
+
+
 @user_router.get(
     "/{user_id}",
     summary="Search and Retrieve user by id",
@@ -88,6 +139,35 @@ async def update_user(
     return await cruds.user_put(current_user, user_id, form, options=options)
 
 
+@user_router.post(
+    "/{user_id}/image/upload-url",
+    summary="Upload url to send the user image straight to the bucket",
+    response_model=SignedUpload,
+)
+async def get_user_image_upload_url(
+    form: ImageUploadForm,
+    user_id: str = user_id_param,
+    current_user: UserReadSchema = Depends(get_current_user),
+    cruds: CrudsUser = Depends(get_cruds_user),
+):
+    return await cruds.user_image_upload(current_user, user_id, form)
+
+
+@user_router.post(
+    "/{user_id}/image",
+    summary="Attach the uploaded image to the user",
+    response_model=UserReadSchema,
+)
+async def finalize_user_image(
+    form: ImageFinalizeForm,
+    user_id: str = user_id_param,
+    current_user: UserReadSchema = Depends(get_current_user),
+    cruds: CrudsUser = Depends(get_cruds_user),
+):
+    options = UserOptions(process=True, fields=None)
+    return await cruds.user_image_finalize(current_user, user_id, form, options)
+
+
 @user_router.delete(
     "/{user_id}",
     summary="Delete user by id",
@@ -2,3 +2,5 @@ from config import settings
 
 MAX_AGE = 7 * 24 * 60 * 60 * 1000
 BROKER_URL = settings.redis_url
+# Threads of each worker process, passed to dramatiq --threads (Procfile)
+WORKER_THREADS = 8
@@ -7,9 +7,39 @@ class PlaceEmbbeddingData(TypedDict):
     place_id: int
 
 
+TASK_PLACES_EMBEDDING = "places_embedding"
+
+
+class PlacesEmbbeddingData(TypedDict):
+    place_ids: list[int]
+
+
 TASK_NEWSLETTER = "newsletter"
 
 
 class NewsletterData(TypedDict):
     name: str
     email: str
+
+
+TASK_DELETE_FILES = "delete_files"
+
+
+class DeleteFilesData(TypedDict):
+    filenames: list[str]
+
+
+TASK_SWEEP_FILES = "sweep_files"
+
+
+class SweepFilesData(TypedDict):
+    start_offset: str
+
+
+TASK_IMAGE_VARIANTS = "image_variants"
+
+
+class ImageVariantsData(TypedDict):
+    table: str
+    id: int
+    image_url: str
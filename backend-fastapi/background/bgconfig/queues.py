@@ -4,3 +4,5 @@ from lib.utils import StrEnum
 class Queues(StrEnum):
     EMAILS = "emails"
     AI = "ai"
+    STORAGE = "storage"
+    IMAGES = "images"
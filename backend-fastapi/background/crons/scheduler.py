@@ -1,8 +1,9 @@
 from background.crons.emails import newsletter_cron
+from background.crons.storage import sweep_files_cron
 from background.publishers import publisher
 from lib.clients import ScheduledTask, TaskScheduler
 
-CRONS: list[ScheduledTask] = [newsletter_cron]
+CRONS: list[ScheduledTask] = [newsletter_cron, sweep_files_cron]
 scheduler = TaskScheduler(CRONS)
 
 
@@ -0,0 +1,4 @@
+from background.publishers import sweep_files
+from lib.clients import ScheduledTask
+
+sweep_files_cron = ScheduledTask(sweep_files, "0 3 * * *")
@@ -1,13 +1,111 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from http import HTTPStatus
 import logging
 
-from background.bgconfig import PlaceEmbbeddingData
+from background.bgconfig import (
+    WORKER_THREADS,
+    PlaceEmbbeddingData,
+    PlacesEmbbeddingData,
+)
+from config import settings
+from lib.types_ import ApiError
 from models.cruds import CrudsPlace
 from services.instances import pg_client
 
+type EmbedMany = Callable[[list[int]], Awaitable[dict[int, list[float]]]]
+
+
+async def embed_places(place_ids: list[int]) -> dict[int, list[float]]:
+    async with pg_client.session() as session:
+        return await CrudsPlace(session).embed_many(place_ids)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce the place embeddings requested within a short window
+    The async actors of all the worker threads share one event loop,
+    the pending places are embedded with one inference call and one update
+    Each thread waits for its place, so there are at most as many pending
+    places as worker threads: max_size above that never flushes early
+    """
+
+    def __init__(self, embed: EmbedMany, max_size: int, window: float) -> None:
+        self.embed = embed
+        self.max_size = max_size
+        self.window = window
+        self._pending: dict[int, asyncio.Future[list[float]]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+
+    async def submit(self, place_id: int) -> list[float]:
+        future = self._pending.get(place_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[place_id] = future
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, {}
+        if batch:
+            # Keeping a reference, the loop only holds weak ones
+            task = asyncio.create_task(self._embed(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _embed(
+        self, batch: dict[int, asyncio.Future[list[float]]]
+    ) -> None:
+        try:
+            embeddings = await self.embed(list(batch))
+        except Exception as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+            return
+
+        for place_id, future in batch.items():
+            if future.done():
+                continue
+            if place_id in embeddings:
+                future.set_result(embeddings[place_id])
+            else:
+                future.set_exception(
+                    ApiError(
+                        HTTPStatus.NOT_FOUND,
+                        f"No place with id {place_id} found in the database",
+                    )
+                )
+
+
+embedding_batcher = EmbeddingBatcher(
+    embed_places,
+    min(settings.EMBEDDING_BATCH_SIZE, WORKER_THREADS),
+    settings.EMBEDDING_BATCH_WINDOW,
+)
+
 
 async def place_embedding_task(payload: PlaceEmbbeddingData):
+    result = await embedding_batcher.submit(payload["place_id"])
+    logging.info(result)
+
+
+async def places_embedding_task(payload: PlacesEmbbeddingData):
+    place_ids = payload["place_ids"]
     async with pg_client.session() as session:
         cruds = CrudsPlace(session)
-        place_id = payload["place_id"]
-        result = await cruds.embed(place_id)
-        logging.info(result)
+        for i in range(0, len(place_ids), settings.EMBEDDING_BATCH_SIZE):
+            chunk = place_ids[i : i + settings.EMBEDDING_BATCH_SIZE]
+            embeddings = await cruds.embed_many(chunk)
+            logging.info(f"Embedded {len(embeddings)} places")
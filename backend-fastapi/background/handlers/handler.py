@@ -3,24 +3,48 @@ import asyncio
 from background.bgconfig import (
     BROKER_URL,
     MAX_AGE,
+    TASK_DELETE_FILES,
+    TASK_IMAGE_VARIANTS,
     TASK_NEWSLETTER,
     TASK_PLACE_EMBEDDING,
+    TASK_PLACES_EMBEDDING,
+    TASK_SWEEP_FILES,
     Queues,
 )
-from background.handlers.ai import place_embedding_task
+from background.handlers.ai import (
+    place_embedding_task,
+    places_embedding_task,
+)
 from background.handlers.email import send_newsletter_task
+from background.handlers.images import image_variants_task
+from background.handlers.storage import delete_files_task, sweep_files_task
 from config import settings
 from lib.clients import TaskConfig, TaskHandler
-from services.instances import pg_client, redis_client
+from services.instances import (
+    cloud_storage,
+    embedder,
+    pg_client,
+    redis_client,
+)
 
 TASKS: list[TaskConfig] = [
     TaskConfig(TASK_NEWSLETTER, Queues.EMAILS, send_newsletter_task),
     TaskConfig(TASK_PLACE_EMBEDDING, Queues.AI, place_embedding_task),
+    TaskConfig(TASK_PLACES_EMBEDDING, Queues.AI, places_embedding_task),
+    TaskConfig(TASK_DELETE_FILES, Queues.STORAGE, delete_files_task),
+    TaskConfig(TASK_SWEEP_FILES, Queues.STORAGE, sweep_files_task),
+    TaskConfig(TASK_IMAGE_VARIANTS, Queues.IMAGES, image_variants_task),
 ]
 
 
 async def connect_dbs() -> None:
-    await asyncio.gather(pg_client.connect(), redis_client.connect())
+    # The embedding model is loaded once per worker process
+    await asyncio.gather(
+        pg_client.connect(),
+        redis_client.connect(),
+        cloud_storage.connect(),
+        embedder.connect(),
+    )
 
 
 handler = TaskHandler(BROKER_URL, TASKS, connect_dbs, MAX_AGE, settings.is_test)
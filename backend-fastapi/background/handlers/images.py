@@ -0,0 +1,54 @@
+import asyncio
+import logging
+
+from google.api_core.exceptions import NotFound
+
+from background.bgconfig import ImageVariantsData
+from background.publishers import delete_files
+from config import settings
+from lib.types_ import FileToUpload
+from lib.utils import IMAGE_MIMETYPES, resize_image
+from models.cruds import CrudsPlace, CrudsUser
+from models.orm import Tables
+from services.instances import cloud_storage, pg_client
+
+CRUDS: dict[Tables, type[CrudsPlace] | type[CrudsUser]] = {
+    Tables.PLACES: CrudsPlace,
+    Tables.USERS: CrudsUser,
+}
+
+
+async def image_variants_task(payload: ImageVariantsData):
+    """
+    Store a resized copy of the image for each configured variant
+    The variants are only attached if the record still uses the image
+    """
+    image_url = payload["image_url"]
+    try:
+        buffer = await asyncio.to_thread(cloud_storage.download_file, image_url)
+    except NotFound:
+        logging.warning(f"Image {image_url} not found, no variants generated")
+        return
+
+    format_ = settings.IMAGE_VARIANT_FORMAT
+    variants: dict[str, str] = {}
+    for variant, max_size in settings.IMAGE_VARIANTS.items():
+        # Decoding and encoding the image is CPU bound
+        content = await asyncio.to_thread(
+            resize_image, buffer, max_size, format_
+        )
+        filename = cloud_storage.variant_filename(image_url, variant, format_)
+        file = FileToUpload(filename, IMAGE_MIMETYPES[format_], buffer=content)
+        await cloud_storage.backend.upload(filename, file)
+        variants[variant] = filename
+
+    async with pg_client.session() as session:
+        cruds = CRUDS[Tables(payload["table"])](session)
+        attached = await cruds.set_image_variants(
+            payload["id"], image_url, variants
+        )
+
+    if not attached:
+        # The image was replaced or the record deleted meanwhile
+        delete_files(list(variants.values()))
+    logging.info(f"Generated {len(variants)} variants of {image_url}")
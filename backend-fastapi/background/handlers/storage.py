@@ -0,0 +1,53 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+import logging
+
+from background.bgconfig import DeleteFilesData, SweepFilesData
+from background.publishers import delete_files, sweep_files
+from config import settings
+from models.cruds.utils import lock_files, referenced_files
+from services.instances import cloud_storage, pg_client
+
+
+async def delete_files_task(payload: DeleteFilesData):
+    """
+    Files are shared by records when storing by content, the references
+    left in the database act as a reference count: only unused files go
+    The locks wait for the uploads reusing the files to commit their record,
+    and keep new ones waiting until the files are deleted
+    """
+    async with pg_client.session() as session:
+        await lock_files(session, payload["filenames"])
+        referenced = await referenced_files(session, payload["filenames"])
+        filenames = [f for f in payload["filenames"] if f not in referenced]
+
+        # The batch API sends DELETE_BATCH_SIZE deletions per request
+        await asyncio.to_thread(cloud_storage.delete_files, filenames)
+    logging.info(f"Deleted {len(filenames)} files")
+
+
+async def sweep_files_task(payload: SweepFilesData):
+    """
+    Diff one page of the bucket listing with the images in the database
+    Pages follow the names order, the next page is enqueued with a delay
+    to keep the sweep at a controlled rate
+    """
+    created_before = datetime.now(UTC) - timedelta(
+        seconds=settings.GCS_SWEEP_MIN_AGE
+    )
+    filenames, last_name = await asyncio.to_thread(
+        cloud_storage.list_files,
+        payload["start_offset"],
+        settings.GCS_SWEEP_PAGE_SIZE,
+        created_before,
+    )
+
+    if filenames:
+        async with pg_client.session() as session:
+            referenced = await referenced_files(session, filenames)
+        orphans = [f for f in filenames if f not in referenced]
+        delete_files(orphans)
+        logging.info(f"Found {len(orphans)} orphan files")
+
+    if last_name:
+        sweep_files(last_name, delay=settings.GCS_SWEEP_DELAY * 1000)
@@ -1,2 +1,4 @@
 from background.publishers.ai import *
 from background.publishers.emails import *
+from background.publishers.images import *
+from background.publishers.storage import *
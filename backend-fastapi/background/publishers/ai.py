@@ -2,7 +2,9 @@ from dramatiq import Message
 
 from background.bgconfig import (
     TASK_PLACE_EMBEDDING,
+    TASK_PLACES_EMBEDDING,
     PlaceEmbbeddingData,
+    PlacesEmbbeddingData,
     Queues,
 )
 from background.publishers.publisher import publisher
@@ -24,3 +26,21 @@ def place_embedding(
         options={},
     )
     publisher.send(message)
+
+
+def places_embedding(
+    place_ids: list[int],
+):
+    """Publish a single message for a batch of places"""
+    if settings.is_test or not place_ids:
+        return
+
+    payload = PlacesEmbbeddingData(place_ids=place_ids)
+    message = Message[None](
+        str(Queues.AI),
+        actor_name=TASK_PLACES_EMBEDDING,
+        args=(payload,),
+        kwargs={},
+        options={},
+    )
+    publisher.send(message)
@@ -0,0 +1,25 @@
+from dramatiq import Message
+
+from background.bgconfig import TASK_IMAGE_VARIANTS, ImageVariantsData, Queues
+from background.publishers.publisher import publisher
+from config import settings
+
+
+def image_variants(table: str, id_: int, image_url: str | None) -> None:
+    """
+    Generate the resized copies of the image of a record
+    Publish it once the record is committed with the image, or the task
+    finds nothing to attach the variants to
+    """
+    if settings.is_test or not image_url:
+        return
+
+    payload = ImageVariantsData(table=table, id=id_, image_url=image_url)
+    message = Message[None](
+        str(Queues.IMAGES),
+        actor_name=TASK_IMAGE_VARIANTS,
+        args=(payload,),
+        kwargs={},
+        options={},
+    )
+    publisher.send(message)
@@ -0,0 +1,54 @@
+from dramatiq import Message
+
+from background.bgconfig import (
+    TASK_DELETE_FILES,
+    TASK_SWEEP_FILES,
+    DeleteFilesData,
+    Queues,
+    SweepFilesData,
+)
+from background.publishers.publisher import publisher
+from config import settings
+
+# Filenames per message, each message is deleted with GCS batch requests
+DELETE_FILES_MESSAGE_SIZE = 1000
+
+
+def delete_files(filenames: list[str], delay: int | None = None) -> None:
+    """
+    Delete the files no record references anymore
+    Publish it once the transaction dropping the references is committed,
+    the references check of the task only sees committed rows
+    delay is an optional grace period in milliseconds
+    """
+    filenames = [filename for filename in filenames if filename]
+    if settings.is_test or not filenames:
+        return
+
+    for i in range(0, len(filenames), DELETE_FILES_MESSAGE_SIZE):
+        chunk = filenames[i : i + DELETE_FILES_MESSAGE_SIZE]
+        payload = DeleteFilesData(filenames=chunk)
+        message = Message[None](
+            str(Queues.STORAGE),
+            actor_name=TASK_DELETE_FILES,
+            args=(payload,),
+            kwargs={},
+            options={},
+        )
+        publisher.send(message, delay=delay)
+
+
+def sweep_files(start_offset: str = "", delay: int | None = None) -> None:
+    """Sweep the bucket for orphan files, starting after start_offset"""
+    if settings.is_test:
+        return
+
+    payload = SweepFilesData(start_offset=start_offset)
+    message = Message[None](
+        str(Queues.STORAGE),
+        actor_name=TASK_SWEEP_FILES,
+        args=(payload,),
+        kwargs={},
+        options={},
+    )
+    publisher.send(message, delay=delay)
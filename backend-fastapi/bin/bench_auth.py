@@ -0,0 +1,41 @@
+import time
+
+from config import settings
+from lib.utils import JWT_CODECS, decode_payload
+from models.schemas import TokenPayload, create_token, decode_token
+from models.schemas.auth import token_cache
+
+ITERATIONS = 20000
+
+
+def bench_codecs(token: str) -> None:
+    for name, codec_class in JWT_CODECS.items():
+        codec = codec_class()
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            data = decode_payload(token, settings.SECRET_KEY, codec)
+            TokenPayload(**data)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name} verification: {elapsed / ITERATIONS * 1e6:.1f} us/request"
+        )
+
+
+def bench_cache(token: str) -> None:
+    token_cache.clear()
+    decode_token(token)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        decode_token(token)
+    elapsed = time.perf_counter() - start
+    print(f"verified token cache: {elapsed / ITERATIONS * 1e6:.1f} us/request")
+
+
+def main():
+    token = create_token(1, "mslimbeji@gmail.com").access_token
+    bench_codecs(token)
+    bench_cache(token)
+
+
+if __name__ == "__main__":
+    main()
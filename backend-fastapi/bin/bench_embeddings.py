@@ -0,0 +1,93 @@
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    bindparam,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from lib.sqlalchemy_ import BinaryVector
+from services.instances import pg_client
+
+ROWS = 10_000
+DIMENSIONS = 384
+
+# Temporary table: the benchmark does not touch the places
+vectors = Table(
+    "bench_vectors",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("embedding", BinaryVector(DIMENSIONS)),
+    prefixes=["TEMPORARY"],
+)
+
+
+def random_embeddings() -> list[tuple[int, list[float]]]:
+    return [
+        (id_, [random.uniform(-1, 1) for _ in range(DIMENSIONS)])
+        for id_ in range(1, ROWS + 1)
+    ]
+
+
+async def text_literals(
+    conn: AsyncConnection, embeddings: list[tuple[int, list[float]]]
+) -> None:
+    """The previous write path: a JSON literal and a commit per row"""
+    for id_, embedding in embeddings:
+        stmt = (
+            update(vectors)
+            .where(vectors.c.id == id_)
+            .values(embedding=text(f"'{json.dumps(embedding)}'::vector"))
+        )
+        await conn.execute(stmt)
+        await conn.commit()
+
+
+async def binary_bulk(
+    conn: AsyncConnection, embeddings: list[tuple[int, list[float]]]
+) -> None:
+    """Same statement as CrudsPlace.update_embeddings_bulk"""
+    stmt = (
+        update(vectors)
+        .where(vectors.c.id == bindparam("row_id"))
+        .values(embedding=bindparam("vector"))
+    )
+    rows = [dict(row_id=id_, vector=vector) for id_, vector in embeddings]
+    await conn.execute(stmt, rows)
+    await conn.commit()
+
+
+async def main():
+    embeddings = random_embeddings()
+    async with pg_client.client.connect() as conn:
+        await conn.run_sync(vectors.metadata.create_all)
+        await conn.execute(
+            vectors.insert(), [dict(id=id_) for id_, _ in embeddings]
+        )
+        await conn.commit()
+
+        for name, write in [
+            ("text literals", text_literals),
+            ("binary executemany", binary_bulk),
+        ]:
+            start = time.perf_counter()
+            await write(conn, embeddings)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name}: {elapsed:.2f} s for {ROWS} vectors "
+                f"({ROWS / elapsed:.0f} vectors/s)"
+            )
+
+    await pg_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+import time
+
+from sqlalchemy.dialects import postgresql
+
+from lib.sqlalchemy_ import statement_cache
+from models.cruds import CrudsPlace, CrudsUser
+from models.schemas import PlaceSearchQuery, UserSearchQuery
+
+ITERATIONS = 5000
+
+dialect = postgresql.asyncpg.dialect()  # type: ignore[attr-defined]
+
+
+def place_query(i: int) -> PlaceSearchQuery:
+    return PlaceSearchQuery(
+        size=20,
+        select=["id", "title", "location"],
+        where={
+            "creator_id": [dict(op="in", val=list(range(i % 10 + 1)))],
+            "title": [dict(op="ilike", val=f"place {i}")],
+            "location_lat": [dict(op="gt", val=1.5)],
+        },
+        orderby=["-created_at"],
+    )
+
+
+def user_query(i: int) -> UserSearchQuery:
+    return UserSearchQuery(
+        size=20,
+        select=["id", "name", "places"],
+        where={"id": [dict(op="in", val=list(range(i % 10 + 1)))]},
+    )
+
+
+def bench(cache_statements: bool) -> None:
+    # The session is not used when building statements
+    places = CrudsPlace(None)  # type: ignore[arg-type]
+    users = CrudsUser(None)  # type: ignore[arg-type]
+    places.CACHE_STATEMENTS = cache_statements
+    users.CACHE_STATEMENTS = cache_statements
+    statement_cache.clear()
+
+    sql: set[str] = set()
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        stmts = [
+            places.build_page_query(place_query(i), with_total=True),
+            places.build_select_query(place_query(i)),
+            users.build_select_query(user_query(i)),
+        ]
+        for stmt in stmts:
+            # SQLAlchemy computes the cache key of each executed statement
+            stmt._generate_cache_key()
+    elapsed = time.perf_counter() - start
+
+    # Distinct SQL strings are distinct prepared statements for asyncpg
+    for i in range(ITERATIONS):
+        stmt = places.build_select_query(place_query(i))
+        compiled = stmt.compile(
+            dialect=dialect, compile_kwargs={"render_postcompile": True}
+        )
+        sql.add(str(compiled))
+
+    mode = "statement cache" if cache_statements else "no statement cache"
+    print(
+        f"{mode}: {elapsed / (ITERATIONS * 3) * 1e6:.1f} us/statement, "
+        f"{len(sql)} distinct SQL strings"
+    )
+
+
+def main():
+    bench(cache_statements=False)
+    bench(cache_statements=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from models.cruds import CrudsPlace
+from models.schemas import PlaceSearchQuery
+from services.instances import pg_client
+from services.setup import close_dbs, connect_dbs
+
+ITERATIONS = 200
+PAGE_SIZE = 100
+
+
+async def bench(columns_fast_path: bool) -> None:
+    async with pg_client.session() as session:
+        cruds = CrudsPlace(session)
+        cruds.COLUMNS_FAST_PATH = columns_fast_path
+
+        # Warm up the connection pool and the prepared statements
+        await cruds.paginate(PlaceSearchQuery(size=PAGE_SIZE, count="none"))
+
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            await cruds.paginate(PlaceSearchQuery(size=PAGE_SIZE, count="none"))
+        paginate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            await cruds.search(PlaceSearchQuery(size=PAGE_SIZE))
+        search = time.perf_counter() - start
+
+    mode = "column tuples" if columns_fast_path else "ORM entities"
+    print(
+        f"{mode}: paginate {paginate / ITERATIONS * 1000:.2f} ms/page, "
+        f"search {search / ITERATIONS * 1000:.2f} ms/page "
+        f"({PAGE_SIZE} rows per page)"
+    )
+
+
+async def main():
+    await connect_dbs()
+    await bench(columns_fast_path=False)
+    await bench(columns_fast_path=True)
+    await close_dbs()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+from sqlalchemy import event
+
+from models.cruds import CrudsPlace
+from models.schemas import PlaceSearchQuery
+from services.instances import pg_client
+from services.setup import close_dbs, connect_dbs
+
+ITERATIONS = 200
+PAGE_SIZE = 100
+
+
+async def bench(single_roundtrip: bool) -> None:
+    statements = 0
+
+    def count_statement(*args) -> None:
+        nonlocal statements
+        statements += 1
+
+    engine = pg_client.client.sync_engine
+    async with pg_client.session() as session:
+        cruds = CrudsPlace(session)
+        cruds.SINGLE_ROUNDTRIP_SEARCH = single_roundtrip
+
+        # Warm up the connection pool and the prepared statements
+        await cruds.paginate(PlaceSearchQuery(size=PAGE_SIZE))
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            await cruds.paginate(PlaceSearchQuery(size=PAGE_SIZE))
+        elapsed = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    mode = "single roundtrip" if single_roundtrip else "count + two phases"
+    print(
+        f"{mode}: {statements / ITERATIONS:.1f} statements/request, "
+        f"{elapsed / ITERATIONS * 1000:.2f} ms/request"
+    )
+
+
+async def main():
+    await connect_dbs()
+    await bench(single_roundtrip=False)
+    await bench(single_roundtrip=True)
+    await close_dbs()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
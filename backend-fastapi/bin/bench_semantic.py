@@ -0,0 +1,118 @@
+import asyncio
+import math
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, Table, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from lib.sqlalchemy_ import BinaryVector
+from services.instances import pg_client
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DIMENSIONS = 384
+CLUSTERS = 1000
+QUERIES = 100
+K = 10
+INSERT_BATCH_SIZE = 10_000
+PROBES = (1, 5, 10, 20, 50)
+
+# Synthetic vectors around random centers, the places are not touched
+vectors = Table(
+    "bench_semantic_vectors",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("embedding", BinaryVector(DIMENSIONS)),
+    prefixes=["UNLOGGED"],
+)
+
+rng = np.random.default_rng(42)
+centers = rng.normal(size=(CLUSTERS, DIMENSIONS)).astype(np.float32)
+
+
+def sample(n: int) -> np.ndarray:
+    picked = centers[rng.integers(0, CLUSTERS, n)]
+    points = picked + 0.3 * rng.normal(size=(n, DIMENSIONS))
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+async def load(conn: AsyncConnection) -> None:
+    await conn.run_sync(vectors.metadata.drop_all)
+    await conn.run_sync(vectors.metadata.create_all)
+    start = time.perf_counter()
+    for offset in range(0, ROWS, INSERT_BATCH_SIZE):
+        batch = sample(min(INSERT_BATCH_SIZE, ROWS - offset))
+        rows = [
+            dict(id=offset + i + 1, embedding=vector)
+            for i, vector in enumerate(batch)
+        ]
+        await conn.execute(vectors.insert(), rows)
+    await conn.commit()
+    print(f"Loaded {ROWS} vectors in {time.perf_counter() - start:.0f} s")
+
+    # Same index as the places, rows / 1000 lists up to 1M rows then sqrt
+    lists = max(ROWS // 1000, int(math.sqrt(ROWS)))
+    start = time.perf_counter()
+    await conn.execute(
+        text(
+            f"CREATE INDEX ON {vectors.name} "
+            f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})"
+        )
+    )
+    await conn.execute(text(f"ANALYZE {vectors.name}"))
+    await conn.commit()
+    print(
+        f"Built ivfflat ({lists} lists) in {time.perf_counter() - start:.0f} s"
+    )
+
+
+async def nearest(
+    conn: AsyncConnection, query: np.ndarray, settings: dict[str, str]
+) -> tuple[list[int], float]:
+    """Ids of the K nearest vectors and the latency of the search"""
+    distance = vectors.c.embedding.cosine_distance(query)
+    stmt = select(vectors.c.id).order_by(distance).limit(K)
+    for name, value in settings.items():
+        await conn.execute(select(func.set_config(name, value, True)))
+    start = time.perf_counter()
+    result = await conn.execute(stmt)
+    ids = list(result.scalars())
+    elapsed = time.perf_counter() - start
+    await conn.rollback()
+    return ids, elapsed
+
+
+async def main():
+    async with pg_client.client.connect() as conn:
+        await load(conn)
+        queries = sample(QUERIES)
+
+        # Exact neighbors from a sequential scan
+        exact = [
+            (await nearest(conn, q, {"enable_indexscan": "off"}))[0]
+            for q in queries
+        ]
+
+        for probes in PROBES:
+            recalls, latencies = [], []
+            for query, truth in zip(queries, exact, strict=True):
+                ids, elapsed = await nearest(
+                    conn, query, {"ivfflat.probes": str(probes)}
+                )
+                recalls.append(len(set(ids) & set(truth)) / K)
+                latencies.append(elapsed * 1000)
+            print(
+                f"probes={probes}: recall@{K} {np.mean(recalls):.3f}, "
+                f"p50 {np.percentile(latencies, 50):.1f} ms, "
+                f"p95 {np.percentile(latencies, 95):.1f} ms"
+            )
+
+        await conn.run_sync(vectors.metadata.drop_all)
+        await conn.commit()
+
+    await pg_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
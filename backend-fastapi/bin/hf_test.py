@@ -1,10 +1,10 @@
 import asyncio
 
-from services.instances import hf_client
+from services.instances import embedder
 
 
 async def main():
-    vec = await hf_client.embed_text("I am trying to debug my code in python")
+    vec = await embedder.embed_text("I am trying to debug my code in python")
     print(vec)
 
 
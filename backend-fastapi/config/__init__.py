@@ -3,7 +3,8 @@ from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from lib.utils import is_test_mode
+from lib.clients.embeddings import EmbedderName
+from lib.utils import ImageFormat, JwtCodecName, is_test_mode
 
 FILEDIR = os.path.dirname(__file__)
 
@@ -25,6 +26,8 @@ class Settings(BaseSettings):
     MAX_ITEMS_PER_PAGE: int = 100
     GOD_MODE_LOGIN: str
     JWT_EXPIRATION: int = 3600
+    JWT_CODEC: JwtCodecName = "jose"
+    TOKEN_CACHE_SIZE: int = 10_000
     DEFAULT_TIMEOUT: int = 20
     ENV: Literal["dev", "test", "production"]
 
@@ -34,10 +37,25 @@ class Settings(BaseSettings):
     REDIS_URL: str
     REDIS_TEST_URL: str = ""
     REDIS_DEFAULT_EXPIRATION: int = 3600
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL: int = 30
 
     # HUGGING FACE
     HF_API_TOKEN: str
 
+    # EMBEDDINGS
+    EMBEDDING_BACKEND: EmbedderName = "huggingface"
+    EMBEDDING_MODEL_PATH: str = ""
+    EMBEDDING_THREADS: int = 0
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_BATCH_WINDOW: float = 0.05
+    EMBEDDING_CACHE_EXPIRATION: int = 30 * 86400
+    EMBEDDING_CACHE_SIZE: int = 10_000
+
+    # SEMANTIC SEARCH
+    IVFFLAT_PROBES: int = 10
+    SEMANTIC_SEARCH_MAX_RESULTS: int = 1000
+
     # GCP
     GOOGLE_APPLICATION_CREDENTIALS: str = ""
     GCP_PROJECT_ID: str
@@ -45,6 +63,16 @@ class Settings(BaseSettings):
     GCS_EMULATOR_PRIVATE_URL: str = ""
     GCS_EMULATOR_PUBLIC_URL: str = ""
     GCS_BLOB_ACCESS_EXPIRATION: int = 3600
+    GCS_HTTP_BACKEND: bool = True
+    GCS_MAX_CONCURRENCY: int = 8
+    GCS_CONTENT_ADDRESSED: bool = False
+
+    # IMAGES
+    IMAGE_VARIANTS: dict[str, int] = dict(thumb=320, medium=1024)
+    IMAGE_VARIANT_FORMAT: ImageFormat = "webp"
+    GCS_SWEEP_PAGE_SIZE: int = 1000
+    GCS_SWEEP_DELAY: int = 10
+    GCS_SWEEP_MIN_AGE: int = 24 * 3600
 
     @property
     def is_production(self) -> bool:
@@ -1,3 +1,4 @@
+from lib.clients.embeddings import *
 from lib.clients.hugging_face import *
 from lib.clients.pgsql import *
 from lib.clients.redis_ import *
@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+from itertools import pairwise
+import os
+import re
+from typing import Any, Literal
+import unicodedata
+
+import numpy as np
+
+from lib.utils import LocalCache
+
+from .redis_ import RedisClient
+
+EmbedderName = Literal["huggingface", "onnx", "hashing"]
+
+
+class Embedder:
+    """Turns texts into vectors of a fixed number of dimensions"""
+
+    model_name: str = ""
+    dimensions: int = 384
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embeddings are returned in the order of the texts"""
+        raise NotImplementedError
+
+    async def embed_text(self, text: str) -> list[float]:
+        embeddings = await self.embed_texts([text])
+        return embeddings[0]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class OnnxEmbedderConfig:
+    def __init__(
+        self,
+        model_path: str,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        dimensions: int = 384,
+        max_length: int = 256,
+        batch_size: int = 32,
+        threads: int = 0,
+    ) -> None:
+        """
+        model_path is a folder with the exported model.onnx (quantized or
+        not) and the tokenizer.json of the model
+        """
+        self.model_path = model_path
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.threads = threads
+
+
+class OnnxEmbedder(Embedder):
+    """
+    Sentence transformer running in the process on the CPU
+    The model is loaded once, batches are pooled with NumPy
+    """
+
+    def __init__(self, config: OnnxEmbedderConfig) -> None:
+        self.model_path = config.model_path
+        self.model_name = config.model_name
+        self.dimensions = config.dimensions
+        self.max_length = config.max_length
+        self.batch_size = config.batch_size
+        self.threads = config.threads
+        self._session: Any = None
+        self._tokenizer: Any = None
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> None:
+        # Only the processes using this backend need the runtime
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(
+            os.path.join(self.model_path, "tokenizer.json")
+        )
+        tokenizer.enable_truncation(max_length=self.max_length)
+        tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(self.model_path, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._tokenizer = tokenizer
+
+    async def connect(self) -> None:
+        async with self._lock:
+            if self._session is None:
+                await asyncio.to_thread(self._load)
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array(
+            [e.attention_mask for e in encodings], dtype=np.int64
+        )
+        inputs = dict(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=np.zeros_like(input_ids),
+        )
+        names = {i.name for i in self._session.get_inputs()}
+        outputs = self._session.run(
+            None, {k: v for k, v in inputs.items() if k in names}
+        )
+
+        # Mean pooling of the token embeddings, padding excluded
+        tokens = outputs[0]
+        mask = attention_mask[:, :, None].astype(tokens.dtype)
+        summed = (tokens * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(summed / counts)
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        batches = [
+            self._embed_batch(texts[i : i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(batches).tolist()
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        await self.connect()
+        # Inference is CPU bound, onnxruntime releases the GIL
+        return await asyncio.to_thread(self._embed, texts)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic embeddings without a model, for tests and offline runs
+    Words and word pairs are hashed to signed buckets, texts sharing words
+    are close but the vectors carry no meaning
+    """
+
+    WORD_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimensions: int = 384) -> None:
+        self.model_name = f"hashing-{dimensions}"
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> list[str]:
+        words = self.WORD_PATTERN.findall(text.lower())
+        pairs = [f"{a} {b}" for a, b in pairwise(words)]
+        return words + pairs
+
+    def _hash(self, feature: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        sign = 1.0 if value & 1 else -1.0
+        return (value >> 1) % self.dimensions, sign
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashed = [self._hash(f) for f in self._features(text)]
+            if not hashed:
+                continue
+            indexes, signs = zip(*hashed, strict=True)
+            np.add.at(vectors[row], list(indexes), list(signs))
+        return _normalize(vectors).tolist()
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts)
+
+
+class CachedEmbedderConfig:
+    def __init__(
+        self,
+        cache: RedisClient,
+        expiration: int = 30 * 86400,
+        local_size: int = 0,
+        local_ttl: int = 3600,
+    ) -> None:
+        """local_size is the size of the in-process LRU, 0 to disable it"""
+        self.cache = cache
+        self.expiration = expiration
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+
+
+class CachedEmbedder(Embedder):
+    """
+    Cache the embeddings of another embedder by content
+    The key is the model name and the hash of the normalized text, vectors
+    are stored in Redis as little endian float32 bytes
+    """
+
+    # 4 bytes per dimension instead of ~20 characters in JSON
+    DTYPE = np.dtype("<f4")
+
+    def __init__(
+        self, embedder: Embedder, config: CachedEmbedderConfig
+    ) -> None:
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.dimensions = embedder.dimensions
+        self.cache = config.cache
+        self.expiration = config.expiration
+        self.local: LocalCache[list[float]] | None = None
+        if config.local_size:
+            self.local = LocalCache[list[float]](
+                maxsize=config.local_size, ttl=config.local_ttl
+            )
+
+    async def connect(self) -> None:
+        await self.embedder.connect()
+
+    async def close(self) -> None:
+        await self.embedder.close()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(self.normalize(text).encode()).hexdigest()
+        return f"embedding_{self.model_name}_{digest}"
+
+    def encode(self, embedding: list[float]) -> bytes:
+        return np.asarray(embedding, dtype=self.DTYPE).tobytes()
+
+    def decode(self, raw: bytes) -> list[float] | None:
+        vector = np.frombuffer(raw, dtype=self.DTYPE)
+        if vector.size != self.dimensions:
+            return None
+        return vector.tolist()
+
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        keys = [self.cache_key(text) for text in texts]
+        found: dict[str, list[float]] = {}
+
+        # In-process LRU first, then one MGET for the rest
+        if self.local is not None:
+            for key in keys:
+                embedding = self.local.get(key)
+                if embedding is not None:
+                    found[key] = embedding
+        remote_keys = list(dict.fromkeys(k for k in keys if k not in found))
+        raws = await self.cache.mget(remote_keys, format_="bytes")
+        for key, raw in zip(remote_keys, raws, strict=True):
+            embedding = self.decode(raw) if raw else None
+            if embedding is not None:
+                found[key] = embedding
+
+        # Identical texts are embedded once
+        missing = {
+            key: text
+            for key, text in zip(keys, texts, strict=True)
+            if key not in found
+        }
+        if missing:
+            embeddings = await self.embedder.embed_texts(list(missing.values()))
+            new = dict(zip(missing, embeddings, strict=True))
+            await self.cache.set_many(
+                {key: self.encode(e) for key, e in new.items()},
+                self.expiration,
+            )
+            found.update(new)
+
+        if self.local is not None:
+            for key in remote_keys:
+                if key in found:
+                    self.local.set(key, found[key])
+        return [found[key] for key in keys]
@@ -4,6 +4,8 @@ import httpx
 
 from lib.types_ import ApiError
 
+from .embeddings import Embedder
+
 
 class HuggingFaceClientConfig:
     def __init__(
@@ -17,7 +19,7 @@ class HuggingFaceClientConfig:
         self.timeout = timeout
 
 
-class HuggingFaceClient:
+class HuggingFaceClient(Embedder):
     def __init__(self, config: HuggingFaceClientConfig) -> None:
         # Authentication
         self.token = config.token
@@ -29,6 +31,7 @@ class HuggingFaceClient:
 
         # Embedding
         self.embeding_model = config.embed_model
+        self.model_name = config.embed_model
         self.embedding_model_url = f"https://router.huggingface.co/hf-inference/models/{self.embeding_model}"
         self.embedding_model_api = httpx.AsyncClient(
             base_url=self.embedding_model_url,
@@ -36,9 +39,10 @@ class HuggingFaceClient:
             timeout=self.default_timeout,
         )
 
-    async def embed_text(self, text: str) -> list[float]:
+    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """One request for all the texts, embeddings are in the same order"""
         try:
-            payload = {"inputs": [text]}
+            payload = {"inputs": texts}
             response = await self.embedding_model_api.post(
                 "/pipeline/feature-extraction",
                 json=payload,
@@ -46,9 +50,9 @@ class HuggingFaceClient:
             )
             response.raise_for_status()
             embedding_response: list[list[float]] = response.json()
-            return embedding_response[0]
+            return embedding_response
         except Exception as err:
             raise ApiError(
                 HTTPStatus.FAILED_DEPENDENCY,
-                f"An unexpected error occured while embedding text {text}",
+                f"An unexpected error occured while embedding {len(texts)} texts",
             ) from err
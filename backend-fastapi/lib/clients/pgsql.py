@@ -1,7 +1,9 @@
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from typing import Any
 
-from sqlalchemy import text
+from pgvector.asyncpg import register_vector
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -11,8 +13,23 @@ from sqlalchemy.ext.asyncio import (
 
 
 class PgClientConfig:
-    def __init__(self, uri: str):
+    def __init__(self, uri: str, vector: bool = False):
+        """vector registers the pgvector binary codec on the connections"""
         self.uri = uri
+        self.vector = vector
+
+
+async def register_vector_codec(conn: Any) -> None:
+    try:
+        await register_vector(conn)
+    except ValueError as err:
+        # The extension is created by the first migration
+        if not str(err).startswith("unknown type"):
+            raise
+
+
+def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+    dbapi_connection.run_async(register_vector_codec)
 
 
 class PgClient:
@@ -38,6 +55,8 @@ class PgClient:
         self.session_maker = async_sessionmaker(
             self.client, class_=AsyncSession
         )
+        if config.vector:
+            event.listen(self.client.sync_engine, "connect", _on_connect)
 
     async def connect(self) -> None:
         """Test the connection by executing a simple query"""
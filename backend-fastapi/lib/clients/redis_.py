@@ -1,3 +1,5 @@
+import asyncio
+from collections.abc import Callable
 import json
 from typing import Any, Literal
 
@@ -6,7 +8,9 @@ import redis.asyncio as async_redis
 
 from lib.utils.helpers import str_to_bool
 
-OutputFormat = Literal["json", "int", "float", "bool", ""] | type[BaseModel]
+OutputFormat = (
+    Literal["json", "int", "float", "bool", "bytes", ""] | type[BaseModel]
+)
 
 
 class RedisClientConfig:
@@ -20,6 +24,7 @@ class RedisClient:
         self.uri: str = config.uri
         self.default_expirartion: int = config.expiration
         self._client: async_redis.Redis | None = None
+        self._listeners: list[asyncio.Task] = []
 
     @property
     def client(self) -> async_redis.Redis:
@@ -36,6 +41,10 @@ class RedisClient:
             await self._client.ping()  # type: ignore[misc]
 
     async def close(self) -> None:
+        for task in self._listeners:
+            task.cancel()
+        await asyncio.gather(*self._listeners, return_exceptions=True)
+        self._listeners = []
         if self._client:
             await self._client.aclose()
             self._client = None
@@ -43,29 +52,76 @@ class RedisClient:
     async def flushall(self) -> None:
         await self.client.flushall()
 
+    def _parse(self, raw: bytes | str, format_: OutputFormat) -> Any:
+        if format_ == "bytes":
+            return raw.encode() if isinstance(raw, str) else raw
+        stored = raw.decode() if isinstance(raw, bytes) else raw
+        if isinstance(format_, type) and issubclass(format_, BaseModel):
+            return format_.model_validate_json(stored)
+        if format_ == "json":
+            return json.loads(stored)
+        if format_ == "int":
+            return int(stored)
+        if format_ == "float":
+            return float(stored)
+        if format_ == "bool":
+            return str_to_bool(str(stored))
+        return stored
+
     async def get(self, key: str, format_: OutputFormat = "") -> Any:
         raw: bytes = await self.client.get(key)
         if raw is None:
             return None
 
-        stored = raw.decode()
-        if isinstance(format_, type) and issubclass(format_, BaseModel):
+        try:
+            return self._parse(raw, format_)
+        except Exception:
+            # Value become not valid, purge it and return None
+            await self.delete(key)
+            return None
+
+    async def mget(self, keys: list[str], format_: OutputFormat = "") -> list:
+        """Read the keys in one roundtrip, None for missing or invalid values"""
+        if not keys:
+            return []
+
+        values = []
+        for raw in await self.client.mget(keys):
             try:
-                return format_.model_validate_json(stored)
+                values.append(
+                    None if raw is None else self._parse(raw, format_)
+                )
             except Exception:
-                # Value become not valid, purge it and return None
-                await self.delete(key)
-                return None
-
-        elif format_ == "json":
-            return json.loads(stored)
-        elif format_ == "int":
-            return int(stored)
-        elif format_ == "float":
-            return float(stored)
-        elif format_ == "bool":
-            return str_to_bool(str(stored))
-        return stored
+                values.append(None)
+        return values
+
+    async def mget_with_ttl(
+        self, keys: list[str], format_: OutputFormat = ""
+    ) -> list[tuple[Any, float]]:
+        """
+        Read the keys and their seconds to live in one roundtrip
+        (None, 0) for missing or invalid values and keys without expiration
+        """
+        if not keys:
+            return []
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.mget(keys)
+            for key in keys:
+                pipe.pttl(key)
+            raws, *pttls = await pipe.execute()
+
+        values: list[tuple[Any, float]] = []
+        for raw, pttl in zip(raws, pttls, strict=True):
+            # pttl is -2 for a missing key, -1 for a key without expiration
+            if raw is None or pttl <= 0:
+                values.append((None, 0))
+                continue
+            try:
+                values.append((self._parse(raw, format_), pttl / 1000))
+            except Exception:
+                values.append((None, 0))
+        return values
 
     async def set(
         self, key: str, val: Any, expiration: int | None = None
@@ -77,5 +133,81 @@ class RedisClient:
             val = val.model_dump_json()
         return await self.client.set(key, val, ex=expiration)
 
+    async def set_many(
+        self, values: dict[str, Any], expiration: int | None = None
+    ) -> None:
+        """Write the keys in one roundtrip"""
+        if not values:
+            return
+
+        expiration = expiration or self.default_expirartion
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, val in values.items():
+                if isinstance(val, (dict, list)):
+                    val = json.dumps(val)
+                elif isinstance(val, BaseModel):
+                    val = val.model_dump_json()
+                pipe.set(key, val, ex=expiration)
+            await pipe.execute()
+
     async def delete(self, key: str) -> None:
         return await self.client.delete(key)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        """Delete the keys in one roundtrip"""
+        if not keys:
+            return
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.delete(key)
+            await pipe.execute()
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def publish(self, channel: str, message: Any) -> None:
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)
+        elif isinstance(message, BaseModel):
+            message = message.model_dump_json()
+        await self.client.publish(channel, message)
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: Callable[[Any], None],
+        format_: OutputFormat = "",
+    ) -> None:
+        """
+        Call handler with each message published on the channel
+        handler receives None on each (re)subscription: messages published
+        while not subscribed are lost and the state must be reset
+        """
+        task = asyncio.create_task(self._listen(channel, handler, format_))
+        self._listeners.append(task)
+
+    async def _listen(
+        self,
+        channel: str,
+        handler: Callable[[Any], None],
+        format_: OutputFormat,
+    ) -> None:
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(channel)
+                    handler(None)
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        try:
+                            handler(self._parse(message["data"], format_))
+                        except Exception:
+                            # A bad message must not stop the listener
+                            handler(None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Connection lost, wait before subscribing again
+                await asyncio.sleep(1)
@@ -1,15 +1,26 @@
+import asyncio
+from collections.abc import Awaitable, Callable
 from datetime import UTC, datetime, timedelta
+import hashlib
+from http import HTTPStatus
 import os
 from urllib.parse import quote
 import uuid
 
 from google.api_core.exceptions import Conflict, NotFound
-from google.auth.credentials import AnonymousCredentials
-from google.cloud.storage import Client
+import google.auth
+from google.auth.credentials import AnonymousCredentials, Credentials
+from google.auth.exceptions import DefaultCredentialsError
+from google.auth.transport.requests import Request as AuthRequest
+from google.cloud.storage import Bucket, Client
 from google.oauth2 import service_account
+import httpx
 from starlette.datastructures import UploadFile
 
-from lib.types_ import FileToUpload
+from lib.types_ import ApiError, FileToUpload, SignedUpload, StoredFile
+from lib.utils import LocalCache
+
+from .redis_ import RedisClient
 
 
 class CloudStorageConfig:
@@ -21,6 +32,11 @@ class CloudStorageConfig:
         credentials_file: str = "",
         emulator_public_url: str = "",
         emulator_private_url: str = "",
+        cache: RedisClient | None = None,
+        http_backend: bool = True,
+        max_concurrency: int = 8,
+        timeout: int = 20,
+        content_addressed: bool = False,
     ) -> None:
         self.project_id = project_id
         self.bucket_name = bucket_name
@@ -28,9 +44,298 @@ class CloudStorageConfig:
         self.credentials_file = credentials_file
         self.emulator_public_url = emulator_public_url
         self.emulator_private_url = emulator_private_url
+        self.cache = cache
+        self.http_backend = http_backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.content_addressed = content_addressed
+
+
+def _persisted_bytes(range_header: str | None) -> int:
+    """The Range header of a resumable upload is bytes=0-<last byte>"""
+    if not range_header:
+        return 0
+    return int(range_header.rsplit("-", 1)[1]) + 1
+
+
+class StorageBackend:
+    """Async operations on the blobs of a bucket"""
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def upload(self, filename: str, file: FileToUpload) -> None:
+        """Stream the file content, whatever its size"""
+        raise NotImplementedError
+
+    async def delete(self, filename: str) -> bool:
+        """False when the file does not exist"""
+        raise NotImplementedError
+
+    async def exists(self, filename: str) -> bool:
+        raise NotImplementedError
+
+    async def stat(self, filename: str) -> StoredFile | None:
+        """None when the file does not exist"""
+        raise NotImplementedError
+
+    async def delete_many(self, filenames: list[str]) -> list[str]:
+        """
+        Delete the files, missing ones are not failures
+        Returns the filenames that could not be deleted
+        """
+        raise NotImplementedError
+
+
+class ThreadStorageBackend(StorageBackend):
+    """The blocking google.cloud.storage client run in worker threads"""
+
+    def __init__(self, storage: "CloudStorage") -> None:
+        self.storage = storage
+
+    @property
+    def bucket(self) -> Bucket:
+        return self.storage.bucket
+
+    async def upload(self, filename: str, file: FileToUpload) -> None:
+        await asyncio.to_thread(self.storage.upload_blob, filename, file)
+
+    async def delete(self, filename: str) -> bool:
+        return await asyncio.to_thread(self.storage.delete_file, filename)
+
+    async def exists(self, filename: str) -> bool:
+        return await asyncio.to_thread(self.bucket.blob(filename).exists)
+
+    async def stat(self, filename: str) -> StoredFile | None:
+        blob = await asyncio.to_thread(self.bucket.get_blob, filename)
+        if blob is None:
+            return None
+        return StoredFile(
+            size=blob.size or 0, content_type=blob.content_type or ""
+        )
+
+    async def delete_many(self, filenames: list[str]) -> list[str]:
+        # The batch requests do not report the failures of each file
+        await asyncio.to_thread(self.storage.delete_files, filenames)
+        return []
+
+
+class HttpStorageBackend(StorageBackend):
+    """
+    GCS JSON API through a pooled httpx.AsyncClient
+    The pool size bounds the concurrent transfers of the process
+    """
+
+    SCOPES = ("https://www.googleapis.com/auth/devstorage.read_write",)
+
+    def __init__(
+        self,
+        api_url: str,
+        bucket_name: str,
+        credentials: Credentials | None,
+        max_concurrency: int = 8,
+        timeout: int = 20,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.api_url = api_url.rstrip("/")
+        self.bucket_name = bucket_name
+        self.credentials = credentials
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._refresh_lock: asyncio.Lock | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            raise RuntimeError(
+                "Storage backend is not connected. Call connect() first."
+            )
+        return self._client
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+    async def connect(self) -> None:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._client = httpx.AsyncClient(
+                base_url=self.api_url,
+                limits=limits,
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+            self._refresh_lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._refresh_lock = None
+
+    def object_path(self, filename: str) -> str:
+        name = quote(filename, safe="")
+        return f"/storage/v1/b/{self.bucket_name}/o/{name}"
+
+    async def headers(self) -> dict[str, str]:
+        if self.credentials is None or isinstance(
+            self.credentials, AnonymousCredentials
+        ):
+            return {}
+
+        if not self.credentials.valid and self._refresh_lock:
+            async with self._refresh_lock:
+                if not self.credentials.valid:
+                    # google-auth only has a blocking transport
+                    await asyncio.to_thread(
+                        self.credentials.refresh, AuthRequest()
+                    )
+        return dict(Authorization=f"Bearer {self.credentials.token}")
+
+    @property
+    def upload_path(self) -> str:
+        return f"/upload/storage/v1/b/{self.bucket_name}/o"
+
+    async def upload(self, filename: str, file: FileToUpload) -> None:
+        if file.size > file.CHUNK_SIZE:
+            await self._upload_resumable(filename, file)
+            return
+
+        response = await self.client.post(
+            self.upload_path,
+            params=dict(uploadType="media", name=filename),
+            content=b"".join(file.chunks()),
+            headers={**await self.headers(), "Content-Type": file.mimetype},
+        )
+        response.raise_for_status()
+
+    async def _upload_resumable(
+        self, filename: str, file: FileToUpload
+    ) -> None:
+        """
+        Send the file chunk by chunk in a resumable upload session
+        Only the current and the next chunks are in memory
+        GCS may persist a part of a chunk only, the Range header of its
+        answer gives the offset to resume from
+        """
+        response = await self.client.post(
+            self.upload_path,
+            params=dict(uploadType="resumable", name=filename),
+            json=dict(name=filename, contentType=file.mimetype),
+            headers={
+                **await self.headers(),
+                "X-Upload-Content-Type": file.mimetype,
+            },
+        )
+        response.raise_for_status()
+        session_url = response.headers["Location"]
+
+        chunks = file.chunks()
+        chunk = next(chunks)
+        following = next(chunks, None)
+        start = 0
+        while True:
+            end = start + len(chunk)
+            # The total size is sent with the last chunk
+            total = "*" if following is not None else str(end)
+            response = await self.client.put(
+                session_url,
+                content=chunk,
+                headers={
+                    **await self.headers(),
+                    "Content-Range": f"bytes {start}-{end - 1}/{total}",
+                },
+            )
+
+            # 308 Resume Incomplete acknowledges the persisted bytes
+            if response.status_code != httpx.codes.PERMANENT_REDIRECT:
+                response.raise_for_status()
+                if following is None:
+                    return
+                raise RuntimeError(f"Upload of {filename} ended too early")
+
+            persisted = _persisted_bytes(response.headers.get("Range"))
+            if not start < persisted <= end:
+                raise RuntimeError(f"Upload of {filename} lost a chunk")
+
+            if persisted < end:
+                # Sending the rest of the chunk again
+                chunk = chunk[persisted - start :]
+            elif following is None:
+                raise RuntimeError(f"Upload of {filename} was not finalized")
+            else:
+                chunk, following = following, next(chunks, None)
+            start = persisted
+
+    async def delete(self, filename: str) -> bool:
+        response = await self.client.delete(
+            self.object_path(filename), headers=await self.headers()
+        )
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def exists(self, filename: str) -> bool:
+        response = await self.client.get(
+            self.object_path(filename), headers=await self.headers()
+        )
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def stat(self, filename: str) -> StoredFile | None:
+        response = await self.client.get(
+            self.object_path(filename), headers=await self.headers()
+        )
+        if response.status_code == httpx.codes.NOT_FOUND:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        # The JSON API sends the size as a string
+        return StoredFile(
+            size=int(data.get("size", 0)),
+            content_type=data.get("contentType", ""),
+        )
+
+    async def delete_many(self, filenames: list[str]) -> list[str]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def delete(filename: str) -> None:
+            async with semaphore:
+                await self.delete(filename)
+
+        # A failed deletion does not cancel the others
+        results = await asyncio.gather(
+            *(delete(filename) for filename in filenames),
+            return_exceptions=True,
+        )
+        return [
+            filename
+            for filename, result in zip(filenames, results, strict=True)
+            if isinstance(result, Exception)
+        ]
 
 
 class CloudStorage:
+    # Calls per request allowed by the GCS batch API
+    DELETE_BATCH_SIZE = 100
+    # Seconds of validity left when a cached signed url is renewed
+    SIGNED_URL_MARGIN = 300
+    # Signed urls kept in process
+    SIGNED_URL_CACHE_SIZE = 10_000
+    # Prefix of the blobs named after their content
+    CONTENT_PREFIX = "sha256/"
+
     def __init__(self, config: CloudStorageConfig) -> None:
         # Parameters
         self.project_id: str = config.project_id
@@ -39,6 +344,10 @@ class CloudStorage:
         self.credentials_file: str = config.credentials_file
         self.emulator_public_url: str = config.emulator_public_url
         self.emulator_private_url: str = config.emulator_private_url
+        self.cache: RedisClient | None = config.cache
+        self.url_cache = LocalCache[str](
+            maxsize=self.SIGNED_URL_CACHE_SIZE, ttl=self.signed_url_ttl
+        )
 
         # Storage client
         self.storage = Client(
@@ -54,6 +363,19 @@ class CloudStorage:
         # Select the bucket
         self.bucket = self.storage.bucket(self.bucket_name)
 
+        # Async backends, the thread one is used until http is connected
+        self.content_addressed: bool = config.content_addressed
+        self.use_http: bool = config.http_backend
+        self.max_concurrency: int = config.max_concurrency
+        self.threads = ThreadStorageBackend(self)
+        self.http = HttpStorageBackend(
+            self.api_url,
+            self.bucket_name,
+            self.http_credentials,
+            config.max_concurrency,
+            config.timeout,
+        )
+
     @property
     def is_emulator(self) -> bool:
         return bool(self.emulator_private_url and self.emulator_public_url)
@@ -77,6 +399,41 @@ class CloudStorage:
             return dict(api_endpoint=self.emulator_private_url)
         return None
 
+    @property
+    def api_url(self) -> str:
+        if self.is_emulator:
+            return self.emulator_private_url
+        return "https://storage.googleapis.com"
+
+    @property
+    def http_credentials(self) -> Credentials | None:
+        if self.is_emulator:
+            return None
+
+        scopes = HttpStorageBackend.SCOPES
+        credentials = self.credentials
+        if isinstance(credentials, service_account.Credentials):
+            return credentials.with_scopes(scopes)
+
+        try:
+            # Application default credentials, like the sync client
+            return google.auth.default(scopes=scopes)[0]
+        except DefaultCredentialsError:
+            return None
+
+    @property
+    def backend(self) -> StorageBackend:
+        if self.http.is_connected:
+            return self.http
+        return self.threads
+
+    async def connect(self) -> None:
+        if self.use_http:
+            await self.http.connect()
+
+    async def close(self) -> None:
+        await self.http.close()
+
     def _init_emulator(self) -> None:
         try:
             self.storage.create_bucket(self.bucket_name)
@@ -90,29 +447,100 @@ class CloudStorage:
         bucket_url = f"{api_url}/b/{self.bucket_name}"
         return f"{bucket_url}/o/{quote(filename)}?alt=media"
 
-    def get_signed_url(
-        self, filename: str, expiration: int | None = None
-    ) -> str:
+    @property
+    def signed_url_ttl(self) -> int:
+        """Seconds a signed url with the default expiration is reused"""
+        return max(self.blob_access_expiration - self.SIGNED_URL_MARGIN, 0)
+
+    def signed_url_local_ttl(self, remaining: float) -> float:
+        """
+        Seconds a signed url is kept in process, remaining is the time to
+        live of its redis key: both expire SIGNED_URL_MARGIN seconds before
+        the signature, never after the redis copy
+        """
+        return max(min(remaining, self.signed_url_ttl), 0)
+
+    def signed_url_cache_key(self, filename: str) -> str:
+        return f"signed_url_{self.bucket_name}_{filename}"
+
+    def _sign_url(self, filename: str, expiration: int) -> str:
         if self.is_emulator:
             return self._get_emulator_file_url(filename)
 
-        expiration = expiration or self.blob_access_expiration
         blob = self.bucket.blob(filename)
-
         return blob.generate_signed_url(
             version="v4",
             expiration=datetime.now(UTC) + timedelta(seconds=expiration),
             method="GET",
         )
 
-    def upload_file(
-        self,
-        param: FileToUpload | UploadFile | str | None,
-        destination: str = "",
+    def get_signed_url(
+        self, filename: str, expiration: int | None = None
     ) -> str:
-        if not param:
-            return ""
+        if expiration:
+            # Custom expirations are not cached
+            return self._sign_url(filename, expiration)
+
+        url = self.url_cache.get(filename)
+        if url is None:
+            url = self._sign_url(filename, self.blob_access_expiration)
+            if self.signed_url_ttl:
+                ttl = self.signed_url_local_ttl(self.signed_url_ttl)
+                self.url_cache.set(filename, url, ttl)
+        return url
+
+    def _sign_urls(self, filenames: list[str]) -> list[str]:
+        expiration = self.blob_access_expiration
+        return [self._sign_url(filename, expiration) for filename in filenames]
+
+    async def get_signed_urls(self, filenames: list[str]) -> list[str]:
+        """
+        Signed urls of the files, in the same order
+        Looks up the process cache then redis, the missing urls are signed
+        in a worker thread to keep the RSA signatures off the event loop
+        """
+        urls = {
+            filename: self.url_cache.get(filename) for filename in filenames
+        }
+        missing = [filename for filename, url in urls.items() if url is None]
+        caching = self.signed_url_ttl > 0
+
+        if missing and caching and self.cache is not None:
+            keys = [self.signed_url_cache_key(f) for f in missing]
+            cached = await self.cache.mget_with_ttl(keys)
+            for filename, (url, remaining) in zip(missing, cached, strict=True):
+                if url:
+                    # The url may have been signed long ago by another process
+                    urls[filename] = url
+                    ttl = self.signed_url_local_ttl(remaining)
+                    self.url_cache.set(filename, url, ttl)
+            missing = [f for f in missing if urls[f] is None]
+
+        if missing:
+            signed = await asyncio.to_thread(self._sign_urls, missing)
+            new_urls = dict(zip(missing, signed, strict=True))
+            urls.update(new_urls)
+            if caching:
+                ttl = self.signed_url_local_ttl(self.signed_url_ttl)
+                for filename, url in new_urls.items():
+                    self.url_cache.set(filename, url, ttl)
+            if caching and self.cache is not None:
+                values = {
+                    self.signed_url_cache_key(filename): url
+                    for filename, url in new_urls.items()
+                }
+                await self.cache.set_many(values, self.signed_url_ttl)
+
+        return [urls[filename] or "" for filename in filenames]
 
+    def _to_upload(
+        self, param: FileToUpload | UploadFile | str, destination: str
+    ) -> tuple[FileToUpload, str]:
+        """
+        The file to upload and its unique blob name
+        In content addressed mode the name is the hash of the content
+        and the destination is ignored
+        """
         if isinstance(param, str):
             file = FileToUpload.from_path(param)
         elif isinstance(param, UploadFile):
@@ -120,15 +548,138 @@ class CloudStorage:
         else:
             file = param
 
-        ext = os.path.splitext(file.name)[1]
-        base_filename = os.path.splitext(destination or file.name)[0]
-        filename = f"{base_filename}_{uuid.uuid4().hex}{ext}".lower()
+        if self.content_addressed:
+            return file, self.content_filename(file)
+        return file, self.new_filename(file.name, destination)
 
-        blob = self.bucket.blob(filename)
-        blob.upload_from_string(file.buffer, content_type=file.mimetype)
+    def content_filename(self, file: FileToUpload) -> str:
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        ext = os.path.splitext(file.name)[1].lower()
+        return f"{self.CONTENT_PREFIX}{digest.hexdigest()}{ext}"
+
+    def new_filename(self, name: str, destination: str = "") -> str:
+        """A unique blob name keeping the extension of the file"""
+        ext = os.path.splitext(name)[1]
+        base_filename = os.path.splitext(destination or name)[0]
+        return f"{base_filename}_{uuid.uuid4().hex}{ext}".lower()
+
+    def variant_filename(self, filename: str, variant: str, ext: str) -> str:
+        """The blob name of a resized copy of the file"""
+        return f"{os.path.splitext(filename)[0]}@{variant}.{ext}"
+
+    def get_upload_url(
+        self, filename: str, content_type: str, expiration: int | None = None
+    ) -> SignedUpload:
+        """
+        Let a client upload the file straight to the bucket
+        The content type and the size range are part of the V4 signature
+        """
+        expiration = expiration or self.blob_access_expiration
+        # GCS rejects the uploads out of the range
+        size_range = {
+            "x-goog-content-length-range": f"1,{FileToUpload.max_bytes()}"
+        }
+        headers = {"Content-Type": content_type, **size_range}
 
-        # We have just created the blob so blob.name should be an str
-        return blob.name  # type: ignore
+        if self.is_emulator:
+            # The emulator does not check signatures, it takes media uploads
+            api_url = f"{self.emulator_public_url}/upload/storage/v1"
+            name = quote(filename, safe="")
+            url = (
+                f"{api_url}/b/{self.bucket_name}/o?uploadType=media&name={name}"
+            )
+            return SignedUpload(
+                url=url,
+                method="POST",
+                headers=headers,
+                filename=filename,
+                expires_in=expiration,
+            )
+
+        url = self.bucket.blob(filename).generate_signed_url(
+            version="v4",
+            expiration=datetime.now(UTC) + timedelta(seconds=expiration),
+            method="PUT",
+            content_type=content_type,
+            headers=size_range,
+        )
+        return SignedUpload(
+            url=url,
+            method="PUT",
+            headers=headers,
+            filename=filename,
+            expires_in=expiration,
+        )
+
+    def upload_file(
+        self,
+        param: FileToUpload | UploadFile | str | None,
+        destination: str = "",
+    ) -> str:
+        if not param:
+            return ""
+
+        file, filename = self._to_upload(param, destination)
+        if self.content_addressed and self.bucket.blob(filename).exists():
+            # Same content already stored
+            return filename
+
+        self.upload_blob(filename, file)
+        return filename
+
+    def upload_blob(self, filename: str, file: FileToUpload) -> None:
+        """
+        Files larger than the chunk size are sent in a resumable upload
+        one chunk at a time, instead of being loaded in memory
+        """
+        if file.file is None:
+            blob = self.bucket.blob(filename)
+            blob.upload_from_string(file.buffer, content_type=file.mimetype)
+            return
+
+        if file.size > file.max_bytes():
+            raise ApiError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f"File too large (> {file.MAX_SIZE} MB)",
+            )
+        blob = self.bucket.blob(filename, chunk_size=file.CHUNK_SIZE)
+        file.file.seek(0)
+        blob.upload_from_file(
+            file.file, content_type=file.mimetype, size=file.size
+        )
+
+    async def upload_file_async(
+        self,
+        param: FileToUpload | UploadFile | str | None,
+        destination: str = "",
+        lock: Callable[[str], Awaitable[None]] | None = None,
+    ) -> str:
+        """
+        In content addressed mode, lock is awaited with the filename before
+        reusing a stored file: it must keep the deletions of the file
+        waiting until the record referencing it is committed
+        """
+        if not param:
+            return ""
+
+        # Hashing the content is CPU bound
+        file, filename = await asyncio.to_thread(
+            self._to_upload, param, destination
+        )
+        if self.content_addressed:
+            if lock is not None:
+                await lock(filename)
+            if await self.backend.exists(filename):
+                # Same content already stored
+                return filename
+
+        await self.backend.upload(filename, file)
+        return filename
+
+    def download_file(self, filename: str) -> bytes:
+        return self.bucket.blob(filename).download_as_bytes()
 
     def delete_file(self, filename: str) -> bool:
         try:
@@ -138,3 +689,60 @@ class CloudStorage:
         except NotFound:
             # 404 error when the filename does not exist
             return False
+
+    def list_files(
+        self, start_offset: str, limit: int, created_before: datetime
+    ) -> tuple[list[str], str]:
+        """
+        One page of the bucket listing, in the names order
+        Returns the files created before the date and the last listed name
+        to start the next page from, empty when the listing is over
+        """
+        blobs = self.storage.list_blobs(
+            self.bucket,
+            start_offset=start_offset or None,
+            max_results=limit + 1,
+        )
+        names: list[str] = []
+        listed: list[str] = []
+        for blob in blobs:
+            # start_offset is inclusive
+            if blob.name == start_offset:
+                continue
+            if len(listed) == limit:
+                break
+            listed.append(blob.name)
+            if blob.time_created and blob.time_created < created_before:
+                names.append(blob.name)
+
+        more = len(listed) == limit
+        return names, listed[-1] if more and listed else ""
+
+    def delete_files(self, filenames: list[str]) -> None:
+        """Delete the files with one batch request per DELETE_BATCH_SIZE"""
+        if self.is_emulator:
+            # The emulator does not implement the batch API
+            for filename in filenames:
+                self.delete_file(filename)
+            return
+
+        for i in range(0, len(filenames), self.DELETE_BATCH_SIZE):
+            # Missing files are ignored like in delete_file
+            with self.storage.batch(raise_exception=False):
+                for filename in filenames[i : i + self.DELETE_BATCH_SIZE]:
+                    self.bucket.blob(filename).delete()
+
+    async def file_exists_async(self, filename: str) -> bool:
+        return await self.backend.exists(filename)
+
+    async def file_stat_async(self, filename: str) -> StoredFile | None:
+        return await self.backend.stat(filename)
+
+    async def delete_file_async(self, filename: str) -> bool:
+        return await self.backend.delete(filename)
+
+    async def delete_files_async(self, filenames: list[str]) -> list[str]:
+        """Returns the filenames that could not be deleted"""
+        if not filenames:
+            return []
+        return await self.backend.delete_many(filenames)
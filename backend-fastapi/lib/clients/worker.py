@@ -40,8 +40,9 @@ class TaskPublisher:
 
         set_broker(self._broker)
 
-    def send(self, message: Message) -> None:
-        self.broker.enqueue(message)
+    def send(self, message: Message, delay: int | None = None) -> None:
+        """delay is in milliseconds"""
+        self.broker.enqueue(message, delay=delay)
 
     def close(self):
         self.broker.close()
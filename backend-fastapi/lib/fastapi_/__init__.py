@@ -1,3 +1,4 @@
 from lib.fastapi_.errors import *
 from lib.fastapi_.json import *
+from lib.fastapi_.streaming import *
 from lib.fastapi_.types import *
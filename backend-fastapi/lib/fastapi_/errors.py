@@ -9,7 +9,4 @@ async def catch_exceptions(request: Request, call_next: CallNext) -> Response:
     try:
         return await call_next(request)
     except ApiError as e:
-        data: dict = dict(error=True, message=e.message)
-        if e.details:
-            data["details"] = e.details
-        return JSONResponse(data, e.code)
+        return JSONResponse(e.to_dict(), e.code)
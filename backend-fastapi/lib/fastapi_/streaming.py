@@ -0,0 +1,325 @@
+import codecs
+from collections.abc import AsyncIterator
+import csv
+from datetime import date, datetime
+from http import HTTPStatus
+import io
+import json
+import re
+from types import NoneType, UnionType
+from typing import Annotated, Any, Union, get_args, get_origin
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+import pyarrow as pa
+from pydantic import BaseModel, EmailStr
+from pydantic_core import to_json
+
+from ..types_ import ApiError, ExportFormat
+
+type Batches = AsyncIterator[list[dict]]
+
+type Chunks = AsyncIterator[bytes]
+
+
+async def encode_ndjson(batches: Batches) -> AsyncIterator[bytes]:
+    async for batch in batches:
+        if batch:
+            yield b"\n".join(to_json(row) for row in batch) + b"\n"
+
+
+def _csv_cell(val):
+    # nested fields (location, places...) are serialized as json
+    if isinstance(val, (dict, list)):
+        return to_json(val).decode()
+    if isinstance(val, datetime):
+        return val.isoformat()
+    return val
+
+
+async def encode_csv(batches: Batches) -> AsyncIterator[bytes]:
+    header: list[str] | None = None
+    async for batch in batches:
+        if not batch:
+            continue
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header is None:
+            header = list(batch[0].keys())
+            writer.writerow(header)
+        for row in batch:
+            writer.writerow([_csv_cell(row.get(key)) for key in header])
+        yield buffer.getvalue().encode()
+
+
+_ARROW_SCALARS: list[tuple[type, pa.DataType]] = [
+    # bool before int, bool is a subclass of int
+    (bool, pa.bool_()),
+    (int, pa.int64()),
+    (float, pa.float64()),
+    (str, pa.string()),
+    (datetime, pa.timestamp("us", tz="UTC")),
+    (date, pa.date32()),
+]
+
+
+def _arrow_type(annotation: Any) -> pa.DataType:
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Annotated:
+        return _arrow_type(args[0])
+    if origin in (Union, UnionType):
+        # Every arrow field is nullable, Optional only is supported
+        types = [arg for arg in args if arg is not NoneType]
+        if len(types) == 1:
+            return _arrow_type(types[0])
+    elif origin is list:
+        return pa.list_(_arrow_type(args[0]))
+    elif origin is dict:
+        return pa.map_(_arrow_type(args[0]), _arrow_type(args[1]))
+    elif annotation is EmailStr:
+        return pa.string()
+    elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(
+            [
+                (name, _arrow_type(field.annotation))
+                for name, field in annotation.model_fields.items()
+            ]
+        )
+    elif isinstance(annotation, type):
+        for python_type, arrow_type in _ARROW_SCALARS:
+            if issubclass(annotation, python_type):
+                return arrow_type
+
+    raise TypeError(f"No arrow type for {annotation}")
+
+
+def arrow_schema(model: type[BaseModel], fields: list[str]) -> pa.Schema:
+    """The schema of the exported fields (and id) of a read schema"""
+    names = fields if "id" in fields else [*fields, "id"]
+    return pa.schema(
+        [
+            (name, _arrow_type(model.model_fields[name].annotation))
+            for name in names
+        ]
+    )
+
+
+async def encode_arrow(
+    batches: Batches, schema: pa.Schema
+) -> AsyncIterator[bytes]:
+    """
+    The schema is known before the first batch: inferring it from the data
+    fails in the middle of the stream when a later batch infers differently
+    (all null then strings, int then float...)
+    """
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    async for batch in batches:
+        if not batch:
+            continue
+
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+
+        # Flushing what was written so far
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+
+    writer.close()
+    yield sink.getvalue()
+
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+
+def stream_batches(
+    batches: Batches,
+    format_: ExportFormat,
+    filename: str,
+    model: type[BaseModel],
+    fields: list[str],
+) -> StreamingResponse:
+    """
+    Stream the batches with the requested format
+    model and fields are the read schema and the selected fields of the rows
+    Starlette awaits each chunk to be sent before pulling the next one,
+    so slow clients slow down the batches production instead of buffering
+    """
+    chunks: Chunks
+    if format_ == ExportFormat.ARROW:
+        # Unknown types fail here, before the response starts
+        chunks = encode_arrow(batches, arrow_schema(model, fields))
+    elif format_ == ExportFormat.CSV:
+        chunks = encode_csv(batches)
+    else:
+        chunks = encode_ndjson(batches)
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.{format_}"'
+    }
+    return StreamingResponse(
+        chunks, media_type=MEDIA_TYPES[format_], headers=headers
+    )
+
+
+# Streamed request bodies
+
+
+def _invalid_row(message: str) -> ApiError:
+    return ApiError(
+        HTTPStatus.BAD_REQUEST, "Invalid row", dict(message=message)
+    )
+
+
+async def decode_ndjson(chunks: Chunks) -> AsyncIterator[Any]:
+    """
+    Yield the rows of a ndjson body as soon as their line is complete
+    A malformed line yields an ApiError and the next lines are still read
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as err:
+                    yield _invalid_row(str(err))
+
+    if buffer.strip():
+        try:
+            yield json.loads(buffer)
+        except ValueError as err:
+            yield _invalid_row(str(err))
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Strings (complete or not) and the structural characters of json
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{},]')
+_OPENING = {"]": "[", "}": "{"}
+
+
+def _invalid_item(index: int, message: str) -> ApiError:
+    return ApiError(
+        HTTPStatus.UNPROCESSABLE_ENTITY,
+        "Invalid item",
+        dict(index=index, message=message),
+    )
+
+
+def _value_end(buffer: str, pos: int) -> int | None:
+    """
+    Position after the json value starting at pos, only the brackets and
+    strings are checked. None if the value may continue in the next chunks
+    """
+    stack: list[str] = []
+    for match in _TOKEN.finditer(buffer, pos):
+        token = match.group()
+        if token == '"':
+            # Unterminated string
+            return None
+        if token in "[{":
+            stack.append(token)
+        elif token in "]}":
+            if not stack:
+                # Closing the array: end of a scalar
+                return match.start()
+            if stack.pop() != _OPENING[token] or not stack:
+                return match.end()
+        elif token == ",":
+            if not stack:
+                return match.start()
+        elif not stack:
+            # A string item
+            return match.end()
+    return None
+
+
+async def decode_json_array(chunks: Chunks) -> AsyncIterator[Any]:
+    """
+    Yield the items of a json array body as soon as they are complete
+    A malformed item yields a 422 ApiError with its index once its end is
+    found, and the next items are still read
+    Only a body that is not a json array raises, before any item
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    index = 0
+
+    async def chunks_then_eof() -> AsyncIterator[tuple[str, bool]]:
+        async for chunk in chunks:
+            yield utf8.decode(chunk), False
+        yield utf8.decode(b"", final=True), True
+
+    async for text, eof in chunks_then_eof():
+        buffer += text
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()  # type: ignore[union-attr]
+            if pos == len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ApiError(
+                        HTTPStatus.BAD_REQUEST, "Body must be a json array"
+                    )
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except ValueError as err:
+                # Incomplete items wait for the next chunks, not broken ones
+                skip = _value_end(buffer, pos)
+                if skip is None and not eof:
+                    break
+                yield _invalid_item(index, str(err))
+                if skip is None:
+                    # Truncated body, nothing left to read
+                    return
+                index += 1
+                # A stray closing bracket is skipped on its own
+                pos = max(skip, pos + 1)
+                continue
+
+            # A number may continue in the next chunk, 1 then .5
+            numeric = isinstance(item, (int, float))
+            if numeric and not eof and _value_end(buffer, pos) is None:
+                break
+
+            yield item
+            index += 1
+            pos = end
+
+        buffer = buffer[pos:]
+
+    if not started:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a json array")
+    yield _invalid_row("Unterminated json array")
+
+
+def decode_rows(request: Request) -> AsyncIterator[Any]:
+    """Decode a ndjson or json array body row by row, without buffering it"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/x-ndjson"):
+        return decode_ndjson(request.stream())
+    return decode_json_array(request.stream())
@@ -86,6 +86,18 @@ def _string_filter_validator(
     )
 
 
+def _text_search_filter_validator(
+    op: FilterOperation, raw: str, adapter: TypeAdapter
+) -> Filter:
+    if op == "search":
+        val = adapter.validate_python(raw)
+        return Filter(op=op, val=val)
+    raise PydanticCustomError(
+        "invalid text search operation",
+        f"{op} is not a valid operation for text search fields - Valid: search",
+    )
+
+
 def _boolean_filter_validator(
     op: FilterOperation, raw: str, adapter: TypeAdapter
 ) -> Filter:
@@ -141,6 +153,7 @@ def _make_filter_validator(real_type: Any):
     annotations = _get_field_info(real_type)
     json_schema_extra = getattr(annotations, "json_schema_extra", {})
     is_index: bool = json_schema_extra.get("is_index", False)
+    is_text_search: bool = json_schema_extra.get("is_text_search", False)
     adapter = TypeAdapter(real_type)
 
     if base_class not in [int, float, str, EmailStr, bool, datetime]:
@@ -166,6 +179,8 @@ def _make_filter_validator(real_type: Any):
 
         if base_class in [int, float]:
             return _numeric_filter_validator(op, raw_val, adapter, is_index)
+        if is_text_search:
+            return _text_search_filter_validator(op, raw_val, adapter)
         if base_class in [str, EmailStr]:
             return _string_filter_validator(op, raw_val, adapter)
         if base_class in [bool]:
@@ -1,9 +1,9 @@
-from typing import Annotated, cast
+from typing import Annotated, ClassVar, cast
 
 from fastapi import Query
 from pydantic import BaseModel, Field
 
-from lib.types_ import SearchQuery, WhereFilters
+from lib.types_ import CountStrategy, SearchQuery, WhereFilters
 
 type FieldsQuery[T: str] = Annotated[
     list[T] | None,
@@ -19,8 +19,30 @@ class BaseSearchSchema[
     SortableFields: str,
     SearchableFields: str,
 ](BaseModel):
+    # Fields that are not filters of the search
+    QUERY_PARAMS: ClassVar[tuple[str, ...]] = (
+        "page",
+        "size",
+        "cursor",
+        "count",
+        "sort",
+        "fields",
+    )
+
     page: Annotated[int, Field(description="The page number")] = 1
     size: Annotated[int, Field(description="Items per page")] = 100
+    cursor: Annotated[
+        str | None,
+        Field(
+            description="The next_cursor of a previous page. Takes precedence over page",
+        ),
+    ] = None
+    count: Annotated[
+        CountStrategy | None,
+        Field(
+            description="How total_count is computed. Use 'none' to skip it",
+        ),
+    ] = None
     sort: Annotated[
         list[SortableFields] | None,
         Field(
@@ -41,7 +63,7 @@ class BaseSearchSchema[
     ) -> SearchQuery[SelectableFields, SortableFields, SearchableFields]:
         where = {}
         for field_name in self.__class__.model_fields:
-            if field_name not in ["page", "size", "sort", "fields"]:
+            if field_name not in self.QUERY_PARAMS:
                 val = getattr(self, field_name)
                 if val is not None:
                     where[field_name] = val
@@ -49,6 +71,8 @@ class BaseSearchSchema[
         return SearchQuery[SelectableFields, SortableFields, SearchableFields](
             page=self.page,
             size=self.size,
+            cursor=self.cursor,
+            count=self.count,
             select=self.fields,
             orderby=self.sort,
             where=cast(WhereFilters[SearchableFields], where),
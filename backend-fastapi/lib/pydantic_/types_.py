@@ -16,6 +16,7 @@ class FieldMeta:
         filter_examples: list | None = None,
         is_file: bool = False,
         is_index: bool = False,
+        is_text_search: bool = False,
     ):
         # Metatdata
         self.default = default
@@ -26,6 +27,7 @@ class FieldMeta:
         self.filter_examples = filter_examples
         self.is_file = is_file
         self.is_index = is_index
+        self.is_text_search = is_text_search
 
         # HTTP Fields
         self.info = self._build_field()
@@ -46,6 +48,8 @@ class FieldMeta:
             json_schema_extra["filter_examples"] = self.filter_examples
         if self.is_index:
             json_schema_extra["is_index"] = self.is_index
+        if self.is_text_search:
+            json_schema_extra["is_text_search"] = self.is_text_search
         if json_schema_extra:
             metadata["json_schema_extra"] = json_schema_extra
 
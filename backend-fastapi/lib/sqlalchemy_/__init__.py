@@ -2,3 +2,4 @@ from lib.sqlalchemy_.cruds import *
 from lib.sqlalchemy_.model import *
 from lib.sqlalchemy_.types import *
 from lib.sqlalchemy_.utils import *
+from lib.sqlalchemy_.vector import *
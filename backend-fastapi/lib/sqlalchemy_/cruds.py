@@ -1,16 +1,34 @@
 import asyncio
-from collections.abc import Mapping
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+from functools import cache, partial
+import hashlib
 from http import HTTPStatus
+from inspect import isawaitable
+import json
 from typing import Any, cast, get_args
 
 from pydantic import BaseModel as PydanticBaseModel
-from sqlalchemy import Select, delete, func, select, update
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import (
+    Row,
+    Select,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    update,
+)
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import InstrumentedAttribute
 
+from ..clients.redis_ import RedisClient
 from ..types_ import (
     ApiError,
+    BulkCreateResult,
+    BulkRowResult,
+    CountStrategy,
     Filter,
     PaginatedDict,
     PaginationData,
@@ -18,8 +36,30 @@ from ..types_ import (
     WhereFilters,
 )
 from .model import BaseModel
-from .types import SelectField
-from .utils import apply_order_by, apply_select, apply_where
+from .types import KeysetCursor, OrderBy, RecordsPage, SelectField
+from .utils import (
+    apply_keyset,
+    apply_order_by,
+    apply_select,
+    apply_where,
+    statement_cache,
+    where_params,
+    where_shape,
+)
+
+
+@cache
+def _schema_version(schema: type[PydanticBaseModel]) -> str:
+    # Changing the Read schema changes the cache keys of its records
+    dumped = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return hashlib.sha1(dumped.encode()).hexdigest()[:8]
+
+
+@cache
+def _list_adapter[T: PydanticBaseModel](
+    schema: type[T],
+) -> TypeAdapter[list[T]]:
+    return TypeAdapter(list[schema])  # type: ignore[valid-type]
 
 
 class CrudsClass[
@@ -42,6 +82,29 @@ class CrudsClass[
 
     MAX_ITEMS_PER_PAGE = 100
     POST_PROCESSING_BATCH_SIZE = 50
+    # Fetch the records, sort keys and count in one statement when possible
+    SINGLE_ROUNDTRIP_SEARCH = True
+    # Rows fetched per roundtrip by the server side cursor of streams
+    STREAM_BATCH_SIZE = 1000
+    # Used by paginate when the query does not specify a count strategy
+    COUNT_STRATEGY: CountStrategy = "exact"
+    # Estimates below this threshold are replaced by an exact count
+    COUNT_ESTIMATE_THRESHOLD = 10_000
+    # Tables written by database cascades when deleting a record
+    CASCADED_TABLES: tuple[str, ...] = ()
+    # Reuse the statements built for the same query shape
+    CACHE_STATEMENTS = True
+    # Read partial data as column tuples instead of ORM entities when possible
+    COLUMNS_FAST_PATH = True
+    # Seconds the full records are cached in self.cache, None to disable
+    RECORD_CACHE_TTL: int | None = None
+    # Rows per multi-row INSERT ... RETURNING of create_many
+    CREATE_BATCH_SIZE = 500
+    # Rows touched per statement by update_where and delete_where
+    WRITE_CHUNK_SIZE = 1000
+    # Columns returned to after_update_many/after_delete_many, besides id
+    UPDATE_RETURNING: tuple[str, ...] = ()
+    DELETE_RETURNING: tuple[str, ...] = ()
 
     def __init__(
         self,
@@ -49,11 +112,13 @@ class CrudsClass[
         model: type[DbModel],
         default_select: list[Selectables],
         default_orderby: list[Sortables],
+        cache: RedisClient | None = None,
     ):
         self.session = session
         self.model = model
         self.default_select = default_select
         self.default_orderby = default_orderby
+        self.cache = cache
 
         # Extracting the Pydantic models
         orig_base = self.__class__.__orig_bases__[0]  # type: ignore[attr-defined]
@@ -80,6 +145,9 @@ class CrudsClass[
             13
         ]  # DeleteContext PydanticBaseModel
 
+        # Callbacks waiting for the current transaction to be committed
+        self._commit_hooks: list[Callable[[], Any]] = []
+
     @property
     def tablename(self) -> str:
         return self.model.__tablename__
@@ -107,6 +175,27 @@ class CrudsClass[
             f"No record with id {id_} found in {self.model_name}s",
         )
 
+    # Transactions
+
+    def on_commit(self, callback: Callable[[], Any]) -> None:
+        """
+        Run the callback (sync or async) once the current transaction is
+        committed, dropped on rollback. The after_* hooks run before the
+        commit: jobs and cache invalidations must not see uncommitted rows
+        """
+        self._commit_hooks.append(callback)
+
+    async def run_commit_hooks(self) -> None:
+        hooks, self._commit_hooks = self._commit_hooks, []
+        for hook in hooks:
+            result = hook()
+            if isawaitable(result):
+                await result
+
+    async def rollback(self) -> None:
+        self._commit_hooks.clear()
+        await self.session.rollback()
+
     # Serialization and Post-Processing
 
     def _serialize_to_dict(self, record: DbModel) -> dict:
@@ -116,6 +205,10 @@ class CrudsClass[
         data = record.to_dict()
         return self.read_schema.model_validate(data)
 
+    def _validate_reads(self, rows: list[dict]) -> list[Read]:
+        """Validate a batch of rows in one call"""
+        return _list_adapter(self.read_schema).validate_python(rows)
+
     async def post_process(self, raw: Read) -> Read:
         """Override this when subclassing"""
         return raw
@@ -156,9 +249,13 @@ class CrudsClass[
 
     # Query Building
 
-    def map_orderby(self, field: str) -> InstrumentedAttribute:
+    def map_orderby(
+        self, field: str, where: WhereFilters[Searchables] | None = None
+    ) -> InstrumentedAttribute:
         """
         override this method when subclassing for custom behavior
+        where are the filters of the query, for the sort keys depending
+        on them (a text search rank)
         """
         # some fields maybe attributes in a JSONB column
         return getattr(self.model, field)
@@ -183,27 +280,170 @@ class CrudsClass[
     def in_(self, val: list[Any]) -> list[Filter]:
         return [{"op": "in", "val": val}]
 
+    def with_tiebreaker(self, orderby: list[str]) -> list[str]:
+        """Append the id to the order by clauses so that the sort is total"""
+        if any(OrderBy.from_string(clause).field == "id" for clause in orderby):
+            return list(orderby)
+        desc = len(orderby) > 0 and orderby[0].startswith("-")
+        return [*orderby, "-id" if desc else "id"]
+
+    def decode_cursor(self, cursor: str, orderby: list[str]) -> KeysetCursor:
+        """Raise a 400 Bad Request ApiError if the cursor is not valid"""
+        try:
+            decoded = KeysetCursor.decode(cursor)
+        except ValueError as err:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor") from err
+
+        if decoded.orderby != orderby:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                "Invalid cursor",
+                dict(
+                    message=f"The cursor was built for sort {decoded.orderby}, not {orderby}"
+                ),
+            )
+        return decoded
+
+    def needs_joins(self, fields: list[Selectables]) -> bool:
+        """Whether some of the selected fields are loaded by extra queries"""
+        return any(
+            select_field.joins
+            for field in fields
+            for select_field in self.map_select(field)
+        )
+
+    def select_columns(self, fields: list[Selectables]) -> list[str] | None:
+        """
+        The columns to read for the fields, in the order used by to_dict
+        None if some fields are not plain columns of the model (joins...)
+        """
+        if not self.COLUMNS_FAST_PATH:
+            return None
+
+        wanted = {"id"}
+        for field in fields:
+            for select_field in self.map_select(field):
+                attr = select_field.select
+                if select_field.joins or attr.class_ is not self.model:
+                    return None
+                wanted.add(attr.key)
+
+        keys = self.model.column_keys()
+        if not wanted.issubset(keys):
+            return None
+        return [key for key in keys if key in wanted]
+
+    def build_cached(
+        self,
+        shape: tuple,
+        build: Callable[[], Select],
+        where: WhereFilters[Searchables] | None,
+    ) -> Select:
+        """Reuse the statement built for the same query shape if any"""
+        if not self.CACHE_STATEMENTS:
+            return build()
+        key = (self.__class__, *shape)
+        return statement_cache.get_or_build(key, build, where_params(where))
+
+    def build_page_query(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        with_records: bool = False,
+        with_total: bool = False,
+        columns: list[str] | None = None,
+    ) -> Select:
+        """
+        Select the ids (the records or the columns) and the sort keys of a page
+        with_total adds the number of matching rows as a window function
+        Seek after query.cursor if provided, else skip the previous pages
+        One extra row is fetched to know whether a next page exists
+        """
+        orderby = self.with_tiebreaker(
+            cast(list[str], query.orderby or self.default_orderby)
+        )
+        fields = cast(list[str], query.select or self.default_select)
+        map_orderby = partial(self.map_orderby, where=query.where)
+
+        def build() -> Select:
+            keys = [
+                map_orderby(OrderBy.from_string(clause).field).label(f"key_{i}")
+                for i, clause in enumerate(orderby)
+            ]
+            if with_total:
+                keys.append(func.count().over().label("total_count"))
+
+            # Apply select
+            if columns:
+                selected = [getattr(self.model, c) for c in columns]
+                stmt = select(*selected, *keys)
+            elif with_records:
+                stmt = select(self.model, *keys)
+                stmt = apply_select(stmt, fields, self.map_select)
+            else:
+                stmt = select(self.model.id, *keys)
+
+            # Apply where
+            if query.where and len(query.where) > 0:
+                stmt = apply_where(stmt, query.where, self.map_where)
+
+            # Apply orderby
+            return apply_order_by(stmt, orderby, map_orderby)
+
+        shape = (
+            "page",
+            with_total,
+            tuple(fields) if with_records else None,
+            tuple(columns or ()),
+            where_shape(query.where),
+            tuple(orderby),
+        )
+        stmt = self.build_cached(shape, build, query.where)
+
+        # Apply seek or skip
+        size = query.size or self.MAX_ITEMS_PER_PAGE
+        if query.cursor:
+            cursor = self.decode_cursor(query.cursor, orderby)
+            try:
+                stmt = apply_keyset(stmt, orderby, cursor.values, map_orderby)
+            except ValueError as err:
+                raise ApiError(
+                    HTTPStatus.BAD_REQUEST, "Invalid cursor"
+                ) from err
+        else:
+            pagination = PaginationData(query.page or 1, size)
+            stmt = stmt.offset(pagination.skip)
+
+        return stmt.limit(size + 1)
+
     def build_select_query(
         self, query: SearchQuery[Selectables, Sortables, Searchables]
     ) -> Select:
-        stmt = select(self.model)
-
-        # Apply select
         if not query.select or len(query.select) == 0:
             query.select = self.default_select
-        stmt = apply_select(
-            stmt, cast(list[str], query.select), self.map_select
+        fields = cast(list[str], query.select)
+        orderby = cast(list[str], query.orderby or [])
+        map_orderby = partial(self.map_orderby, where=query.where)
+
+        def build() -> Select:
+            # Apply select
+            stmt = apply_select(select(self.model), fields, self.map_select)
+
+            # Apply where
+            if query.where and len(query.where) > 0:
+                stmt = apply_where(stmt, query.where, self.map_where)
+
+            # Apply orderby
+            if len(orderby) > 0:
+                stmt = apply_order_by(stmt, orderby, map_orderby)
+            return stmt
+
+        shape = (
+            "select",
+            tuple(fields),
+            where_shape(query.where),
+            tuple(orderby),
         )
-
-        # Apply where
-        if query.where and len(query.where) > 0:
-            stmt = apply_where(stmt, query.where, self.map_where)
-
-        # Apply orderby
-        if query.orderby and len(query.orderby) > 0:
-            stmt = apply_order_by(
-                stmt, cast(list[str], query.orderby), self.map_orderby
-            )
+        stmt = self.build_cached(shape, build, query.where)
 
         # Apply limit
         if query.size:
@@ -218,12 +458,69 @@ class CrudsClass[
 
         return stmt
 
+    def build_columns_query(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        columns: list[str],
+    ) -> Select:
+        """Same as build_select_query, selecting columns instead of records"""
+        orderby = cast(list[str], query.orderby or [])
+        map_orderby = partial(self.map_orderby, where=query.where)
+
+        def build() -> Select:
+            stmt = select(*[getattr(self.model, c) for c in columns])
+            if query.where and len(query.where) > 0:
+                stmt = apply_where(stmt, query.where, self.map_where)
+            if len(orderby) > 0:
+                stmt = apply_order_by(stmt, orderby, map_orderby)
+            return stmt
+
+        shape = ("columns", tuple(columns), where_shape(query.where))
+        stmt = self.build_cached((*shape, tuple(orderby)), build, query.where)
+        if query.size:
+            stmt = stmt.limit(query.size)
+        return stmt
+
+    def build_chunk_query(
+        self, where: WhereFilters[Searchables] | None, last_id: int
+    ) -> Select:
+        """The ids of the next chunk to process by update_where/delete_where"""
+        stmt = select(self.model.id)
+        if where:
+            stmt = apply_where(stmt, where, self.map_where)
+        return (
+            stmt.where(self.model.id > last_id)
+            .order_by(self.model.id)
+            .limit(self.WRITE_CHUNK_SIZE)
+        )
+
+    def returning(self, fields: tuple[str, ...]) -> list[InstrumentedAttribute]:
+        return [self.model.id, *(getattr(self.model, f) for f in fields)]
+
     # Create
 
+    def to_row(self, data: Create) -> dict:
+        """Overload this when subclassing if required"""
+        return data.model_dump(exclude_unset=True, exclude_none=True)
+
     def to_model(self, data: Create) -> DbModel:
         """Overload this when subclassing if required"""
-        d = data.model_dump(exclude_unset=True, exclude_none=True)
-        return self.model(**d)
+        return self.model(**self.to_row(data))
+
+    def create_error(self, err: Exception) -> ApiError:
+        if isinstance(err, ApiError):
+            return err
+
+        if (
+            isinstance(err, IntegrityError)
+            and "duplicate key" in str(err.orig).lower()
+        ):
+            return ApiError(HTTPStatus.CONFLICT, "Record already exists")
+
+        return ApiError(
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            f"Could not create {self.model_name} object: {err!s}!",
+        )
 
     async def create(self, data: Create) -> int:
         """Create from a create form, return id"""
@@ -235,25 +532,13 @@ class CrudsClass[
             entity_id = cast(int, entity.id)
             await self.after_create(entity_id, data, context)
             await self.session.commit()
-            return entity_id
         except Exception as err:
-            await self.session.rollback()
-
-            if isinstance(err, ApiError):
-                raise err
-
-            if (
-                isinstance(err, IntegrityError)
-                and "duplicate key" in str(err.orig).lower()
-            ):
-                raise ApiError(
-                    HTTPStatus.CONFLICT, "Record already exists"
-                ) from err
+            await self.rollback()
+            raise self.create_error(err) from err
 
-            raise ApiError(
-                HTTPStatus.INTERNAL_SERVER_ERROR,
-                f"Could not create {self.model_name} object: {err!s}!",
-            ) from err
+        await self.run_commit_hooks()
+        await self.bump_write_version()
+        return entity_id
 
     async def before_create(self, data: Create) -> CreateContext:
         """Overload this to run code before create"""
@@ -264,6 +549,57 @@ class CrudsClass[
     ) -> None:
         """Overload this to run code after create"""
 
+    async def _insert_batch(self, data: list[Create]) -> list[int]:
+        """One multi-row INSERT ... RETURNING id, hooks run once per batch"""
+        contexts = await self.before_create_many(data)
+        stmt = insert(self.model).returning(
+            self.model.id, sort_by_parameter_order=True
+        )
+        result = await self.session.scalars(
+            stmt, [self.to_row(item) for item in data]
+        )
+        ids = list(result)
+        await self.after_create_many(ids, data, contexts)
+        return ids
+
+    async def create_many(self, data: list[Create]) -> list[int]:
+        """
+        Create from a list of create forms in batches, return ids
+        All the records are created in one transaction, or none
+        """
+        ids: list[int] = []
+        try:
+            for i in range(0, len(data), self.CREATE_BATCH_SIZE):
+                batch = data[i : i + self.CREATE_BATCH_SIZE]
+                ids.extend(await self._insert_batch(batch))
+            await self.session.commit()
+        except Exception as err:
+            await self.rollback()
+            raise self.create_error(err) from err
+
+        await self.run_commit_hooks()
+        await self.bump_write_version()
+        return ids
+
+    async def before_create_many(
+        self, data: list[Create]
+    ) -> list[CreateContext]:
+        """
+        Overload this to run code once before each batch of create_many
+        Runs before_create on each record by default
+        """
+        return [await self.before_create(item) for item in data]
+
+    async def after_create_many(
+        self, ids: list[int], data: list[Create], contexts: list[CreateContext]
+    ) -> None:
+        """
+        Overload this to run code once after each batch of create_many
+        Runs after_create on each record by default
+        """
+        for id_, item, context in zip(ids, data, contexts, strict=True):
+            await self.after_create(id_, item, context)
+
     async def post_to_create(self, data: Post) -> Create:
         """Update this when subclassing if needed"""
         return self.create_schema.model_construct(**data.__dict__)
@@ -285,6 +621,199 @@ class CrudsClass[
         await self.auth_post(user, form)
         return await self.post(form, options)
 
+    async def post_many(self, forms: list[Post]) -> list[int]:
+        """create from a list of post forms, return ids"""
+        data = [await self.post_to_create(form) for form in forms]
+        return await self.create_many(data)
+
+    async def user_post_many(self, user: User, forms: list[Post]) -> list[int]:
+        """check user authorization with respect to each form before the post"""
+        for form in forms:
+            await self.auth_post(user, form)
+        return await self.post_many(forms)
+
+    async def _row_to_create(self, user: User, row: Any) -> Create:
+        """Validate and authorize a raw row coming from a bulk request"""
+        if isinstance(row, ApiError):
+            raise row
+
+        try:
+            form = self.post_schema.model_validate(row)
+        except ValidationError as err:
+            raise ApiError(
+                HTTPStatus.UNPROCESSABLE_ENTITY,
+                "Invalid row",
+                dict(
+                    errors=err.errors(include_url=False, include_context=False)
+                ),
+            ) from err
+
+        await self.auth_post(user, form)
+        return await self.post_to_create(form)
+
+    async def _insert_isolated(
+        self, data: list[Create]
+    ) -> list[int | ApiError]:
+        """
+        Insert the batch in a savepoint
+        If it fails, retry row by row to find out which rows are faulty
+        """
+        # The hooks registered in a rolled back savepoint are dropped
+        hooks = len(self._commit_hooks)
+        try:
+            async with self.session.begin_nested():
+                return list(await self._insert_batch(data))
+        except Exception as err:
+            del self._commit_hooks[hooks:]
+            if len(data) == 1:
+                return [self.create_error(err)]
+
+        results: list[int | ApiError] = []
+        for item in data:
+            try:
+                async with self.session.begin_nested():
+                    results.extend(await self._insert_batch([item]))
+            except Exception as err:
+                del self._commit_hooks[hooks:]
+                results.append(self.create_error(err))
+            hooks = len(self._commit_hooks)
+        return results
+
+    async def _post_rows(
+        self, user: User, rows: list[Any]
+    ) -> list[int | ApiError]:
+        errors: dict[int, ApiError] = {}
+        valid: list[tuple[int, Create]] = []
+        for index, row in enumerate(rows):
+            try:
+                valid.append((index, await self._row_to_create(user, row)))
+            except ApiError as err:
+                errors[index] = err
+
+        inserted = await self._insert_isolated([item for _, item in valid])
+        results = dict(zip([i for i, _ in valid], inserted, strict=True))
+        results.update(errors)
+        return [results[i] for i in range(len(rows))]
+
+    async def user_post_stream(
+        self, user: User, rows: AsyncIterator[Any]
+    ) -> BulkCreateResult:
+        """
+        create from raw rows (a streamed request body) in batches
+        Faulty rows are reported individually and do not abort the others,
+        the decoders yield malformed rows as ApiError to report them too
+        """
+        results: list[BulkRowResult] = []
+        created = 0
+
+        async def create_batch(batch: list[Any]) -> None:
+            nonlocal created
+            offset = len(results)
+            for i, result in enumerate(await self._post_rows(user, batch)):
+                if isinstance(result, ApiError):
+                    row = BulkRowResult(
+                        index=offset + i, error=result.to_dict()
+                    )
+                else:
+                    row = BulkRowResult(index=offset + i, id=result)
+                    created += 1
+                results.append(row)
+
+        try:
+            batch: list[Any] = []
+            async for row in rows:
+                batch.append(row)
+                if len(batch) == self.CREATE_BATCH_SIZE:
+                    await create_batch(batch)
+                    batch = []
+            if batch:
+                await create_batch(batch)
+            await self.session.commit()
+        except Exception as err:
+            await self.rollback()
+            raise self.create_error(err) from err
+
+        await self.run_commit_hooks()
+        if created:
+            await self.bump_write_version()
+        return BulkCreateResult(
+            created=created, failed=len(results) - created, results=results
+        )
+
+    # Record Cache
+
+    @property
+    def record_cache(self) -> RedisClient | None:
+        if self.RECORD_CACHE_TTL is None:
+            return None
+        return self.cache
+
+    async def record_write_version(self) -> int:
+        if self.record_cache is None:
+            return 0
+        version_key = self.write_version_key(self.tablename)
+        return await self.record_cache.get(version_key, "int") or 0
+
+    def record_cache_key(self, id_: int, write_version: int) -> str:
+        version = _schema_version(self.read_schema)
+        return f"record_{self.tablename}_{version}_v{write_version}_{id_}"
+
+    async def invalidate_records(self, ids: list[int]) -> None:
+        """
+        Call this when records are written outside of update/delete
+        The records are cached under the table write version, bumping it
+        leaves them behind, as well as the late fill of a reader that
+        fetched the rows before the write was committed
+        """
+        if self.record_cache is not None and ids:
+            version_key = self.write_version_key(self.tablename)
+            await self.record_cache.incr(version_key)
+
+    async def _fetch_reads(self, ids: list[int]) -> dict[int, Read]:
+        query = SearchQuery[Selectables, Sortables, Searchables](
+            size=len(ids),
+            select=self.default_select,
+            where=cast(WhereFilters[Searchables], {"id": self.in_(ids)}),
+        )
+        page = await self._get_partial_page(query)
+        reads = self._validate_reads(page.records)
+        return {
+            row["id"]: read
+            for row, read in zip(page.records, reads, strict=True)
+        }
+
+    async def get_many_cached(self, ids: list[int]) -> list[Read]:
+        """
+        Read the records with MGET, fetch and cache the missing ones
+        Returns the records found, in the order of the ids
+        """
+        cache = self.record_cache
+        if cache is None:
+            found = await self._fetch_reads(ids) if ids else {}
+            return [found[id_] for id_ in ids if id_ in found]
+
+        # Read before the rows, a write committed meanwhile bumps it
+        write_version = await self.record_write_version()
+        keys = [self.record_cache_key(id_, write_version) for id_ in ids]
+        cached = await cache.mget(keys, self.read_schema)
+        found = {
+            id_: read
+            for id_, read in zip(ids, cached, strict=True)
+            if read is not None
+        }
+
+        missing = [id_ for id_ in ids if id_ not in found]
+        if missing:
+            fetched = await self._fetch_reads(missing)
+            values = {
+                self.record_cache_key(id_, write_version): read
+                for id_, read in fetched.items()
+            }
+            await cache.set_many(values, self.RECORD_CACHE_TTL)
+            found.update(fetched)
+
+        return [found[id_] for id_ in ids if id_ in found]
+
     # Read
 
     async def exists(self, where: WhereFilters[Searchables]) -> bool:
@@ -347,11 +876,53 @@ class CrudsClass[
         # scalar_one() should return a DbModel
         return record  # type: ignore
 
+    async def _get_raw_dict(
+        self,
+        id_: int | str,
+        *,
+        fields: list[Selectables] | None = None,
+        user: User | None = None,
+    ) -> dict:
+        """
+        Same as _get_raw, returns a dict (partial data)
+        Plain columns are read as a tuple, skipping the ORM entity hydration
+        """
+        query = SearchQuery[Selectables, Sortables, Searchables](
+            select=fields or self.default_select,
+            where=cast(
+                WhereFilters[Searchables], {"id": self.eq(self.parse_id(id_))}
+            ),
+        )
+        columns = self.select_columns(cast(list[Selectables], query.select))
+        if columns is None:
+            obj = await self._get_raw(id_, fields=fields, user=user)
+            return self._serialize_to_dict(obj)
+
+        # Apply ownership if needed
+        if user:
+            query = self.auth_get(user, query)
+
+        stmt = self.build_columns_query(query, columns)
+        result = await self.session.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            raise self.not_found_error(id_)
+        return dict(zip(columns, row, strict=True))
+
+    async def _get_read(self, id_: int | str) -> Read:
+        """Served from the record cache when enabled"""
+        if self.record_cache is None:
+            return self._serialize_to_read(await self._get_raw(id_))
+
+        found = await self.get_many_cached([self.parse_id(id_)])
+        if not found:
+            raise self.not_found_error(id_)
+        return found[0]
+
     async def get(self, id_: int | str, options: Options | None = None) -> Read:
         options = options or cast(Options, {})
         process = options.get("process", False)
-        obj = await self._get_raw(id_)
-        result = self._serialize_to_read(obj)
+        result = await self._get_read(id_)
         if process:
             result = await self.post_process(result)
         return result
@@ -371,10 +942,16 @@ class CrudsClass[
         self, id_: int | str, options: Options | None = None
     ) -> dict:
         options = options or cast(Options, {})
-        fields = options.get("fields", self.default_select)
+        fields = options.get("fields") or self.default_select
         process = options.get("process", False)
-        obj = await self._get_raw(id_, fields=fields)
-        result = self._serialize_to_dict(obj)
+        if self.record_cache is not None and set(fields).issubset(
+            self.read_schema.model_fields
+        ):
+            # Projecting the cached full record
+            read = await self._get_read(id_)
+            result = read.model_dump(include={"id", *fields})
+        else:
+            result = await self._get_raw_dict(id_, fields=fields)
         if process:
             result = await self.post_process_dict(result)
         return result
@@ -385,8 +962,7 @@ class CrudsClass[
         options = options or cast(Options, {})
         process = options.get("process", False)
         fields = options.get("fields", self.default_select)
-        obj = await self._get_raw(id_, fields=fields, user=user)
-        result = self._serialize_to_dict(obj)
+        result = await self._get_raw_dict(id_, fields=fields, user=user)
         if process:
             result = await self.post_process_dict(result)
         return result
@@ -411,7 +987,7 @@ class CrudsClass[
             await self.session.commit()
 
         except Exception as err:
-            await self.session.rollback()
+            await self.rollback()
             if isinstance(err, ApiError):
                 raise err
             raise ApiError(
@@ -419,6 +995,75 @@ class CrudsClass[
                 f"Could not update {self.model_name} object: {err!s}!",
             ) from err
 
+        await self.run_commit_hooks()
+        # The write version also keys the cached records
+        await self.bump_write_version()
+
+    async def _write_where(
+        self,
+        where: WhereFilters[Searchables] | None,
+        build: Callable[[Select], Any],
+        after: Callable[[list[dict]], Awaitable[None]],
+        action: str,
+        before: Callable[[Select], Awaitable[None]] | None = None,
+    ) -> int:
+        """
+        Run the statement chunk by chunk following the ids order
+        Each chunk is committed on its own to keep transactions short
+        """
+        total = 0
+        last_id = 0
+        while True:
+            try:
+                ids = self.build_chunk_query(where, last_id)
+                if before is not None:
+                    await before(ids)
+                result = await self.session.execute(build(ids))
+                rows = [dict(row._mapping) for row in result]
+                if rows:
+                    await after(rows)
+                await self.session.commit()
+            except Exception as err:
+                await self.rollback()
+                if isinstance(err, ApiError):
+                    raise err
+                raise ApiError(
+                    HTTPStatus.INTERNAL_SERVER_ERROR,
+                    f"Could not {action} {self.model_name} objects: {err!s}!",
+                ) from err
+
+            await self.run_commit_hooks()
+            if not rows:
+                break
+            await self.invalidate_records([row["id"] for row in rows])
+            total += len(rows)
+            last_id = max(row["id"] for row in rows)
+
+        if total:
+            await self.bump_write_version()
+        return total
+
+    async def update_where(
+        self, where: WhereFilters[Searchables] | None, data: Update
+    ) -> int:
+        """update all the records matching the filters, return the count"""
+        values = data.model_dump(exclude_unset=True)
+        if not values:
+            return 0
+
+        def build(ids: Select):
+            return (
+                update(self.model)
+                .where(self.model.id.in_(ids))
+                .values(values)
+                .returning(*self.returning(self.UPDATE_RETURNING))
+            )
+
+        async def after(rows: list[dict]) -> None:
+            await self.after_update_many(rows, data)
+
+        return await self._write_where(where, build, after, "update")
+
     async def before_update(self, id_: int, data: Update) -> UpdateContext:
         """Overload this to run code before update"""
         return self.update_context_schema.model_construct()
@@ -428,6 +1073,12 @@ class CrudsClass[
     ) -> None:
         """Overload this to run code after update"""
 
+    async def after_update_many(self, rows: list[dict], data: Update) -> None:
+        """
+        Overload this to run code after each chunk of update_where
+        rows hold the id and the UPDATE_RETURNING columns
+        """
+
     async def auth_put(self, user: User, id_: int | str, form: Put) -> None:
         """
         Raise an ApiError if user lacks authorization
@@ -480,7 +1131,7 @@ class CrudsClass[
             await self.session.commit()
 
         except Exception as err:
-            await self.session.rollback()
+            await self.rollback()
             if isinstance(err, ApiError):
                 raise err
 
@@ -489,6 +1140,30 @@ class CrudsClass[
                 f"Could not delete {self.model_name} object: {err!s}!",
             ) from err
 
+        await self.run_commit_hooks()
+        # The write version also keys the cached records
+        await self.bump_write_version()
+
+    async def delete_where(
+        self, where: WhereFilters[Searchables] | None
+    ) -> int:
+        """delete all the records matching the filters, return the count"""
+
+        def build(ids: Select):
+            return (
+                delete(self.model)
+                .where(self.model.id.in_(ids))
+                .returning(*self.returning(self.DELETE_RETURNING))
+            )
+
+        return await self._write_where(
+            where,
+            build,
+            self.after_delete_many,
+            "delete",
+            self.before_delete_many,
+        )
+
     async def before_delete(self, id_: int) -> DeleteContext:
         """Overload this to run code before delete"""
         return self.delete_context_schema.model_construct()
@@ -496,6 +1171,18 @@ class CrudsClass[
     async def after_delete(self, id_: int, context: DeleteContext) -> None:
         """Overload this to run code after delete"""
 
+    async def before_delete_many(self, ids: Select) -> None:
+        """
+        Overload this to run code before each chunk of delete_where
+        ids selects the ids of the records about to be deleted
+        """
+
+    async def after_delete_many(self, rows: list[dict]) -> None:
+        """
+        Overload this to run code after each chunk of delete_where
+        rows hold the id and the DELETE_RETURNING columns
+        """
+
     async def auth_delete(self, user: User, id_: int | str) -> None:
         """Raise an ApiError if user lacks authorization"""
         raise NotImplementedError
@@ -507,6 +1194,32 @@ class CrudsClass[
 
     # Search
 
+    def write_version_key(self, tablename: str) -> str:
+        return f"write_version_{tablename}"
+
+    async def bump_write_version(self) -> None:
+        """
+        Invalidate the cached counts and records of the table and the
+        cascaded ones
+        """
+        if self.cache is None:
+            return
+        for tablename in [self.tablename, *self.CASCADED_TABLES]:
+            await self.cache.incr(self.write_version_key(tablename))
+
+    async def count_cache_key(
+        self, query: SearchQuery[Selectables, Sortables, Searchables]
+    ) -> str:
+        """The key embeds the table write version, writes invalidate it"""
+        if self.cache is None:
+            raise RuntimeError(f"No cache configured for {self.model_name}")
+
+        version_key = self.write_version_key(self.tablename)
+        version = await self.cache.get(version_key, "int") or 0
+        normalized = json.dumps(query.where or {}, sort_keys=True, default=str)
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f"count_{self.tablename}_v{version}_{digest}"
+
     async def count(
         self, query: SearchQuery[Selectables, Sortables, Searchables]
     ) -> int:
@@ -518,14 +1231,56 @@ class CrudsClass[
         result = await self.session.execute(count_stmt)
         return result.scalar() or 0
 
-    async def _get_many(
+    async def _explain_rows(self, stmt: Select) -> int:
+        """Return the number of rows estimated by the query planner"""
+        connection = await self.session.connection()
+        compiled = stmt.compile(
+            dialect=connection.dialect,
+            compile_kwargs={"render_postcompile": True},
+        )
+        params = tuple(
+            compiled.params[name] for name in compiled.positiontup or []
+        )
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", params
+        )
+        plan: Any = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def estimate_count(
+        self, query: SearchQuery[Selectables, Sortables, Searchables]
+    ) -> int:
+        """
+        Estimate the number of rows from the planner statistics
+        Small estimates are replaced by an exact count, cheap at that size
+        """
+        where = query.where or cast(WhereFilters[Searchables], {})
+        if not any(where.values()):
+            reltuples = text(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = to_regclass(:tablename)"
+            )
+            result = await self.session.execute(
+                reltuples, dict(tablename=self.tablename)
+            )
+            # reltuples is -1 when the table was never analyzed
+            estimate = result.scalar() or -1
+        else:
+            stmt = apply_where(select(self.model.id), where, self.map_where)
+            estimate = await self._explain_rows(stmt)
+
+        if estimate < self.COUNT_ESTIMATE_THRESHOLD:
+            return await self.count(query)
+        return estimate
+
+    def _page_query(
         self,
         query: SearchQuery[Selectables, Sortables, Searchables],
         user: User | None = None,
-    ) -> list[DbModel]:
-        """privvate method to search records, returns a list of DbModel"""
-
-        # Setting default values
+    ) -> SearchQuery[Selectables, Sortables, Searchables]:
+        """Set the default values, the id tiebreaker and the auth filter"""
         if not query.select or len(query.select) == 0:
             query.select = list(self.default_select)
         if not query.orderby or len(query.orderby) == 0:
@@ -537,37 +1292,137 @@ class CrudsClass[
         if not query.size:
             query.size = self.MAX_ITEMS_PER_PAGE
 
-        # Fetch the ids with pagination
-        filter_query = SearchQuery[Selectables, Sortables, Searchables](
+        # The id tiebreaker makes the sort total and the cursor unique
+        orderby = cast(
+            list[Sortables],
+            self.with_tiebreaker(cast(list[str], query.orderby)),
+        )
+        page_query = SearchQuery[Selectables, Sortables, Searchables](
             page=query.page,
             size=query.size,
-            select=cast(list[Selectables], ["id"]),
+            cursor=query.cursor,
+            select=query.select,
             where=query.where,
-            orderby=query.orderby,
+            orderby=orderby,
         )
 
         # Apply auth filter if required
         if user:
-            filter_query = self.auth_get(user, filter_query)
+            page_query = self.auth_get(user, page_query)
+        return page_query
 
-        stmt = self.build_select_query(filter_query)
+    async def _fetch_page(
+        self,
+        page_query: SearchQuery[Selectables, Sortables, Searchables],
+        offset: int,
+        with_total: bool,
+        **options: Any,
+    ) -> tuple[list[Row], str | None, int | None]:
+        """
+        Run the page query, return the rows of the page, the next cursor
+        and the total count. offset is the position of the first sort key
+        """
+        stmt = self.build_page_query(
+            page_query, with_total=with_total, **options
+        )
         result = await self.session.execute(stmt)
-        ids = [row.id for row in result.scalars().all()]
+        rows = list(result.all())
+        size = cast(int, page_query.size)
+        orderby = cast(list[str], page_query.orderby)
+
+        total_count = None
+        if with_total and len(rows) > 0:
+            total_count = cast(int, rows[0].total_count)
+
+        next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            keys = rows[-1][offset : offset + len(orderby)]
+            next_cursor = KeysetCursor(
+                orderby=orderby, values=list(keys)
+            ).encode()
+
+        return rows, next_cursor, total_count
+
+    async def _get_page(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        user: User | None = None,
+        with_total: bool = False,
+    ) -> RecordsPage[DbModel]:
+        """
+        private method to search records, returns a page of DbModel
+        with the cursor of the next page (None for the last page)
+        """
+        page_query = self._page_query(query, user)
+
+        # Relationships are loaded with extra queries using the ids
+        # otherwise the records are fetched in a single roundtrip
+        single = self.SINGLE_ROUNDTRIP_SEARCH and not self.needs_joins(
+            cast(list[Selectables], page_query.select)
+        )
+
+        # The keyset condition would be applied to the window count
+        with_total = with_total and not query.cursor
+
+        rows, next_cursor, total_count = await self._fetch_page(
+            page_query, 1, with_total, with_records=single
+        )
 
-        if len(ids) == 0:
-            return []
+        if single or len(rows) == 0:
+            records = [row[0] for row in rows]
+            return RecordsPage(records, next_cursor, total_count)
 
         # Fetching the records with the id in ids
+        ids = [row[0] for row in rows]
         fetch_query = SearchQuery[Selectables, Sortables, Searchables](
             page=1,
             size=len(ids),
-            select=query.select,
+            select=page_query.select,
             where=cast(WhereFilters[Searchables], {"id": self.in_(ids)}),
-            orderby=query.orderby,
         )
         stmt = self.build_select_query(fetch_query)
         result = await self.session.execute(stmt)
-        return result.scalars().all()  # type: ignore
+
+        # Restoring the order instead of sorting a second time
+        by_id = {record.id: record for record in result.scalars().all()}
+        records = [by_id[id_] for id_ in ids if id_ in by_id]
+        return RecordsPage(records, next_cursor, total_count)
+
+    async def _get_partial_page(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        user: User | None = None,
+        with_total: bool = False,
+    ) -> RecordsPage[dict]:
+        """
+        Same as _get_page, returns dicts (partial data) instead of DbModel
+        Plain columns are read as tuples, skipping the ORM entities hydration
+        """
+        page_query = self._page_query(query, user)
+        columns = self.select_columns(
+            cast(list[Selectables], page_query.select)
+        )
+        if columns is None:
+            page = await self._get_page(page_query, with_total=with_total)
+            records = [self._serialize_to_dict(r) for r in page.records]
+            return RecordsPage(records, page.next_cursor, page.total_count)
+
+        with_total = with_total and not query.cursor
+        rows, next_cursor, total_count = await self._fetch_page(
+            page_query, len(columns), with_total, columns=columns
+        )
+        records = [dict(zip(columns, row, strict=False)) for row in rows]
+        return RecordsPage(records, next_cursor, total_count)
+
+    async def _get_many(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        user: User | None = None,
+    ) -> list[DbModel]:
+        """privvate method to search records, returns a list of DbModel"""
+        page = await self._get_page(query, user)
+        return page.records
 
     async def search(
         self,
@@ -581,8 +1436,14 @@ class CrudsClass[
         options = options or cast(Options, {})
         process = options.get("process", False)
         query.select = self.default_select
-        records = await self._get_many(query)
-        results = [self._serialize_to_read(r) for r in records]
+        if self.record_cache is None:
+            page = await self._get_partial_page(query)
+            results = self._validate_reads(page.records)
+        else:
+            # Only the ids are searched, the records come from the cache
+            page_query = self._page_query(query)
+            rows, _, _ = await self._fetch_page(page_query, 1, False)
+            results = await self.get_many_cached([row[0] for row in rows])
         if process:
             results = await self.post_process_batch(results)
         return results
@@ -600,8 +1461,14 @@ class CrudsClass[
         options = options or cast(Options, {})
         process = options.get("process", False)
         query.select = self.default_select
-        records = await self._get_many(query, user)
-        results = [self._serialize_to_read(r) for r in records]
+        if self.record_cache is None:
+            page = await self._get_partial_page(query, user)
+            results = self._validate_reads(page.records)
+        else:
+            # Only the ids are searched, the records come from the cache
+            page_query = self._page_query(query, user)
+            rows, _, _ = await self._fetch_page(page_query, 1, False)
+            results = await self.get_many_cached([row[0] for row in rows])
         if process:
             results = await self.post_process_batch(results)
         return results
@@ -617,8 +1484,8 @@ class CrudsClass[
         """
         options = options or cast(Options, {})
         process = options.get("process", False)
-        records = await self._get_many(query)
-        results = [self._serialize_to_dict(r) for r in records]
+        page = await self._get_partial_page(query)
+        results = page.records
         if process:
             results = await self.post_process_dict_batch(results)
         return results
@@ -635,12 +1502,64 @@ class CrudsClass[
         """
         options = options or cast(Options, {})
         process = options.get("process", False)
-        records = await self._get_many(query, user)
-        results = [self._serialize_to_dict(r) for r in records]
+        page = await self._get_partial_page(query, user)
+        results = page.records
         if process:
             results = await self.post_process_dict_batch(results)
         return results
 
+    def build_stream_query(
+        self, query: SearchQuery[Selectables, Sortables, Searchables]
+    ) -> Select:
+        """Same as build_select_query, without pagination"""
+        orderby = self.with_tiebreaker(
+            cast(list[str], query.orderby or self.default_orderby)
+        )
+        stream_query = SearchQuery[Selectables, Sortables, Searchables](
+            select=query.select or self.default_select,
+            where=query.where,
+            orderby=cast(list[Sortables], orderby),
+        )
+        stmt = self.build_select_query(stream_query)
+        return stmt.limit(None).offset(None)
+
+    async def stream_partial(
+        self,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        options: Options | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        stream all the records matching the query, in batches of dict
+        page, size and cursor are ignored. A server side cursor is used
+        so the memory usage is bounded by STREAM_BATCH_SIZE. The next batch
+        is only fetched once the consumer is done with the previous one
+        """
+        options = options or cast(Options, {})
+        process = options.get("process", False)
+        stmt = self.build_stream_query(query).execution_options(
+            yield_per=self.STREAM_BATCH_SIZE
+        )
+        result = await self.session.stream_scalars(stmt)
+        try:
+            async for partition in result.partitions():
+                batch = [self._serialize_to_dict(r) for r in partition]
+                if process:
+                    batch = await self.post_process_dict_batch(batch)
+                yield batch
+        finally:
+            await result.close()
+
+    async def user_stream_partial(
+        self,
+        user: User,
+        query: SearchQuery[Selectables, Sortables, Searchables],
+        options: Options | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        """stream all the records accessible by the user, in batches of dict"""
+        query = self.auth_get(user, query)
+        async for batch in self.stream_partial(query, options):
+            yield batch
+
     async def paginate(
         self,
         query: SearchQuery[Selectables, Sortables, Searchables],
@@ -650,33 +1569,59 @@ class CrudsClass[
         # The selectable fields should include only fields
         # part of the Read Schema
 
-        # Step 1: counting the output
+        # Step 1: normalizing the query
         page = query.page or 1
         size = query.size or self.MAX_ITEMS_PER_PAGE
-        total_count = await self.count(query)
-        total_pages = (total_count + size - 1) // size
-
-        # Step 2: normalizing the query
-        normalized = SearchQuery(
+        normalized = SearchQuery[Selectables, Sortables, Searchables](
             page=page,
             size=size,
+            cursor=query.cursor,
             select=query.select,
             where=query.where,
             orderby=query.orderby,
         )
 
-        # Step 3: fetching results
-        data = await self.search_partial(normalized)
+        # Step 2: reading the cached count if required
+        strategy = query.count or self.COUNT_STRATEGY
+        count_cache = self.cache if strategy == "cached" else None
 
-        # Ste 4: post-processing
+        total_count: int | None = None
+        cache_key = ""
+        if count_cache is not None:
+            cache_key = await self.count_cache_key(query)
+            total_count = await count_cache.get(cache_key, "int")
+
+        # Step 3: fetching results, with the count when possible
+        with_total = strategy in ["exact", "cached"] and total_count is None
+        records = await self._get_partial_page(
+            normalized, with_total=with_total
+        )
+        data = records.records
+
+        # Step 4: counting the output if not done in the same query
+        if with_total:
+            total_count = records.total_count
+            if total_count is None:
+                total_count = await self.count(query)
+            if count_cache is not None:
+                await count_cache.set(cache_key, total_count)
+        elif strategy == "estimate":
+            total_count = await self.estimate_count(query)
+
+        total_pages = None
+        if total_count is not None:
+            total_pages = (total_count + size - 1) // size
+
+        # Step 5: post-processing
         if options and options.get("process", False):
             data = await self.post_process_dict_batch(data)
 
-        # Step 5: return paginated result
+        # Step 6: return paginated result
         return PaginatedDict(
             page=page,
             total_pages=total_pages,
             total_count=total_count,
+            next_cursor=records.next_cursor,
             data=data,
         )
 
@@ -1,4 +1,5 @@
 from datetime import datetime
+from functools import cache
 
 from sqlalchemy import DateTime, Integer, inspect
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
@@ -26,6 +27,12 @@ class BaseModel(DeclarativeBase):
         nullable=False,
     )
 
+    @classmethod
+    @cache
+    def column_keys(cls) -> tuple[str, ...]:
+        """The mapped columns keys, in the order used by to_dict"""
+        return tuple(c.key for c in inspect(cls).mapper.column_attrs)
+
     def to_dict(self) -> dict:
         result = {}
         insp = inspect(self)
@@ -1,5 +1,8 @@
+import base64
 from dataclasses import dataclass
-from typing import Literal, Self
+from datetime import date, datetime
+import json
+from typing import Any, Literal, Self
 
 from sqlalchemy.orm import InstrumentedAttribute, load_only, selectinload
 
@@ -61,3 +64,53 @@ class TableSelection:
         for relation in self.path[1:]:
             option = option.selectinload(relation)
         return option.load_only(*self.fields)
+
+
+def _cursor_json_default(val: Any) -> Any:
+    if isinstance(val, (datetime, date)):
+        return val.isoformat()
+    return str(val)
+
+
+@dataclass
+class KeysetCursor:
+    """Utility class for modeling an opaque keyset pagination cursor"""
+
+    # the order by clauses (id tiebreaker included) the cursor was built with
+    orderby: list[str]
+    # the sort keys values of the last record of the previous page
+    values: list[Any]
+
+    def encode(self) -> str:
+        raw = json.dumps(
+            dict(o=self.orderby, v=self.values),
+            default=_cursor_json_default,
+            separators=(",", ":"),
+        )
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str) -> Self:
+        """Raise a ValueError if the cursor is malformed"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            orderby, values = data["o"], data["v"]
+        except Exception as err:
+            raise ValueError(f"Invalid cursor {cursor}") from err
+
+        if not isinstance(orderby, list) or not isinstance(values, list):
+            raise ValueError(f"Invalid cursor {cursor}")
+        if len(orderby) != len(values):
+            raise ValueError(f"Invalid cursor {cursor}")
+        return cls(orderby=orderby, values=values)
+
+
+@dataclass
+class RecordsPage[T]:
+    """Utility class for a page of records fetched by a search"""
+
+    records: list[T]
+    next_cursor: str | None
+    # None when the count was not computed by the page query
+    total_count: int | None = None
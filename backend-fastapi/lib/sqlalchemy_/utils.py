@@ -1,6 +1,23 @@
-from collections.abc import Callable
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
 
-from sqlalchemy import Select
+from pydantic import TypeAdapter
+from sqlalchemy import (
+    BindParameter,
+    ColumnElement,
+    Select,
+    all_,
+    and_,
+    any_,
+    bindparam,
+    func,
+    literal,
+    literal_column,
+    or_,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, REAL, REGCONFIG, TSVECTOR
 from sqlalchemy.orm import InstrumentedAttribute
 
 from ..types_ import Filter, WhereFilters
@@ -29,6 +46,51 @@ def apply_order_by(
     return query
 
 
+def _parse_keyset_value(column: InstrumentedAttribute, val: Any) -> Any:
+    # cursor values are json encoded, datetimes need to be parsed back
+    python_type = column.type.python_type
+    return TypeAdapter(python_type).validate_python(val)
+
+
+def apply_keyset(
+    query: Select,
+    clauses: list[str],
+    values: list[Any],
+    map_func: Callable[[str], InstrumentedAttribute],
+) -> Select:
+    """
+    Seek after the record having the given sort keys values
+    The clauses must end with a unique tiebreaker (the id)
+    """
+    if len(clauses) != len(values):
+        raise ValueError("Keyset values do not match the order by clauses")
+
+    order_by_list = [OrderBy.from_string(clause) for clause in clauses]
+    columns = [map_func(order_by.field) for order_by in order_by_list]
+    parsed = [
+        literal(_parse_keyset_value(column, val), type_=column.type)
+        for column, val in zip(columns, values, strict=True)
+    ]
+
+    # Same direction for all keys: a row comparison can use the indexes
+    directions = {order_by.order for order_by in order_by_list}
+    if len(directions) == 1:
+        if directions == {"DESC"}:
+            return query.where(tuple_(*columns) < tuple_(*parsed))
+        return query.where(tuple_(*columns) > tuple_(*parsed))
+
+    # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+    conditions = []
+    for i, order_by in enumerate(order_by_list):
+        terms = [columns[j] == parsed[j] for j in range(i)]
+        if order_by.order == "DESC":
+            terms.append(columns[i] < parsed[i])
+        else:
+            terms.append(columns[i] > parsed[i])
+        conditions.append(and_(*terms))
+    return query.where(or_(*conditions))
+
+
 def apply_select(
     query: Select,
     clauses: list[str],
@@ -64,39 +126,102 @@ def apply_select(
     return query
 
 
+# Configuration of the generated tsvector columns and of the queries
+TEXT_SEARCH_CONFIG = "english"
+_text_search_config = literal_column(f"'{TEXT_SEARCH_CONFIG}'", REGCONFIG)
+
+
+def is_text_search_column(column: Any) -> bool:
+    """
+    Only tsvector columns can be searched, they have a GIN index
+    Computing the vectors of a text column at query time scans the table
+    """
+    return isinstance(column.type, TSVECTOR)
+
+
+def text_search_query(param: Any) -> ColumnElement:
+    """Web search syntax: quoted phrases, or, -excluded words"""
+    return func.websearch_to_tsquery(_text_search_config, param)
+
+
+def text_search_rank(column: Any, param: Any) -> ColumnElement:
+    """Relevance of the rows to a text search, higher is better"""
+    if not is_text_search_column(column):
+        raise ValueError(f"{column} is not a tsvector column")
+    return func.ts_rank(column, text_search_query(param), type_=REAL)
+
+
+def where_param(field: str, op: str, index: int) -> str:
+    """Name of the bound parameter of the index-th filter of a field"""
+    return f"where_{field}_{op}_{index}"
+
+
+def _where_value(op: str, val: Any) -> Any:
+    if op in ("like", "ilike"):
+        return f"%{val}%"
+    if op in ("in", "nin"):
+        return list(val)
+    return val
+
+
+def _null_check(filter_: Filter) -> bool | None:
+    """
+    True if the filter tests that the column is NULL, False for NOT NULL
+    None for the filters comparing with a value
+    """
+    op = filter_["op"]
+    if op == "null":
+        return filter_["val"] is True
+    if op in ("eq", "ne") and filter_["val"] is None:
+        # = NULL never matches, None means IS NULL
+        return op == "eq"
+    return None
+
+
 def _apply_single_where(
     query: Select,
     column: InstrumentedAttribute,  # the actual column to filter
     filter_: Filter,  # the filter to apply
+    key: str,  # the name of the bound parameter
 ) -> Select:
     op = filter_["op"]
     val = filter_["val"]
 
+    null = _null_check(filter_)
+    if null is not None:
+        # The value changes the statement, it is part of the shape
+        if null:
+            return query.where(column.is_(None))
+        return query.where(column.is_not(None))
+
+    if op in ("in", "nin"):
+        # An array keeps the same SQL whatever the number of values
+        array = bindparam(key, _where_value(op, val), type_=ARRAY(column.type))
+        if op == "in":
+            return query.where(column == any_(array))
+        return query.where(column != all_(array))
+
+    param: BindParameter = bindparam(key, _where_value(op, val))
     if op == "eq":
-        query = query.where(column == val)
+        query = query.where(column == param)
     elif op == "ne":
-        query = query.where(column != val)
-    elif op == "null":
-        if val is True:
-            query = query.where(column.is_(None))
-        else:
-            query = query.where(column.is_not(None))
-    elif op == "in":
-        query = query.where(column.in_(val))
-    elif op == "nin":
-        query = query.where(column.not_in(val))
+        query = query.where(column != param)
     elif op == "lt":
-        query = query.where(column < val)
+        query = query.where(column < param)
     elif op == "lte":
-        query = query.where(column <= val)
+        query = query.where(column <= param)
     elif op == "gt":
-        query = query.where(column > val)
+        query = query.where(column > param)
     elif op == "gte":
-        query = query.where(column >= val)
+        query = query.where(column >= param)
     elif op == "like":
-        query = query.where(column.like(f"%{val}%"))
+        query = query.where(column.like(param))
     elif op == "ilike":
-        query = query.where(column.ilike(f"%{val}%"))
+        query = query.where(column.ilike(param))
+    elif op == "search":
+        if not is_text_search_column(column):
+            raise ValueError(f"{column} is not a tsvector column")
+        query = query.where(column.bool_op("@@")(text_search_query(param)))
     else:
         raise ValueError(f"Unknown field filter operator {op}")
 
@@ -112,7 +237,76 @@ def apply_where(
         if not field_filters:
             continue
         column = map_func(field)
-        for filter_ in field_filters:
-            query = _apply_single_where(query, column, filter_)
+        for i, filter_ in enumerate(field_filters):
+            key = where_param(field, filter_["op"], i)
+            query = _apply_single_where(query, column, filter_, key)
 
     return query
+
+
+def where_shape(clauses: WhereFilters | None) -> tuple:
+    """The fields and operators of the filters, values excluded"""
+    if not clauses:
+        return ()
+
+    shape: list[tuple] = []
+    for field, field_filters in clauses.items():
+        for filter_ in field_filters or []:
+            op = filter_["op"]
+            null = _null_check(filter_)
+            if null is not None:
+                shape.append((field, op, null))
+            else:
+                shape.append((field, op))
+    return tuple(shape)
+
+
+def where_params(clauses: WhereFilters | None) -> dict[str, Any]:
+    """The values of the filters, keyed by their bound parameter"""
+    if not clauses:
+        return {}
+
+    params = {}
+    for field, field_filters in clauses.items():
+        for i, filter_ in enumerate(field_filters or []):
+            op = filter_["op"]
+            if _null_check(filter_) is None:
+                key = where_param(field, op, i)
+                params[key] = _where_value(op, filter_["val"])
+    return params
+
+
+class StatementCache:
+    """
+    LRU of the statements built for a query shape
+    Filters values are bound parameters, they are swapped with Select.params
+    so building a statement for a known shape skips apply_select/where/order_by
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._statements: OrderedDict[Hashable, Select] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def clear(self) -> None:
+        self._statements.clear()
+
+    def get_or_build(
+        self, key: Hashable, build: Callable[[], Select], params: dict[str, Any]
+    ) -> Select:
+        stmt = self._statements.get(key)
+        if stmt is None:
+            # Built with the current values, no need to bind them again
+            stmt = build()
+            self._statements[key] = stmt
+            if len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+            return stmt
+
+        self._statements.move_to_end(key)
+        return stmt.params(params) if params else stmt
+
+
+statement_cache = StatementCache()
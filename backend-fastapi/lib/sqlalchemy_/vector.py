@@ -0,0 +1,23 @@
+from typing import Any
+
+from pgvector import Vector
+from pgvector.sqlalchemy import VECTOR
+from sqlalchemy import Dialect
+
+
+class BinaryVector(VECTOR):
+    """
+    Vector column bound in the pgvector binary format
+    pgvector's type formats a text literal for every value, this one hands
+    the floats to the asyncpg codec registered by the PgClient
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect: Dialect) -> Any:
+        def process(value: Any) -> Vector | None:
+            if value is None or isinstance(value, Vector):
+                return value
+            return Vector(value)
+
+        return process
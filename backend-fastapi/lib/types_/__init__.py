@@ -1,3 +1,4 @@
+from lib.types_.bulk import *
 from lib.types_.enums import *
 from lib.types_.error import *
 from lib.types_.filters import *
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+
+
+class BulkRowResult(BaseModel):
+    index: int = Field(examples=[0])
+    id: int | None = Field(default=None, examples=[123456789])
+    error: dict | None = Field(
+        default=None, examples=[dict(error=True, message="Access denied")]
+    )
+
+
+class BulkCreateResult(BaseModel):
+    created: int = Field(examples=[999])
+    failed: int = Field(examples=[1])
+    results: list[BulkRowResult]
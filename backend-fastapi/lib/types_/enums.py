@@ -9,3 +9,9 @@ class ContentType(StrEnum):
 class MimeType(StrEnum):
     JPEG = "image/jpeg"
     PNG = "image/png"
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
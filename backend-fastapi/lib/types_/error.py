@@ -8,3 +8,9 @@ class ApiError(Exception):
         self.code = code
         self.message = message or "An unknown error occured"
         self.details = details or {}
+
+    def to_dict(self) -> dict:
+        data: dict = dict(error=True, message=self.message)
+        if self.details:
+            data["details"] = self.details
+        return data
@@ -16,9 +16,15 @@ FilterOperation = Literal[
     "gte",
     "like",
     "ilike",
+    "search",
 ]
 
 
+# exact: count query, cached: exact count cached until the next write
+# estimate: planner statistics, none: skip the total count
+CountStrategy = Literal["exact", "cached", "estimate", "none"]
+
+
 # Using TypedDict instead of dataclass because of easy serialization
 class Filter(TypedDict):
     op: FilterOperation
@@ -33,6 +39,8 @@ class SearchQuery[Selectables: str, Sortables: str, Searchables: str](
 ):
     page: int = 1
     size: int | None = None
+    cursor: str | None = None
+    count: CountStrategy | None = None
     orderby: list[Sortables] | None = None
     select: list[Selectables] | None = None
     where: WhereFilters[Searchables] | None = None
@@ -17,8 +17,9 @@ class PaginatedDict(BaseModel):
     """Using camelCase to stay coherent with other backends"""
 
     page: int
-    total_pages: int
-    total_count: int
+    total_pages: int | None
+    total_count: int | None
+    next_cursor: str | None = None
     data: list[dict]
 
 
@@ -26,6 +27,9 @@ class PaginatedData[ReadSchema: BaseModel](BaseModel):
     """Using camelCase to stay coherent with other backends"""
 
     page: int = Field(examples=[1])
-    total_pages: int = Field(examples=[2])
-    total_count: int = Field(examples=[40])
+    total_pages: int | None = Field(examples=[2])
+    total_count: int | None = Field(examples=[40])
+    next_cursor: str | None = Field(
+        None, examples=["eyJvIjpbIi1jcmVhdGVkX2F0IiwiLWlkIl0sInYiOltdfQ"]
+    )
     data: list[ReadSchema]
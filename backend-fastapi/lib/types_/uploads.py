@@ -1,9 +1,10 @@
+from collections.abc import Iterator
 from http import HTTPStatus
 import mimetypes
 import os
-from typing import Any, Self
+from typing import Any, BinaryIO, Literal, Self
 
-from pydantic import GetJsonSchemaHandler
+from pydantic import BaseModel, Field, GetJsonSchemaHandler
 from pydantic_core import core_schema
 from starlette.datastructures import UploadFile
 
@@ -12,11 +13,63 @@ from .error import ApiError
 
 class FileToUpload:
     MAX_SIZE: int = 100
+    # Bytes read at once when streaming, a multiple of 256 KiB for GCS
+    CHUNK_SIZE: int = 2 * 1024 * 1024
 
-    def __init__(self, filename: str, mimetype: str, buffer: bytes) -> None:
+    def __init__(
+        self,
+        filename: str,
+        mimetype: str,
+        buffer: bytes | None = None,
+        file: BinaryIO | None = None,
+    ) -> None:
+        """Either the content in memory or a file to stream it from"""
         self.name: str = filename
         self.mimetype = mimetype
-        self.buffer: bytes = buffer
+        self.file = file
+        self._buffer = buffer
+
+    @classmethod
+    def max_bytes(cls) -> int:
+        return cls.MAX_SIZE * 1024 * 1024
+
+    @property
+    def size(self) -> int:
+        if self.file is None:
+            return len(self._buffer or b"")
+
+        # Spooled uploads are seekable, no need to read them
+        position = self.file.tell()
+        size = self.file.seek(0, os.SEEK_END)
+        self.file.seek(position)
+        return size
+
+    @property
+    def buffer(self) -> bytes:
+        """The whole content in memory, use chunks for large files"""
+        if self._buffer is None:
+            self._buffer = b"".join(self.chunks())
+        return self._buffer
+
+    def chunks(self, chunk_size: int | None = None) -> Iterator[bytes]:
+        """Read the content chunk by chunk, checking the size as it goes"""
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        if self.file is None:
+            buffer = self._buffer or b""
+            for i in range(0, len(buffer), chunk_size):
+                yield buffer[i : i + chunk_size]
+            return
+
+        self.file.seek(0)
+        total = 0
+        while chunk := self.file.read(chunk_size):
+            total += len(chunk)
+            if total > self.max_bytes():
+                raise ApiError(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    f"File too large (> {self.MAX_SIZE} MB)",
+                )
+            yield chunk
 
     @classmethod
     def from_path(cls, path: str) -> Self:
@@ -24,7 +77,7 @@ class FileToUpload:
         mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
         with open(path, "rb") as f:
             buffer = f.read()
-        return cls(filename, mimetype, buffer)
+        return cls(filename, mimetype, buffer=buffer)
 
     @classmethod
     def from_upload_file(cls, file: UploadFile) -> Self:
@@ -33,26 +86,18 @@ class FileToUpload:
                 HTTPStatus.BAD_REQUEST,
                 "uploaded file must have a name and a content type",
             )
-        return cls(file.filename, file.content_type, file.file.read())
+        return cls(file.filename, file.content_type, file=file.file)
 
     @classmethod
     def validate(cls, file: UploadFile | Self) -> Self:
         """Size validation for the file"""
-        if not isinstance(file, UploadFile):
-            if len(file.buffer) > cls.MAX_SIZE * 1024 * 1024:
-                raise ValueError(f"File too large (> {cls.MAX_SIZE} MB)")
-            return file
+        if isinstance(file, UploadFile):
+            # The spooled file is kept, its content is streamed on upload
+            file = cls.from_upload_file(file)
 
-        if not file.filename or not file.content_type:
-            raise ApiError(
-                HTTPStatus.BAD_REQUEST,
-                "uploaded file must have a name and a content type",
-            )
-
-        buffer = file.file.read()
-        if len(buffer) > cls.MAX_SIZE * 1024 * 1024:
+        if file.size > cls.max_bytes():
             raise ValueError(f"File too large (> {cls.MAX_SIZE} MB)")
-        return cls(file.filename, file.content_type, buffer)
+        return file
 
     @classmethod
     def __get_pydantic_core_schema__(cls, _source_type: Any, _handler: Any):
@@ -83,3 +128,20 @@ class FileToUpload:
 
         FileWithCustomLimit.__name__ = f"FileToUpload_{size_mb}MB"
         return FileWithCustomLimit  # type: ignore
+
+
+class SignedUpload(BaseModel):
+    """Where and how the client sends a file, straight to the bucket"""
+
+    url: str = Field(examples=["https://storage.googleapis.com/bucket/..."])
+    method: Literal["PUT", "POST"] = Field(examples=["PUT"])
+    headers: dict[str, str] = Field(examples=[{"Content-Type": "image/jpeg"}])
+    filename: str = Field(examples=["places/1/avatar_0f5c9d.jpg"])
+    expires_in: int = Field(examples=[3600])
+
+
+class StoredFile(BaseModel):
+    """Metadata of a file on the storage"""
+
+    size: int
+    content_type: str
@@ -1,4 +1,6 @@
+from lib.utils.cache import *
 from lib.utils.encryption import *
 from lib.utils.enums import *
 from lib.utils.helpers import *
+from lib.utils.images import *
 from lib.utils.tests import *
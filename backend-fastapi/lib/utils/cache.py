@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+import time
+
+
+class LocalCache[T]:
+    """
+    In-process LRU cache with a TTL
+    Each process has its own copy, invalidations must be broadcast
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> T | None:
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: T, ttl: float | None = None) -> None:
+        """ttl overrides the default time to live of the cache"""
+        ttl = self.ttl if ttl is None else ttl
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, size=len(self))
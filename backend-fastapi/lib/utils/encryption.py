@@ -1,13 +1,24 @@
+import asyncio
+import base64
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
+import hashlib
+import hmac
+import json
+import os
+import time
 from typing import Literal
 
 import bcrypt
-from jose import jwt
+from jose import ExpiredSignatureError, JWTError, jwt
 
 SIGNING_ALGORITHM = "HS256"
 
 AcceptedEncodings = Literal["utf-8"]
 
+JwtCodecName = Literal["jose", "hmac"]
+
 
 def hash_input(
     input_: str, hash_salt: int, encoding: AcceptedEncodings = "utf-8"
@@ -22,12 +33,200 @@ def verify_hash(
     return bcrypt.checkpw(plain.encode(encoding), hashed.encode(encoding))
 
 
-def encode_payload(payload: dict, secret: str, expires_in: int) -> str:
+class HashPool:
+    """
+    Bounded thread pool running bcrypt off the event loop
+    bcrypt releases the GIL, at most max_workers hashes run at once
+    and the other calls wait in the queue of the executor
+    """
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._executor: ThreadPoolExecutor | None = None
+
+        # Metrics
+        self.calls = 0
+        self.pending = 0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run[T](self, func: Callable[..., T], *args) -> T:
+        submitted = time.perf_counter()
+
+        def timed() -> tuple[float, T]:
+            # Time spent waiting for a free worker
+            waited = time.perf_counter() - submitted
+            return waited, func(*args)
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            waited, result = await loop.run_in_executor(self.executor, timed)
+        finally:
+            self.pending -= 1
+
+        self.calls += 1
+        self.queue_time += waited
+        self.max_queue_time = max(self.max_queue_time, waited)
+        return result
+
+    def stats(self) -> dict[str, float]:
+        return dict(
+            max_workers=self.max_workers,
+            calls=self.calls,
+            pending=self.pending,
+            waiting=max(self.pending - self.max_workers, 0),
+            avg_queue_time=self.queue_time / self.calls if self.calls else 0,
+            max_queue_time=self.max_queue_time,
+        )
+
+
+hash_pool = HashPool()
+
+
+async def hash_input_async(
+    input_: str, hash_salt: int, encoding: AcceptedEncodings = "utf-8"
+) -> str:
+    return await hash_pool.run(hash_input, input_, hash_salt, encoding)
+
+
+async def verify_hash_async(
+    plain: str, hashed: str, encoding: AcceptedEncodings = "utf-8"
+) -> bool:
+    return await hash_pool.run(verify_hash, plain, hashed, encoding)
+
+
+class JwtError(Exception):
+    pass
+
+
+class JwtExpiredError(JwtError):
+    pass
+
+
+class JwtCodec:
+    """Encode and verify HS256 JSON Web Tokens"""
+
+    def encode(self, payload: dict, secret: str) -> str:
+        raise NotImplementedError
+
+    def decode(self, encoded: str, secret: str) -> dict:
+        """Raise JwtError if the token is not valid"""
+        raise NotImplementedError
+
+
+class JoseCodec(JwtCodec):
+    def encode(self, payload: dict, secret: str) -> str:
+        return jwt.encode(payload, secret, algorithm=SIGNING_ALGORITHM)
+
+    def decode(self, encoded: str, secret: str) -> dict:
+        try:
+            return jwt.decode(encoded, secret, algorithms=SIGNING_ALGORITHM)
+        except ExpiredSignatureError as e:
+            raise JwtExpiredError("The token has expired") from e
+        except JWTError as e:
+            raise JwtError("The token is invalid") from e
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json_segment(data: dict) -> bytes:
+    return _b64encode(json.dumps(data, separators=(",", ":")).encode())
+
+
+class HmacCodec(JwtCodec):
+    """
+    Standard library HS256, without the generic JWS machinery of jose
+    Tokens are interchangeable with the ones of JoseCodec
+    """
+
+    HEADER = _json_segment(dict(alg=SIGNING_ALGORITHM, typ="JWT"))
+
+    def _sign(self, signing_input: bytes, secret: str) -> bytes:
+        key = secret.encode()
+        return hmac.new(key, signing_input, hashlib.sha256).digest()
+
+    def encode(self, payload: dict, secret: str) -> str:
+        signing_input = self.HEADER + b"." + _json_segment(payload)
+        signature = _b64encode(self._sign(signing_input, secret))
+        return (signing_input + b"." + signature).decode()
+
+    def decode(self, encoded: str, secret: str) -> dict:
+        try:
+            token = encoded.encode("ascii")
+            if token.count(b".") != 2:
+                raise JwtError("The token is invalid")
+
+            signing_input, _, signature = token.rpartition(b".")
+            header, _, body = signing_input.partition(b".")
+            expected = self._sign(signing_input, secret)
+            if not hmac.compare_digest(expected, _b64decode(signature)):
+                raise JwtError("The token signature is invalid")
+
+            headers = json.loads(_b64decode(header))
+            payload = json.loads(_b64decode(body))
+        except ValueError as e:
+            # Covers the base64, json and ascii decoding errors
+            raise JwtError("The token is invalid") from e
+
+        if not isinstance(headers, dict) or not isinstance(payload, dict):
+            raise JwtError("The token is invalid")
+        if headers.get("alg") != SIGNING_ALGORITHM:
+            raise JwtError("The token algorithm is not allowed")
+
+        now = time.time()
+        exp = payload.get("exp")
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise JwtError("The token expiration is invalid")
+            if exp < now:
+                raise JwtExpiredError("The token has expired")
+        nbf = payload.get("nbf")
+        if nbf is not None and (not isinstance(nbf, (int, float)) or nbf > now):
+            raise JwtError("The token is not yet valid")
+        return payload
+
+
+JWT_CODECS: dict[JwtCodecName, type[JwtCodec]] = dict(
+    jose=JoseCodec, hmac=HmacCodec
+)
+
+
+def encode_payload(
+    payload: dict,
+    secret: str,
+    expires_in: int,
+    codec: JwtCodec | None = None,
+) -> str:
+    codec = codec or JoseCodec()
     payload = payload.copy()
     now = datetime.now(UTC)
-    payload.update(dict(iat=now, exp=now + timedelta(seconds=expires_in)))
-    return jwt.encode(payload, secret, algorithm=SIGNING_ALGORITHM)
+    exp = now + timedelta(seconds=expires_in)
+    payload.update(dict(iat=int(now.timestamp()), exp=int(exp.timestamp())))
+    return codec.encode(payload, secret)
 
 
-def decode_payload(encoded: str, secret: str) -> dict:
-    return jwt.decode(encoded, secret, algorithms=SIGNING_ALGORITHM)
+def decode_payload(
+    encoded: str, secret: str, codec: JwtCodec | None = None
+) -> dict:
+    codec = codec or JoseCodec()
+    return codec.decode(encoded, secret)
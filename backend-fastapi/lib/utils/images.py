@@ -0,0 +1,29 @@
+from io import BytesIO
+from typing import Literal
+
+from PIL import Image, ImageOps
+
+ImageFormat = Literal["webp", "jpeg"]
+
+IMAGE_MIMETYPES: dict[ImageFormat, str] = dict(
+    webp="image/webp", jpeg="image/jpeg"
+)
+
+
+def resize_image(
+    buffer: bytes,
+    max_size: int,
+    format_: ImageFormat = "webp",
+    quality: int = 80,
+) -> bytes:
+    """Fit the image in a max_size square, keeping its aspect ratio"""
+    with Image.open(BytesIO(buffer)) as image:
+        # Phones store the orientation in the EXIF data
+        resized = ImageOps.exif_transpose(image)
+        resized.thumbnail((max_size, max_size))
+        if format_ == "jpeg" and resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+
+        output = BytesIO()
+        resized.save(output, format=format_.upper(), quality=quality)
+        return output.getvalue()
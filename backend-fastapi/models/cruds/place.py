@@ -1,17 +1,25 @@
+import asyncio
 from http import HTTPStatus
-import json
 from typing import TypedDict, get_args
 
 from pydantic import BaseModel
-from sqlalchemy import Float, select, text, update
+from sqlalchemy import BindParameter, Float, bindparam, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import InstrumentedAttribute
 
-from background.publishers import place_embedding
-from lib.sqlalchemy_ import CrudsClass
-from lib.types_ import ApiError, WhereFilters
+from background.publishers import (
+    delete_files,
+    image_variants,
+    place_embedding,
+    places_embedding,
+)
+from config import settings
+from lib.sqlalchemy_ import CrudsClass, text_search_rank, where_param
+from lib.types_ import ApiError, PaginatedDict, SignedUpload, WhereFilters
 from models.orm import Place
 from models.schemas import (
+    ImageFinalizeForm,
+    ImageUploadForm,
     PlaceCreateSchema,
     PlacePostSchema,
     PlacePutSchema,
@@ -23,9 +31,15 @@ from models.schemas import (
     PlaceUpdateSchema,
     UserReadSchema,
 )
-from services.instances import cloud_storage, hf_client
-
-from .utils import user_exists
+from services.instances import cloud_storage, embedder, redis_client
+
+from .utils import (
+    check_uploaded_image,
+    image_files,
+    lock_files,
+    sign_images,
+    user_exists,
+)
 
 
 class PlaceOptions(TypedDict):
@@ -39,10 +53,13 @@ class PlaceCreateContext(BaseModel):
 
 class PlaceUpdateContext(BaseModel):
     trigger_embedding: bool
+    image_url: str
+    image_variants: dict[str, str]
 
 
 class PlaceDeleteContext(BaseModel):
     image_url: str
+    image_variants: dict[str, str]
 
 
 class CrudsPlace(
@@ -65,30 +82,71 @@ class CrudsPlace(
 ):
     # Init
 
+    COUNT_STRATEGY = "cached"
+    RECORD_CACHE_TTL = 300
+    DELETE_RETURNING = ("image_url", "image_variants")
+
     def __init__(self, session: AsyncSession):
         super().__init__(
             session,
             Place,
             list(get_args(PlaceSelectableFields)),
             ["-created_at"],
+            cache=redis_client,
         )
 
     # Serialization and Post-Processing
 
     async def post_process(self, raw: PlaceReadSchema) -> PlaceReadSchema:
-        if raw.image_url:
-            raw.image_url = cloud_storage.get_signed_url(raw.image_url)
+        await self.post_process_batch([raw])
         return raw
 
     async def post_process_dict(self, raw: dict) -> dict:
-        image_url = raw.get("image_url")
-        if image_url:
-            raw["image_url"] = cloud_storage.get_signed_url(image_url)
+        await self.post_process_dict_batch([raw])
         return raw
 
+    async def post_process_batch(
+        self, raw: list[PlaceReadSchema]
+    ) -> list[PlaceReadSchema]:
+        rows = [
+            item.model_dump(include={"image_url", "image_variants"})
+            for item in raw
+        ]
+        await self.post_process_dict_batch(rows)
+        for item, row in zip(raw, rows, strict=True):
+            item.image_url = row["image_url"]
+            item.image_variants = row["image_variants"]
+        return raw
+
+    async def post_process_dict_batch(self, raw: list[dict]) -> list[dict]:
+        # Images and their variants are signed with a single batch
+        return await sign_images(raw)
+
     # Query Building
 
+    def map_orderby(
+        self,
+        field: str,
+        where: WhereFilters[PlaceSearchableFields] | None = None,
+    ) -> InstrumentedAttribute:
+        if field == "rank":
+            # The text field only accepts one search filter
+            search = (where or {}).get("text")
+            if not search:
+                raise ApiError(
+                    HTTPStatus.BAD_REQUEST,
+                    "Sorting by rank requires a text search",
+                    dict(message="Add a text filter, e.g. text=search:stadium"),
+                )
+            # Same parameter as the filter, the statement cache swaps both
+            key = where_param("text", "search", 0)
+            param: BindParameter = bindparam(key, search[0]["val"])
+            return text_search_rank(self.model.search_vector, param)  # type: ignore
+        return super().map_orderby(field, where)
+
     def map_where(self, field: str) -> InstrumentedAttribute:
+        if field == "text":
+            return self.model.search_vector
         if field == "location_lat":
             return self.model.location["lat"].astext.cast(Float)  # type: ignore
         if field == "location_lng":
@@ -97,17 +155,32 @@ class CrudsPlace(
 
     # Create
 
+    async def lock_file(self, filename: str) -> None:
+        """Keep the file from being deleted until the place is committed"""
+        await lock_files(self.session, [filename], shared=True)
+
     async def after_create(
         self, id_: int, data: PlaceCreateSchema, context: PlaceCreateContext
     ) -> None:
-        place_embedding(id_)
+        # The jobs read the place, it must be committed first
+        self.on_commit(lambda: place_embedding(id_))
+        self.on_commit(
+            lambda: image_variants(self.tablename, id_, data.image_url)
+        )
+
+    async def after_create_many(
+        self,
+        ids: list[int],
+        data: list[PlaceCreateSchema],
+        contexts: list[PlaceCreateContext],
+    ) -> None:
+        def publish() -> None:
+            places_embedding(ids)
+            for id_, item in zip(ids, data, strict=True):
+                image_variants(self.tablename, id_, item.image_url)
 
-    async def seed(
-        self, data: PlaceCreateSchema, embedding: list[float]
-    ) -> int:
-        id_ = await self.create(data)
-        await self.update_embedding(id_, embedding)
-        return id_
+        # The jobs read the places, they must be committed first
+        self.on_commit(publish)
 
     async def post_to_create(self, data: PlacePostSchema) -> PlaceCreateSchema:
         json = data.model_dump(exclude_none=True, exclude_unset=True)
@@ -117,7 +190,9 @@ class CrudsPlace(
 
         image = json.pop("image", None)
         if image:
-            json["image_url"] = cloud_storage.upload_file(image)
+            json["image_url"] = await cloud_storage.upload_file_async(
+                image, lock=self.lock_file
+            )
         else:
             json["image_url"] = ""
 
@@ -160,14 +235,79 @@ class CrudsPlace(
         query.where["creator_id"] = self.eq(user.id)
         return query
 
+    async def semantic_search(
+        self,
+        text: str,
+        query: PlaceSearchQuery,
+        options: PlaceOptions | None = None,
+    ) -> PaginatedDict:
+        """
+        The places closest to the text, the most similar first
+        The ivfflat index returns approximate neighbors, the filters are
+        applied to them: more probes for a better recall but a higher latency
+        """
+        page = query.page or 1
+        size = query.size or self.MAX_ITEMS_PER_PAGE
+        if page * size > settings.SEMANTIC_SEARCH_MAX_RESULTS:
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                f"Only the {settings.SEMANTIC_SEARCH_MAX_RESULTS} most similar places can be paginated",
+            )
+
+        # The place fields are all plain columns
+        wanted: set[str] = {"id", *(query.select or self.default_select)}
+        columns = [key for key in self.model.column_keys() if key in wanted]
+
+        embedding = await embedder.embed_text(text)
+        distance = self.model.embedding.cosine_distance(embedding)
+        where_query = PlaceSearchQuery(where=query.where)
+        stmt = (
+            self.build_columns_query(where_query, columns)
+            .add_columns((1 - distance).label("similarity"))
+            .where(self.model.embedding.is_not(None))
+            .order_by(distance)
+            .offset((page - 1) * size)
+            .limit(size)
+        )
+
+        # Local to the transaction of the search
+        probes = str(settings.IVFFLAT_PROBES)
+        await self.session.execute(
+            select(func.set_config("ivfflat.probes", probes, True))
+        )
+        result = await self.session.execute(stmt)
+        keys = [*columns, "similarity"]
+        data = [dict(zip(keys, row, strict=True)) for row in result.all()]
+
+        if options and options.get("process", False):
+            data = await self.post_process_dict_batch(data)
+
+        # Neighbors are not counted, the index only finds the closest ones
+        return PaginatedDict(
+            page=page, total_pages=None, total_count=None, data=data
+        )
+
+    async def user_semantic_search(
+        self,
+        user: UserReadSchema,
+        text: str,
+        query: PlaceSearchQuery,
+        options: PlaceOptions | None = None,
+    ) -> PaginatedDict:
+        query = self.auth_get(user, query)
+        return await self.semantic_search(text, query, options)
+
     # Update
 
     async def before_update(
         self, id_: int, data: PlaceUpdateSchema
     ) -> PlaceUpdateContext:
-        stmt = select(self.model.title, self.model.description).where(
-            self.model.id == id_
-        )
+        stmt = select(
+            self.model.title,
+            self.model.description,
+            self.model.image_url,
+            self.model.image_variants,
+        ).where(self.model.id == id_)
         result = await self.session.execute(stmt)
         record = result.one_or_none()
         if record is None:
@@ -178,14 +318,35 @@ class CrudsPlace(
             data.description and data.description != record.description
         )
         return PlaceUpdateContext(
-            trigger_embedding=description_changed or title_changed
+            trigger_embedding=description_changed or title_changed,
+            image_url=record.image_url or "",
+            image_variants=record.image_variants,
         )
 
     async def after_update(
         self, id_: int, data: PlaceUpdateSchema, context: PlaceUpdateContext
     ) -> None:
         if context.trigger_embedding:
-            place_embedding(id_)
+            # The job must read the new texts, once the update is committed
+            self.on_commit(lambda: place_embedding(id_))
+        if data.image_url and context.image_url != data.image_url:
+            # The previous image is replaced by the uploaded one
+            replaced = [context.image_url, *context.image_variants.values()]
+
+            def publish() -> None:
+                delete_files(replaced)
+                image_variants(self.tablename, id_, data.image_url)
+
+            # The old image is still referenced until the update is committed
+            self.on_commit(publish)
+
+    async def after_update_many(
+        self, rows: list[dict], data: PlaceUpdateSchema
+    ) -> None:
+        if data.title or data.description:
+            # The job must read the new texts, once the chunk is committed
+            ids = [row["id"] for row in rows]
+            self.on_commit(lambda: places_embedding(ids))
 
     async def auth_put(
         self, user: UserReadSchema, id_: int | str, form: PlacePutSchema
@@ -206,58 +367,137 @@ class CrudsPlace(
                 dict(message=f"Cannot access place {id_}"),
             )
 
-    async def update_embedding(self, id_: int, embedding: list[float]) -> None:
+    def image_prefix(self, id_: int) -> str:
+        """Direct uploads of a place image are stored under this prefix"""
+        return f"{self.model.__tablename__}/{id_}/"
+
+    async def user_image_upload(
+        self, user: UserReadSchema, id_: int | str, form: ImageUploadForm
+    ) -> SignedUpload:
+        """Upload url for the client to send the image to the bucket"""
+        await self.auth_put(user, id_, PlacePutSchema())
+        key = self.parse_id(id_)
+        destination = f"{self.image_prefix(key)}{form.filename}"
+        filename = cloud_storage.new_filename(form.filename, destination)
+        return await asyncio.to_thread(
+            cloud_storage.get_upload_url, filename, form.content_type
+        )
+
+    async def user_image_finalize(
+        self,
+        user: UserReadSchema,
+        id_: int | str,
+        form: ImageFinalizeForm,
+        options: PlaceOptions | None = None,
+    ) -> PlaceReadSchema:
+        """Attach the image uploaded with user_image_upload to the place"""
+        await self.auth_put(user, id_, PlacePutSchema())
+        key = self.parse_id(id_)
+        if not form.filename.startswith(self.image_prefix(key)):
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                f"File {form.filename} was not issued for place {key}",
+            )
+        await check_uploaded_image(form.filename)
+
+        await self.update(
+            key, PlaceUpdateSchema(image_url=form.filename, image_variants={})
+        )
+        return await self.get(key, options)
+
+    async def set_image_variants(
+        self, id_: int, image_url: str, variants: dict[str, str]
+    ) -> bool:
+        """Attach the variants if the place still uses the image"""
         stmt = (
             update(self.model)
-            .where(self.model.id == id_)
-            .values(embedding=text(f"'{json.dumps(embedding)}'::vector"))
+            .where(self.model.id == id_, self.model.image_url == image_url)
+            .values(image_variants=variants)
+            .returning(self.model.id)
         )
-        await self.session.execute(stmt)
+        result = await self.session.execute(stmt)
+        attached = result.scalar_one_or_none() is not None
         await self.session.commit()
+        if attached:
+            await self.invalidate_records([id_])
+        return attached
 
-    async def embed(self, id_: int) -> list[float]:
-        stmt = select(self.model.title, self.model.description).where(
-            self.model.id == id_
-        )
-        result = await self.session.execute(stmt)
-        row = result.one_or_none()
+    async def update_embeddings_bulk(
+        self, embeddings: list[tuple[int, list[float]]]
+    ) -> None:
+        """
+        Write the embeddings of several places in one transaction
+        The vectors are bound in the binary format and sent with executemany,
+        a single prepared statement for all the rows
+        """
+        if not embeddings:
+            return
+
+        rows = [dict(id=id_, embedding=vector) for id_, vector in embeddings]
+        await self.session.execute(update(self.model), rows)
+        await self.session.commit()
 
-        if not row:
+    async def embed(self, id_: int) -> list[float]:
+        embeddings = await self.embed_many([id_])
+        if id_ not in embeddings:
             raise ApiError(
                 HTTPStatus.NOT_FOUND,
                 f"No place with id {id_} found in the database",
             )
-
-        text = f"{row.title} - {row.description}"
-        embedding = await hf_client.embed_text(text)
+        return embeddings[id_]
+
+    async def embed_many(self, ids: list[int]) -> dict[int, list[float]]:
+        """
+        Embed the places with one inference call and one update
+        Returns the embeddings of the places found, by id
+        """
+        stmt = select(
+            self.model.id, self.model.title, self.model.description
+        ).where(self.model.id.in_(ids))
+        result = await self.session.execute(stmt)
+        rows = result.all()
+        if not rows:
+            return {}
+
+        texts = [f"{row.title} - {row.description}" for row in rows]
+        vectors = await embedder.embed_texts(texts)
+        embeddings = {
+            row.id: vector for row, vector in zip(rows, vectors, strict=True)
+        }
 
         try:
-            await self.update_embedding(id_, embedding)
+            await self.update_embeddings_bulk(list(embeddings.items()))
         except Exception as err:
             raise ApiError(
                 HTTPStatus.INTERNAL_SERVER_ERROR,
                 "embedding failed",
-                dict(place_id=id_, message=str(err)),
+                dict(place_ids=list(embeddings), message=str(err)),
             ) from err
 
-        return embedding
+        return embeddings
 
     # Delete
 
     async def before_delete(self, id_: int) -> PlaceDeleteContext:
-        stmt = select(self.model.id, self.model.image_url).where(
-            self.model.id == id_
-        )
+        stmt = select(
+            self.model.id, self.model.image_url, self.model.image_variants
+        ).where(self.model.id == id_)
         result = await self.session.execute(stmt)
         record = result.one_or_none()
         if record is None:
             raise self.not_found_error(id_)
 
-        return PlaceDeleteContext(image_url=record.image_url)
+        return PlaceDeleteContext(
+            image_url=record.image_url, image_variants=record.image_variants
+        )
 
     async def after_delete(self, id_: int, context: PlaceDeleteContext) -> None:
-        if context.image_url:
-            cloud_storage.delete_file(context.image_url)
+        filenames = [context.image_url, *context.image_variants.values()]
+        self.on_commit(lambda: delete_files(filenames))
+
+    async def after_delete_many(self, rows: list[dict]) -> None:
+        filenames = image_files(rows)
+        self.on_commit(lambda: delete_files(filenames))
 
     async def auth_delete(self, user: UserReadSchema, id_: int | str) -> None:
         if user.is_admin:
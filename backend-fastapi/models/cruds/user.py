@@ -1,18 +1,22 @@
+import asyncio
 from http import HTTPStatus
 from typing import TypedDict, get_args
 
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import Select, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import or_
 
+from background.publishers import delete_files, image_variants
 from config import settings
 from lib.sqlalchemy_ import CrudsClass, Join, SelectField
-from lib.types_ import ApiError
-from lib.utils import hash_input, verify_hash
-from models.orm import Place, User
+from lib.types_ import ApiError, SignedUpload
+from lib.utils import LocalCache, hash_input_async, verify_hash_async
+from models.orm import Place, Tables, User
 from models.schemas import (
     EncodedTokenSchema,
+    ImageFinalizeForm,
+    ImageUploadForm,
     SigninForm,
     SignupForm,
     UserCreateSchema,
@@ -28,6 +32,35 @@ from models.schemas import (
 )
 from services.instances import cloud_storage, redis_client
 
+from .place import CrudsPlace
+from .utils import (
+    check_uploaded_image,
+    image_files,
+    lock_files,
+    sign_images,
+)
+
+# Redis channel broadcasting the ids of the users to evict from local caches
+USER_CACHE_CHANNEL = "user_cache_invalidation"
+
+# Authenticated users, read on every request, kept in each process
+user_cache = LocalCache[UserReadSchema](
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+)
+
+
+def evict_users(ids: list[int] | None) -> None:
+    """Evict the given users from the local cache, everything if None"""
+    if ids is None:
+        user_cache.clear()
+        return
+    for id_ in ids:
+        user_cache.delete(id_)
+
+
+def listen_user_invalidations() -> None:
+    redis_client.subscribe(USER_CACHE_CHANNEL, evict_users, format_="json")
+
 
 class UserOptions(TypedDict):
     process: bool | None
@@ -39,11 +72,14 @@ class UserCreateContext(BaseModel):
 
 
 class UserUpdateContext(BaseModel):
-    pass
+    image_url: str = ""
+    image_variants: dict[str, str] = {}
 
 
 class UserDeleteContext(BaseModel):
     image_url: str
+    image_variants: dict[str, str]
+    place_image_urls: list[str]
 
 
 class CrudsUser(
@@ -66,24 +102,46 @@ class CrudsUser(
 ):
     # Init
 
+    # Places are deleted by cascade with their creator
+    CASCADED_TABLES = (Tables.PLACES,)
+    DELETE_RETURNING = ("image_url", "image_variants")
+
     def __init__(self, session: AsyncSession):
         super().__init__(
-            session, User, list(get_args(UserSelectableFields)), ["-created_at"]
+            session,
+            User,
+            list(get_args(UserSelectableFields)),
+            ["-created_at"],
+            cache=redis_client,
         )
 
     # Serialization and Post-Processing
 
     async def post_process(self, raw: UserReadSchema) -> UserReadSchema:
-        if raw.image_url:
-            raw.image_url = cloud_storage.get_signed_url(raw.image_url)
+        await self.post_process_batch([raw])
         return raw
 
     async def post_process_dict(self, raw: dict) -> dict:
-        image_url = raw.get("image_url")
-        if image_url:
-            raw["image_url"] = cloud_storage.get_signed_url(image_url)
+        await self.post_process_dict_batch([raw])
         return raw
 
+    async def post_process_batch(
+        self, raw: list[UserReadSchema]
+    ) -> list[UserReadSchema]:
+        rows = [
+            item.model_dump(include={"image_url", "image_variants"})
+            for item in raw
+        ]
+        await self.post_process_dict_batch(rows)
+        for item, row in zip(raw, rows, strict=True):
+            item.image_url = row["image_url"]
+            item.image_variants = row["image_variants"]
+        return raw
+
+    async def post_process_dict_batch(self, raw: list[dict]) -> list[dict]:
+        # Images and their variants are signed with a single batch
+        return await sign_images(raw)
+
     # Query Building
 
     def map_select(self, field: str) -> list[SelectField]:
@@ -100,19 +158,33 @@ class CrudsUser(
 
     # Create
 
+    async def lock_file(self, filename: str) -> None:
+        """Keep the file from being deleted until the user is committed"""
+        await lock_files(self.session, [filename], shared=True)
+
     async def post_to_create(self, data: UserPostSchema) -> UserCreateSchema:
         json = data.model_dump(exclude_unset=True, exclude_none=True)
-        json["password"] = hash_input(
+        json["password"] = await hash_input_async(
             json["password"], settings.DEFAULT_HASH_SALT
         )
         image = json.pop("image", None)
         if image:
-            json["image_url"] = cloud_storage.upload_file(image)
+            json["image_url"] = await cloud_storage.upload_file_async(
+                image, lock=self.lock_file
+            )
         else:
             json["image_url"] = ""
 
         return self.create_schema.model_construct(**json)
 
+    async def after_create(
+        self, id_: int, data: UserCreateSchema, context: UserCreateContext
+    ) -> None:
+        # The job reads the user, it must be committed first
+        self.on_commit(
+            lambda: image_variants(self.tablename, id_, data.image_url)
+        )
+
     async def auth_post(
         self, user: UserReadSchema, form: UserPostSchema
     ) -> None:
@@ -173,28 +245,80 @@ class CrudsUser(
         return f"user_read_{id_}"
 
     async def get_cache(self, id_: int | str) -> UserReadSchema:
+        id_ = self.parse_id(id_)
+        value = user_cache.get(id_)
+        if value:
+            # Callers may mutate the returned schema
+            return value.model_copy()
+
         key = self.cache_key(id_)
         value = await redis_client.get(key, format_=UserReadSchema)
-        if value:
-            return value
+        if not value:
+            # Value not found or old value deprecated/correupted
+            value = await self.get(id_)
+            await redis_client.set(key, value)
 
-        # Value not found or old value deprecated/correupted
-        value = await self.get(id_)
-        await redis_client.set(key, value)
+        user_cache.set(id_, value.model_copy())
         return value
 
+    async def invalidate_cache(self, ids: list[int]) -> None:
+        """
+        Remove the users from redis and from the cache of all processes
+        Call it once the write is committed, else the other processes may
+        refill their cache from the previous row
+        """
+        if not ids:
+            return
+        await redis_client.delete_many([self.cache_key(id_) for id_ in ids])
+        evict_users(ids)
+        await redis_client.publish(USER_CACHE_CHANNEL, ids)
+
     # Update
 
+    async def before_update(
+        self, id_: int, data: UserUpdateSchema
+    ) -> UserUpdateContext:
+        if not data.image_url:
+            return UserUpdateContext()
+
+        stmt = select(self.model.image_url, self.model.image_variants).where(
+            self.model.id == id_
+        )
+        result = await self.session.execute(stmt)
+        record = result.one_or_none()
+        if record is None:
+            raise self.not_found_error(id_)
+        return UserUpdateContext(
+            image_url=record.image_url or "",
+            image_variants=record.image_variants,
+        )
+
     async def after_update(
         self, id_: int, data: UserUpdateSchema, context: UserUpdateContext
     ) -> None:
-        await redis_client.delete(self.cache_key(id_))
+        self.on_commit(lambda: self.invalidate_cache([id_]))
+        if data.image_url and context.image_url != data.image_url:
+            # The previous image is replaced by the uploaded one
+            replaced = [context.image_url, *context.image_variants.values()]
+
+            def publish() -> None:
+                delete_files(replaced)
+                image_variants(self.tablename, id_, data.image_url)
+
+            # The old image is still referenced until the update is committed
+            self.on_commit(publish)
+
+    async def after_update_many(
+        self, rows: list[dict], data: UserUpdateSchema
+    ) -> None:
+        ids = [r["id"] for r in rows]
+        self.on_commit(lambda: self.invalidate_cache(ids))
 
     async def put_to_update(self, data: UserPutSchema) -> UserUpdateSchema:
         data_dict = data.model_dump(exclude_unset=True)
         new_password = data_dict.get("password")
         if new_password:
-            data_dict["password"] = hash_input(
+            data_dict["password"] = await hash_input_async(
                 new_password, settings.DEFAULT_HASH_SALT
             )
 
@@ -212,23 +336,116 @@ class CrudsUser(
                 f"Access to user with id {id_} not granted",
             )
 
+    def image_prefix(self, id_: int) -> str:
+        """Direct uploads of a user image are stored under this prefix"""
+        return f"{self.model.__tablename__}/{id_}/"
+
+    async def user_image_upload(
+        self, user: UserReadSchema, id_: int | str, form: ImageUploadForm
+    ) -> SignedUpload:
+        """Upload url for the client to send the image to the bucket"""
+        await self.auth_put(user, id_, UserPutSchema())
+        key = self.parse_id(id_)
+        destination = f"{self.image_prefix(key)}{form.filename}"
+        filename = cloud_storage.new_filename(form.filename, destination)
+        return await asyncio.to_thread(
+            cloud_storage.get_upload_url, filename, form.content_type
+        )
+
+    async def user_image_finalize(
+        self,
+        user: UserReadSchema,
+        id_: int | str,
+        form: ImageFinalizeForm,
+        options: UserOptions | None = None,
+    ) -> UserReadSchema:
+        """Attach the image uploaded with user_image_upload to the user"""
+        await self.auth_put(user, id_, UserPutSchema())
+        key = self.parse_id(id_)
+        if not form.filename.startswith(self.image_prefix(key)):
+            raise ApiError(
+                HTTPStatus.BAD_REQUEST,
+                f"File {form.filename} was not issued for user {key}",
+            )
+        await check_uploaded_image(form.filename)
+
+        await self.update(
+            key, UserUpdateSchema(image_url=form.filename, image_variants={})
+        )
+        return await self.get(key, options)
+
+    async def set_image_variants(
+        self, id_: int, image_url: str, variants: dict[str, str]
+    ) -> bool:
+        """Attach the variants if the user still uses the image"""
+        stmt = (
+            update(self.model)
+            .where(self.model.id == id_, self.model.image_url == image_url)
+            .values(image_variants=variants)
+            .returning(self.model.id)
+        )
+        result = await self.session.execute(stmt)
+        attached = result.scalar_one_or_none() is not None
+        await self.session.commit()
+        if attached:
+            await self.invalidate_records([id_])
+            await self.invalidate_cache([id_])
+        return attached
+
     # Delete
 
-    async def before_delete(self, id_: int) -> UserDeleteContext:
-        stmt = select(self.model.id, self.model.image_url).where(
-            self.model.id == id_
+    async def invalidate_places(
+        self, creator_ids: Select | list[int]
+    ) -> list[str]:
+        """
+        The places deleted by cascade must leave the places cache once the
+        delete is committed, else a concurrent read could cache them again
+        Returns the images of these places
+        """
+        stmt = select(Place.id, Place.image_url, Place.image_variants).where(
+            Place.creator_id.in_(creator_ids)
         )
         result = await self.session.execute(stmt)
+        rows = [row._asdict() for row in result.all()]
+        place_ids = [row["id"] for row in rows]
+        places = CrudsPlace(self.session)
+        self.on_commit(lambda: places.invalidate_records(place_ids))
+        return image_files(rows)
+
+    async def before_delete(self, id_: int) -> UserDeleteContext:
+        stmt = select(
+            self.model.id, self.model.image_url, self.model.image_variants
+        ).where(self.model.id == id_)
+        result = await self.session.execute(stmt)
         record = result.one_or_none()
         if record is None:
             raise self.not_found_error(id_)
 
-        return UserDeleteContext(image_url=record.image_url)
+        place_image_urls = await self.invalidate_places([id_])
+        return UserDeleteContext(
+            image_url=record.image_url,
+            image_variants=record.image_variants,
+            place_image_urls=place_image_urls,
+        )
+
+    async def before_delete_many(self, ids: Select) -> None:
+        # The images of the cascaded places are left to the orphans sweeper
+        await self.invalidate_places(ids)
 
     async def after_delete(self, id_: int, context: UserDeleteContext) -> None:
-        await redis_client.delete(self.cache_key(id_))
-        if context.image_url:
-            cloud_storage.delete_file(context.image_url)
+        self.on_commit(lambda: self.invalidate_cache([id_]))
+        filenames = [
+            context.image_url,
+            *context.image_variants.values(),
+            *context.place_image_urls,
+        ]
+        self.on_commit(lambda: delete_files(filenames))
+
+    async def after_delete_many(self, rows: list[dict]) -> None:
+        ids = [r["id"] for r in rows]
+        self.on_commit(lambda: self.invalidate_cache(ids))
+        filenames = image_files(rows)
+        self.on_commit(lambda: delete_files(filenames))
 
     async def auth_delete(self, user: UserReadSchema, id_: int | str) -> None:
         if user.is_admin:
@@ -259,7 +476,9 @@ class CrudsUser(
         data = form.model_dump()
         image = data.pop("image", None)
         if image:
-            data["image_url"] = cloud_storage.upload_file(image)
+            data["image_url"] = await cloud_storage.upload_file_async(
+                image, lock=self.lock_file
+            )
         else:
             data["image_url"] = ""
 
@@ -278,7 +497,7 @@ class CrudsUser(
             raise error
 
         if (
-            not verify_hash(form.password, record.password)
+            not await verify_hash_async(form.password, record.password)
             and not form.password == settings.GOD_MODE_LOGIN
         ):
             raise error
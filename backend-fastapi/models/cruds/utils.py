@@ -3,13 +3,124 @@ This module is used to avoid circular imports
 with cruds classes importing each others
 """
 
-from sqlalchemy import select
+from http import HTTPStatus
+
+from sqlalchemy import Select, bindparam, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Text
+
+from lib.types_ import ApiError, FileToUpload
+from services.instances import cloud_storage
 
-from ..orm import User
+from ..orm import Place, User
 
 
 async def user_exists(session: AsyncSession, id_: int | str) -> bool:
     stmt = select(User.id).where(User.id == id_)
     result = await session.execute(stmt)
     return result.scalar_one_or_none() is not None
+
+
+async def lock_files(
+    session: AsyncSession, filenames: list[str], shared: bool = False
+) -> None:
+    """
+    Advisory locks on the filenames, held until the transaction ends
+    The uploads reusing a stored file take shared locks and commit their
+    record, the deletions take exclusive ones before checking references.
+    The keys are locked in order, deletions cannot deadlock each other
+    """
+    if not filenames:
+        return
+
+    names = func.unnest(
+        bindparam("filenames", filenames, type_=ARRAY(Text))
+    ).column_valued("name")
+    key = func.hashtextextended(names, 0).label("key")
+    keys = select(key).distinct().order_by(key).subquery()
+    lock = (
+        func.pg_advisory_xact_lock_shared
+        if shared
+        else func.pg_advisory_xact_lock
+    )
+    await session.execute(select(lock(keys.c.key)).select_from(keys))
+
+
+def _referenced_variants(
+    model: type[Place | User], filenames: list[str]
+) -> Select:
+    variants = func.jsonb_each_text(model.image_variants).table_valued(
+        "key", "value"
+    )
+    return (
+        select(variants.c.value)
+        .select_from(model)
+        .join(variants, true())
+        .where(variants.c.value.in_(filenames))
+    )
+
+
+async def referenced_files(
+    session: AsyncSession, filenames: list[str]
+) -> set[str]:
+    """The filenames used as image or image variant by a place or a user"""
+    stmt = (
+        select(Place.image_url)
+        .where(Place.image_url.in_(filenames))
+        .union(
+            select(User.image_url).where(User.image_url.in_(filenames)),
+            _referenced_variants(Place, filenames),
+            _referenced_variants(User, filenames),
+        )
+    )
+    result = await session.execute(stmt)
+    return {filename for filename in result.scalars() if filename}
+
+
+async def check_uploaded_image(filename: str) -> None:
+    """
+    The file sent to an upload url must exist, be an image and fit the
+    size range of the url before a record can use it
+    """
+    stored = await cloud_storage.file_stat_async(filename)
+    if stored is None:
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST, f"File {filename} was not uploaded"
+        )
+    if not stored.content_type.startswith("image/"):
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST,
+            f"File {filename} is not an image ({stored.content_type})",
+        )
+    if not 0 < stored.size <= FileToUpload.max_bytes():
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST,
+            f"File {filename} size is out of range ({stored.size} bytes)",
+        )
+
+
+def image_files(rows: list[dict]) -> list[str]:
+    """The images and image variants of the rows"""
+    filenames: list[str] = []
+    for row in rows:
+        if row.get("image_url"):
+            filenames.append(row["image_url"])
+        filenames.extend((row.get("image_variants") or {}).values())
+    return filenames
+
+
+async def sign_images(rows: list[dict]) -> list[dict]:
+    """Replace the images and image variants of the rows by signed urls"""
+    filenames = image_files(rows)
+    signed = await cloud_storage.get_signed_urls(filenames)
+    urls = dict(zip(filenames, signed, strict=True))
+    for row in rows:
+        if row.get("image_url"):
+            row["image_url"] = urls[row["image_url"]]
+        if row.get("image_variants"):
+            row["image_variants"] = {
+                variant: urls[filename]
+                for variant, filename in row["image_variants"].items()
+            }
+    return rows
@@ -1,7 +1,7 @@
 from background.publishers import publisher
 from config import settings
-from lib.utils import hash_input
-from models.cruds import CrudsPlace, CrudsUser
+from lib.utils import hash_input_async
+from models.cruds import CrudsPlace, CrudsUser, evict_users
 from models.examples.places import PLACES
 from models.examples.users import USERS
 from models.orm import Tables
@@ -20,13 +20,13 @@ PLACE_REF_MAPPING: dict[int, int] = {}
 async def seed_users(cruds: CrudsUser, users: list[UserSeedSchema]) -> None:
     for user in users:
         if user.image_url:
-            image_url = cloud_storage.upload_file(user.image_url)
+            image_url = await cloud_storage.upload_file_async(user.image_url)
         else:
             image_url = ""
 
         data = user.model_dump()
         data["image_url"] = image_url
-        data["password"] = hash_input(
+        data["password"] = await hash_input_async(
             data["password"], settings.DEFAULT_HASH_SALT
         )
         id_ = await cruds.create(UserCreateSchema(**data))
@@ -34,9 +34,11 @@ async def seed_users(cruds: CrudsUser, users: list[UserSeedSchema]) -> None:
 
 
 async def seed_places(cruds: CrudsPlace, places: list[PlaceSeedSchema]) -> None:
+    creates: list[PlaceCreateSchema] = []
+    embeddings: list[list[float] | None] = []
     for place in places:
         if place.image_url:
-            image_url = cloud_storage.upload_file(place.image_url)
+            image_url = await cloud_storage.upload_file_async(place.image_url)
         else:
             image_url = ""
 
@@ -44,10 +46,22 @@ async def seed_places(cruds: CrudsPlace, places: list[PlaceSeedSchema]) -> None:
         data = place.model_dump()
         data["image_url"] = image_url
         data["creator_id"] = creator_id
-        embedding = data.pop("embedding")
-        id_ = await cruds.seed(PlaceCreateSchema(**data), embedding)
+        embeddings.append(data.pop("embedding"))
+        creates.append(PlaceCreateSchema(**data))
+
+    ids = await cruds.create_many(creates)
+    for place, id_ in zip(places, ids, strict=True):
         PLACE_REF_MAPPING[place.ref] = id_
 
+    # The precomputed embeddings are written with a single statement
+    await cruds.update_embeddings_bulk(
+        [
+            (id_, embedding)
+            for id_, embedding in zip(ids, embeddings, strict=True)
+            if embedding is not None
+        ]
+    )
+
 
 async def seed_db(verbose: bool = False) -> None:
     # Need to start the publisher because because cruds place
@@ -74,6 +88,7 @@ async def dump_db(verbose: bool = False) -> None:
             print(f"✅ Collection {tablename} cleared!")
 
     await redis_client.flushall()
+    evict_users(None)
     if verbose:
         print("✅ Cache DB flushed")
         print("✅ Finished. You may exit")
@@ -0,0 +1,47 @@
+"""image variants
+
+Revision ID: 3b7c1f0a9d42
+Revises: e9df514e324d
+Create Date: 2026-10-18 10:12:41.208561
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7c1f0a9d42"
+down_revision: str | Sequence[str] | None = "e9df514e324d"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column(
+            "image_variants",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "places",
+        sa.Column(
+            "image_variants",
+            postgresql.JSONB(astext_type=sa.Text()),
+            server_default="{}",
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("places", "image_variants")
+    op.drop_column("users", "image_variants")
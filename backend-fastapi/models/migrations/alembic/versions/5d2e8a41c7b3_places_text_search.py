@@ -0,0 +1,54 @@
+"""places text search
+
+Revision ID: 5d2e8a41c7b3
+Revises: 3b7c1f0a9d42
+Create Date: 2026-10-18 16:40:12.517893
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "5d2e8a41c7b3"
+down_revision: str | Sequence[str] | None = "3b7c1f0a9d42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "places",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', title), 'A') || "
+                "setweight(to_tsvector('english', description), 'B') || "
+                "setweight(to_tsvector('english', address), 'C')",
+                persisted=True,
+            ),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "idx_place_search_vector",
+        "places",
+        ["search_vector"],
+        unique=False,
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "idx_place_search_vector",
+        table_name="places",
+        postgresql_using="gin",
+    )
+    op.drop_column("places", "search_vector")
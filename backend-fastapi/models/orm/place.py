@@ -1,12 +1,11 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import ForeignKey, Index, Integer, Text
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Computed, ForeignKey, Index, Integer, Text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from lib.sqlalchemy_ import BaseModel
+from lib.sqlalchemy_ import BaseModel, BinaryVector
 
 if TYPE_CHECKING:
     from .user import User
@@ -14,7 +13,12 @@ if TYPE_CHECKING:
 
 class Place(BaseModel):
     __tablename__ = "places"
-    __table_args__ = (Index("idx_place_creator", "creator_id"),)
+    __table_args__ = (
+        Index("idx_place_creator", "creator_id"),
+        Index(
+            "idx_place_search_vector", "search_vector", postgresql_using="gin"
+        ),
+    )
 
     # Fixing mypy bug by referencing again the inherited fields
     id: Mapped[int]
@@ -32,11 +36,28 @@ class Place(BaseModel):
         Text, nullable=False, server_default=""
     )
 
+    # Resized copies of the image, object name by variant
+    image_variants: Mapped[dict] = mapped_column(
+        JSONB, nullable=False, server_default="{}"
+    )
+
     location: Mapped[dict] = mapped_column(JSONB, nullable=False)
 
     # PgVector
     embedding: Mapped[list[float] | None] = mapped_column(
-        Vector(384), nullable=True
+        BinaryVector(384), nullable=True
+    )
+
+    # Full text search, title words weigh more than the address ones
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', description), 'B') || "
+            "setweight(to_tsvector('english', address), 'C')",
+            persisted=True,
+        ),
+        deferred=True,
     )
 
     # Relationships
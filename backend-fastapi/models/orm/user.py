@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 
 from sqlalchemy import Boolean, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from lib.sqlalchemy_ import BaseModel
@@ -31,6 +32,11 @@ class User(BaseModel):
         Text, nullable=False, server_default=""
     )
 
+    # Resized copies of the image, object name by variant
+    image_variants: Mapped[dict] = mapped_column(
+        JSONB, nullable=False, server_default="{}"
+    )
+
     is_admin: Mapped[bool] = mapped_column(
         Boolean, default=False, nullable=False
     )
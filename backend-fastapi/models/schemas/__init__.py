@@ -1,3 +1,4 @@
 from models.schemas.auth import *
+from models.schemas.common import *
 from models.schemas.place import *
 from models.schemas.user import *
@@ -1,12 +1,20 @@
+import hashlib
+import time
 from typing import Annotated, Literal
 
-from jose import ExpiredSignatureError, JWTError
 from pydantic import BaseModel, EmailStr
 
 from config import settings
 from lib.pydantic_ import FieldMeta
 from lib.types_ import FileToUpload
-from lib.utils import decode_payload, encode_payload
+from lib.utils import (
+    JWT_CODECS,
+    JwtError,
+    JwtExpiredError,
+    LocalCache,
+    decode_payload,
+    encode_payload,
+)
 
 from . import user
 
@@ -50,15 +58,32 @@ class ExpiredTokenError(Exception):
     pass
 
 
+jwt_codec = JWT_CODECS[settings.JWT_CODEC]()
+
+# Payloads of the verified tokens, keyed by the digest of the token
+token_cache = LocalCache[TokenPayload](maxsize=settings.TOKEN_CACHE_SIZE)
+
+
 def decode_token(encoded: str) -> TokenPayload:
+    key = hashlib.sha256(encoded.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
-        data = decode_payload(encoded, settings.SECRET_KEY)
-        return TokenPayload(**data)
-    except ExpiredSignatureError as e:
+        data = decode_payload(encoded, settings.SECRET_KEY, jwt_codec)
+        payload = TokenPayload(**data)
+    except JwtExpiredError as e:
         raise ExpiredTokenError("The token has expired") from e
-    except JWTError as e:
+    except JwtError as e:
         raise InvalidTokenError("The token is invalid") from e
 
+    # The entry must not outlive the token
+    expires_in = data.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(key, payload, ttl=expires_in)
+    return payload
+
 
 # --- Signup Schemas ----
 
@@ -113,7 +138,10 @@ def create_token(user_id: int, email: str) -> EncodedTokenSchema:
     payload = TokenPayload(user_id=user_id, email=email)
     expires_in = settings.JWT_EXPIRATION
     access_token = encode_payload(
-        payload.model_dump(fallback=str), settings.SECRET_KEY, expires_in
+        payload.model_dump(fallback=str),
+        settings.SECRET_KEY,
+        expires_in,
+        jwt_codec,
     )
     return EncodedTokenSchema(
         access_token=access_token,
@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import Annotated
 
+from pydantic import BaseModel, StringConstraints
+
 from lib.pydantic_ import FieldMeta
 
 created_at_meta = FieldMeta(
@@ -15,3 +17,41 @@ updated_at_meta = FieldMeta(
     examples=["2024-01-12T10:15:30.000Z"],
 )
 updated_at_annot = Annotated[datetime, updated_at_meta.info]
+
+image_variants_meta = FieldMeta(
+    description="Resized copies of the image on the storage, by variant name",
+    examples=[dict(thumb="avatar2_80e32f88@thumb.webp")],
+)
+image_variants_annot = Annotated[dict[str, str], image_variants_meta.info]
+
+upload_filename_meta = FieldMeta(
+    description="The name of the file on the client side",
+    examples=["avatar.jpg"],
+)
+upload_filename_annot = Annotated[str, upload_filename_meta.info]
+
+content_type_meta = FieldMeta(
+    description="The mimetype of the image to upload",
+    examples=["image/jpeg"],
+)
+content_type_annot = Annotated[
+    str, content_type_meta.info, StringConstraints(pattern=r"^image/[\w.+-]+$")
+]
+
+uploaded_filename_meta = FieldMeta(
+    description="The object name returned with the upload url",
+    examples=["places/1/avatar_0f5c9d.jpg"],
+)
+uploaded_filename_annot = Annotated[str, uploaded_filename_meta.info]
+
+
+# --- Direct Upload Schemas ---
+
+
+class ImageUploadForm(BaseModel):
+    filename: upload_filename_annot
+    content_type: content_type_annot
+
+
+class ImageFinalizeForm(BaseModel):
+    filename: uploaded_filename_annot
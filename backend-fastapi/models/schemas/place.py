@@ -6,7 +6,7 @@ from config import settings
 from lib.pydantic_ import BaseSearchSchema, FieldMeta, HttpFilters
 from lib.types_ import FileToUpload, PaginatedData, PaginatedDict, SearchQuery
 
-from .common import created_at_annot
+from .common import created_at_annot, image_variants_annot
 
 # --- Fields ----
 
@@ -87,6 +87,15 @@ location_meta = FieldMeta(
 )
 location_annot = Annotated[Location, location_meta.info]
 
+text_meta = FieldMeta(
+    min_length=1,
+    description="Full text search in the title, description and address",
+    examples=["chelsea stadium"],
+    filter_examples=['search:"football club" -rugby'],
+    is_text_search=True,
+)
+text_annot = Annotated[str, text_meta.info]
+
 
 # --- Selectables, Serchables, Sortables ----
 
@@ -97,6 +106,7 @@ PlaceSelectableFields = Literal[
     "address",
     "location",
     "image_url",
+    "image_variants",
     "creator_id",
     "created_at",
 ]
@@ -110,6 +120,7 @@ PlaceSearchableFields = Literal[
     "location_lat",
     "location_lng",
     "created_at",
+    "text",
 ]
 
 PlaceSortableFields = Literal[
@@ -121,6 +132,8 @@ PlaceSortableFields = Literal[
     "-description",
     "address",
     "-address",
+    "rank",
+    "-rank",
 ]
 
 
@@ -202,28 +215,46 @@ class PlaceReadSchema(BaseModel):
     address: address_annot
     location: Location | None = None
     image_url: image_url_annot | None = None
+    image_variants: image_variants_annot | None = None
     creator_id: creator_id_annot
     created_at: created_at_annot
 
 
+class PlaceSemanticReadSchema(PlaceReadSchema):
+    similarity: Annotated[
+        float,
+        Field(
+            description="Cosine similarity with the query, 1 is the closest",
+            examples=[0.82],
+        ),
+    ]
+
+
 # --- Update Schemas ---
 
 
-class PlaceUpdateSchema(BaseModel):
+class PlacePutSchema(BaseModel):
     title: title_annot | None = None
     description: description_annot | None = None
     address: address_annot | None = None
     location: Location | None = None
 
 
-class PlacePutSchema(PlaceUpdateSchema):
-    pass
+class PlaceUpdateSchema(PlacePutSchema):
+    # Only set by the upload finalization, not by put forms
+    image_url: image_url_annot | None = None
+    # Only set by the image variants task and when the image is replaced
+    image_variants: image_variants_annot | None = None
 
 
 # --- Query Schemas ---
 
 PlacesPaginatedSchema = PaginatedData[PlaceReadSchema] | PaginatedDict
 
+PlacesSemanticPaginatedSchema = (
+    PaginatedData[PlaceSemanticReadSchema] | PaginatedDict
+)
+
 
 class PlaceSearchSchema(
     BaseSearchSchema[
@@ -257,8 +288,24 @@ class PlaceSearchSchema(
     location_lat: HttpFilters[lat_annot]
     location_lng: HttpFilters[lng_annot]
     created_at: HttpFilters[created_at_annot]
+    text: HttpFilters[text_annot]
 
 
 PlaceSearchQuery = SearchQuery[
     PlaceSelectableFields, PlaceSortableFields, PlaceSearchableFields
 ]
+
+
+class PlaceSemanticSchema(PlaceSearchSchema):
+    """Results are sorted by similarity, sort and cursor are ignored"""
+
+    QUERY_PARAMS = (*PlaceSearchSchema.QUERY_PARAMS, "q")
+
+    q: Annotated[
+        str,
+        Field(
+            min_length=1,
+            description="The text to search places for",
+            examples=["football stadium in London"],
+        ),
+    ]
@@ -6,7 +6,7 @@ from config import settings
 from lib.pydantic_ import BaseSearchSchema, FieldMeta, HttpFilters
 from lib.types_ import FileToUpload, PaginatedData, PaginatedDict, SearchQuery
 
-from .common import created_at_annot
+from .common import created_at_annot, image_variants_annot
 
 # --- Fields ----
 
@@ -69,7 +69,14 @@ places_annot = Annotated[list[UserPlace], places_meta.info]
 # --- Selectables, Serchables, Sortables ----
 
 UserSelectableFields = Literal[
-    "id", "name", "email", "is_admin", "image_url", "places", "created_at"
+    "id",
+    "name",
+    "email",
+    "is_admin",
+    "image_url",
+    "image_variants",
+    "places",
+    "created_at",
 ]
 
 UserSearchableFields = Literal["id", "name", "email", "created_at"]
@@ -143,6 +150,7 @@ class UserReadSchema(BaseModel):
     email: email_annot
     is_admin: is_admin_annot
     image_url: image_url_annot | None = None
+    image_variants: image_variants_annot | None = None
     places: places_annot
     created_at: created_at_annot
 
@@ -150,14 +158,17 @@ class UserReadSchema(BaseModel):
 # --- Update Schemas ---
 
 
-class UserUpdateSchema(BaseModel):
+class UserPutSchema(BaseModel):
     name: name_annot | None = None
     email: email_annot | None = None
     password: password_annot | None = None
 
 
-class UserPutSchema(UserUpdateSchema):
-    pass
+class UserUpdateSchema(UserPutSchema):
+    # Only set by the upload finalization, not by put forms
+    image_url: image_url_annot | None = None
+    # Only set by the image variants task and when the image is replaced
+    image_variants: image_variants_annot | None = None
 
 
 # --- Search Schemas ---
@@ -1,16 +1,22 @@
 from config import settings
 from lib.clients import (
+    CachedEmbedder,
+    CachedEmbedderConfig,
     CloudStorage,
     CloudStorageConfig,
+    Embedder,
+    HashingEmbedder,
     HuggingFaceClient,
     HuggingFaceClientConfig,
+    OnnxEmbedder,
+    OnnxEmbedderConfig,
     PgClient,
     PgClientConfig,
     RedisClient,
     RedisClientConfig,
 )
 
-pg_config = PgClientConfig(uri=settings.pg_url)
+pg_config = PgClientConfig(uri=settings.pg_url, vector=True)
 
 pg_client = PgClient(pg_config)
 
@@ -28,6 +34,11 @@ storage_config = CloudStorageConfig(
     credentials_file=settings.GOOGLE_APPLICATION_CREDENTIALS,
     emulator_public_url=settings.GCS_EMULATOR_PUBLIC_URL,
     emulator_private_url=settings.GCS_EMULATOR_PRIVATE_URL,
+    cache=redis_client,
+    http_backend=settings.GCS_HTTP_BACKEND,
+    max_concurrency=settings.GCS_MAX_CONCURRENCY,
+    timeout=settings.DEFAULT_TIMEOUT,
+    content_addressed=settings.GCS_CONTENT_ADDRESSED,
 )
 cloud_storage = CloudStorage(storage_config)
 
@@ -35,3 +46,26 @@ hf_config = HuggingFaceClientConfig(
     token=settings.HF_API_TOKEN, timeout=settings.DEFAULT_TIMEOUT
 )
 hf_client = HuggingFaceClient(hf_config)
+
+
+def create_embedder() -> Embedder:
+    """Tests embed locally, without network or model files"""
+    backend = "hashing" if settings.is_test else settings.EMBEDDING_BACKEND
+    if backend == "hashing":
+        return HashingEmbedder()
+    if backend == "onnx":
+        onnx_config = OnnxEmbedderConfig(
+            model_path=settings.EMBEDDING_MODEL_PATH,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            threads=settings.EMBEDDING_THREADS,
+        )
+        return OnnxEmbedder(onnx_config)
+    return hf_client
+
+
+embedder_config = CachedEmbedderConfig(
+    cache=redis_client,
+    expiration=settings.EMBEDDING_CACHE_EXPIRATION,
+    local_size=settings.EMBEDDING_CACHE_SIZE,
+)
+embedder = CachedEmbedder(create_embedder(), embedder_config)
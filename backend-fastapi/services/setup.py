@@ -1,23 +1,29 @@
 import asyncio
 
 from background.publishers import publisher
+from models.cruds import listen_user_invalidations
 from models.examples import dump_db, seed_db
-from services.instances import pg_client, redis_client
+from services.instances import cloud_storage, pg_client, redis_client
 
 
 async def connect_dbs() -> None:
     # when updating this, dont forget to update connect_dbs
     # in tasks/broker.py. This method was duplicated there
     # to avoid circular imports or complicated code reorganization
-    await asyncio.gather(pg_client.connect(), redis_client.connect())
+    await asyncio.gather(
+        pg_client.connect(), redis_client.connect(), cloud_storage.connect()
+    )
 
 
 async def close_dbs() -> None:
-    await asyncio.gather(pg_client.close(), redis_client.close())
+    await asyncio.gather(
+        pg_client.close(), redis_client.close(), cloud_storage.close()
+    )
 
 
 async def start_all() -> None:
     await connect_dbs()
+    listen_user_invalidations()
     publisher.start()
 
 
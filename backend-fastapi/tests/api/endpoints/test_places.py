@@ -1,11 +1,24 @@
 from http import HTTPStatus
+import json
 
 from conftest import Helpers
+import httpx
 import pytest
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.cruds import CrudsPlace
-from models.schemas import PlaceSearchQuery
+from lib.types_ import FileToUpload, WhereFilters
+from models.cruds import CrudsPlace, PlaceOptions
+from models.orm import Place
+from models.schemas import (
+    Location,
+    PlaceCreateSchema,
+    PlaceSearchableFields,
+    PlaceSearchQuery,
+    PlaceSelectableFields,
+    PlaceUpdateSchema,
+)
+from services.instances import cloud_storage
 from static import get_image_path
 
 
@@ -53,6 +66,257 @@ async def test_search_places(helpers: Helpers):
     )
 
 
+@pytest.mark.asyncio
+async def test_paginate_places_total_count(
+    helpers: Helpers, db_session: AsyncSession
+):
+    cruds = CrudsPlace(db_session)
+    where: WhereFilters[PlaceSearchableFields] = {
+        "title": [{"op": "ilike", "val": "%a%"}]
+    }
+    exact = await cruds.count(PlaceSearchQuery(where=where))
+    assert exact > 1
+
+    headers = dict(Authorization=helpers.admin_token)
+    params = dict(title="ilike:%a%", size="1", count="exact", fields="title")
+    response = await helpers.client.get(
+        "/api/places/", params=params, headers=headers
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    # The window count of the page query matches an exact count
+    assert len(data["data"]) == 1
+    assert data["total_count"] == exact
+    assert data["total_pages"] == exact
+
+    # No row carries the window count past the last page
+    response = await helpers.client.get(
+        "/api/places/",
+        params=dict(params, page=str(exact + 1)),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["data"] == []
+    assert data["total_count"] == exact
+
+    response = await helpers.client.get(
+        "/api/places/",
+        params=dict(params, title="eq:No such place anywhere"),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["data"] == []
+    assert data["total_count"] == 0
+
+
+class _CrudsPlaceOrm(CrudsPlace):
+    # Its own class, the cached statements are keyed by the class
+    COLUMNS_FAST_PATH = False
+
+
+@pytest.mark.asyncio
+async def test_columns_fast_path_matches_orm(
+    helpers: Helpers, db_session: AsyncSession
+):
+    columns = CrudsPlace(db_session)
+    orm = _CrudsPlaceOrm(db_session)
+    # Searching without the records cache, through _get_partial_page
+    columns.cache = orm.cache = None
+    place_id = await _get_place_id(db_session)
+    fields_cases: list[list[PlaceSelectableFields] | None] = [
+        None,
+        ["title"],
+        ["location", "creator_id", "created_at"],
+    ]
+
+    for fields in fields_cases:
+        select = fields or columns.default_select
+        assert columns.select_columns(select) is not None
+
+        query = PlaceSearchQuery(size=5, select=fields, orderby=["title"])
+        fast = await columns.paginate(query)
+        slow = await orm.paginate(query)
+        assert fast.data == slow.data
+        for row in fast.data:
+            # The id is always selected
+            assert set(row) == {"id", *select}
+
+        options = PlaceOptions(process=False, fields=fields)
+        fast_one = await columns.user_get_partial(
+            helpers.admin, place_id, options
+        )
+        slow_one = await orm.user_get_partial(helpers.admin, place_id, options)
+        assert fast_one == slow_one
+
+    query = PlaceSearchQuery(size=5, orderby=["title"])
+    assert await columns.search(query) == await orm.search(query)
+
+
+@pytest.mark.asyncio
+async def test_get_places_with_cursor(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/?size=1&sort=title&fields=title", headers=headers
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["data"][0]["title"] == "Cobham Training Facility"
+    assert data["next_cursor"] is not None
+
+    response = await helpers.client.get(
+        "/api/places/",
+        params=dict(size=1, sort="title", cursor=data["next_cursor"]),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["data"][0]["title"] == "Stamford Bridge"
+
+
+@pytest.mark.asyncio
+async def test_get_places_with_invalid_cursor(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/?cursor=not_a_cursor", headers=headers
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_places_without_count(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/?count=none", headers=headers
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["total_count"] is None
+    assert data["total_pages"] is None
+    assert len(data["data"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_text_search_places(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/",
+        params=dict(text="search:chelsea", sort="-rank", fields="title"),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    titles = {place["title"] for place in data["data"]}
+    assert titles == {"Stamford Bridge", "Cobham Training Facility"}
+
+    response = await helpers.client.get(
+        "/api/places/",
+        params=dict(text="search:chelsea -stadium", fields="title"),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert [place["title"] for place in data["data"]] == [
+        "Cobham Training Facility"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rank_places_without_text_search(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/?sort=-rank", headers=headers
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_semantic_search_places(helpers: Helpers):
+    # The seeded places belong to the admin
+    headers = dict(Authorization=helpers.admin_token)
+    response = await helpers.client.get(
+        "/api/places/semantic",
+        params=dict(q="football stadium", size=5, fields="title"),
+        headers=headers,
+    )
+    data = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert data["page"] == 1
+    assert data["total_count"] is None
+    assert len(data["data"]) > 0
+    for place in data["data"]:
+        assert set(place) == {"id", "title", "similarity"}
+    similarities = [place["similarity"] for place in data["data"]]
+    assert similarities == sorted(similarities, reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_semantic_search_places_too_deep(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/places/semantic",
+        params=dict(q="football stadium", page=100, size=100),
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_update_embeddings_bulk_round_trip(
+    helpers: Helpers, db_session: AsyncSession
+):
+    cruds = CrudsPlace(db_session)
+    stmt = select(Place.id, Place.embedding).order_by(Place.id)
+    original = (await db_session.execute(stmt)).all()
+    dimensions = Place.embedding.type.dim
+
+    # Exact in float32, the storage type of pgvector
+    written = {
+        row.id: [(i % 64 - 32) / 64 + row.id for i in range(dimensions)]
+        for row in original
+    }
+    await cruds.update_embeddings_bulk(list(written.items()))
+    read = {row.id: row.embedding for row in await db_session.execute(stmt)}
+    assert read == written
+
+    # The dimension is checked by postgres on the binary values too
+    with pytest.raises(Exception, match="dimensions"):
+        await cruds.update_embeddings_bulk([(original[0].id, [1.0, 2.0])])
+    await db_session.rollback()
+
+    # The semantic search tests expect the seeded embeddings
+    await cruds.update_embeddings_bulk(
+        [(row.id, row.embedding) for row in original]
+    )
+
+
+@pytest.mark.asyncio
+async def test_export_places_ndjson(helpers: Helpers):
+    headers = dict(Authorization=helpers.admin_token)
+    response = await helpers.client.get(
+        "/api/places/export/ndjson?fields=title", headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    titles = {row["title"] for row in rows}
+    assert titles == {"Stamford Bridge", "Cobham Training Facility"}
+
+
+@pytest.mark.asyncio
+async def test_export_places_csv(helpers: Helpers):
+    headers = dict(Authorization=helpers.admin_token)
+    response = await helpers.client.get(
+        "/api/places/export/csv?title=eq:Stamford%20Bridge&fields=title",
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.OK
+    lines = response.text.splitlines()
+    assert lines[0] == "title,id"
+    assert lines[1].startswith("Stamford Bridge,")
+
+
 @pytest.mark.asyncio
 async def test_create_place(helpers: Helpers):
     with open(get_image_path("place1.jpg"), "rb") as image:
@@ -82,6 +346,124 @@ async def test_create_place(helpers: Helpers):
     assert data["address"] == "Somewhere over the rainbow"
 
 
+@pytest.mark.asyncio
+async def test_create_places_bulk(helpers: Helpers, db_session: AsyncSession):
+    valid = dict(
+        creator_id=helpers.admin.id,
+        description="A brand new bulk place",
+        title="Brand New Bulk Place",
+        address="Somewhere over the rainbow",
+        lat=1.0,
+        lng=2.5,
+    )
+    invalid = dict(valid, title="Too short")
+    body = "\n".join(json.dumps(row) for row in [valid, invalid, valid])
+    headers = {
+        "Authorization": helpers.admin_token,
+        "Content-Type": "application/x-ndjson",
+    }
+    response = await helpers.client.post(
+        "/api/places/bulk", content=body, headers=headers
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    results = data["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["id"] is not None
+    assert results[1]["id"] is None
+    assert results[1]["error"]["message"] == "Invalid row"
+
+    # Other tests expect the seeded places only
+    cruds = CrudsPlace(db_session)
+    ids = [r["id"] for r in results if r["id"] is not None]
+    assert await cruds.delete_where({"id": cruds.in_(ids)}) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_places_bulk_malformed_json_item(
+    helpers: Helpers, db_session: AsyncSession
+):
+    valid = dict(
+        creator_id=helpers.admin.id,
+        description="A brand new bulk place",
+        title="Brand New Bulk Place",
+        address="Somewhere over the rainbow",
+        lat=1.0,
+        lng=2.5,
+    )
+    row = json.dumps(valid)
+    body = f'[{row}, {{"title": "Broken",, "lat": 1}}, {row}]'
+    response = await helpers.client.post(
+        "/api/places/bulk",
+        content=body,
+        headers={"Authorization": helpers.admin_token},
+    )
+
+    # The malformed item does not abort the rows around it
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    results = data["results"]
+    assert results[1]["error"]["message"] == "Invalid item"
+
+    cruds = CrudsPlace(db_session)
+    ids = [r["id"] for r in results if r["id"] is not None]
+    assert await cruds.delete_where({"id": cruds.in_(ids)}) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_places_bulk_belonging_to_others(helpers: Helpers):
+    row = dict(
+        creator_id=helpers.admin.id,
+        description="A brand new bulk place",
+        title="Brand New Bulk Place",
+        address="Somewhere over the rainbow",
+        lat=1.0,
+        lng=2.5,
+    )
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.post(
+        "/api/places/bulk", json=[row], headers=headers
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert data["created"] == 0
+    assert data["failed"] == 1
+    assert data["results"][0]["error"]["message"] == "Access denied"
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_places_where(
+    helpers: Helpers, db_session: AsyncSession
+):
+    cruds = CrudsPlace(db_session)
+    cruds.WRITE_CHUNK_SIZE = 1
+    place = PlaceCreateSchema(
+        creator_id=helpers.admin.id,
+        description="A place written in bulk",
+        title="Bulk Written Place",
+        address="Somewhere over the rainbow",
+        location=Location(lat=1.0, lng=2.5),
+    )
+    await cruds.create_many([place, place])
+    where: WhereFilters[PlaceSearchableFields] = {
+        "title": cruds.eq("Bulk Written Place")
+    }
+
+    data = PlaceUpdateSchema(address="Somewhere under the rainbow")
+    assert await cruds.update_where(where, data) == 2
+    places = await cruds.search(PlaceSearchQuery(size=10, where=where))
+    assert {p.address for p in places} == {"Somewhere under the rainbow"}
+
+    assert await cruds.delete_where(where) == 2
+    assert not await cruds.exists(where)
+
+
 @pytest.mark.asyncio
 async def test_create_place_belonging_to_others(helpers: Helpers):
     with open(get_image_path("place1.jpg"), "rb") as image:
@@ -116,6 +498,21 @@ async def test_get_place_by_id(helpers: Helpers, db_session: AsyncSession):
     assert data["description"] == "Chelsea FC Stadium"
 
 
+@pytest.mark.asyncio
+async def test_get_place_partial_by_id(
+    helpers: Helpers, db_session: AsyncSession
+):
+    place_id = await _get_place_id(db_session)
+    headers = dict(Authorization=helpers.user_token)
+    for _ in range(2):
+        # The second call is served from the record cache
+        response = await helpers.client.get(
+            f"/api/places/{place_id}?fields=title", headers=headers
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == dict(id=place_id, title="Stamford Bridge")
+
+
 @pytest.mark.asyncio
 async def test_update_place(helpers: Helpers, db_session: AsyncSession):
     place_id = await _get_place_id(db_session)
@@ -131,6 +528,78 @@ async def test_update_place(helpers: Helpers, db_session: AsyncSession):
     assert data["description"] == "Stamford Bridge - Home of the Blues"
 
 
+@pytest.mark.asyncio
+async def test_upload_place_image_to_bucket(
+    helpers: Helpers, db_session: AsyncSession
+):
+    place_id = await _get_place_id(db_session)
+    headers = dict(Authorization=helpers.admin_token)
+    form = dict(filename="place1.jpg", content_type="image/jpeg")
+    response = await helpers.client.post(
+        f"/api/places/{place_id}/image/upload-url", json=form, headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    upload = response.json()
+    assert upload["filename"].startswith(f"places/{place_id}/place1_")
+
+    # The client sends the file straight to the bucket
+    with open(get_image_path("place1.jpg"), "rb") as image:
+        async with httpx.AsyncClient() as client:
+            response = await client.request(
+                upload["method"],
+                upload["url"],
+                content=image.read(),
+                headers=upload["headers"],
+            )
+    assert response.is_success
+
+    form = dict(filename=upload["filename"])
+    response = await helpers.client.post(
+        f"/api/places/{place_id}/image", json=form, headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["image_url"]
+
+
+@pytest.mark.asyncio
+async def test_finalize_place_image_not_issued(
+    helpers: Helpers, db_session: AsyncSession
+):
+    place_id = await _get_place_id(db_session)
+    headers = dict(Authorization=helpers.admin_token)
+    form = dict(filename="users/1/avatar.jpg")
+    response = await helpers.client.post(
+        f"/api/places/{place_id}/image", json=form, headers=headers
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_finalize_place_image_not_uploaded_or_not_image(
+    helpers: Helpers, db_session: AsyncSession
+):
+    place_id = await _get_place_id(db_session)
+    headers = dict(Authorization=helpers.admin_token)
+
+    # Under the prefix of the place, but never uploaded
+    form = dict(filename=f"places/{place_id}/never_uploaded.jpg")
+    response = await helpers.client.post(
+        f"/api/places/{place_id}/image", json=form, headers=headers
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    filename = f"places/{place_id}/not_an_image.jpg"
+    file = FileToUpload(filename, "text/html", buffer=b"<html></html>")
+    await cloud_storage.backend.upload(filename, file)
+    response = await helpers.client.post(
+        f"/api/places/{place_id}/image",
+        json=dict(filename=filename),
+        headers=headers,
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    await cloud_storage.delete_file_async(filename)
+
+
 @pytest.mark.asyncio
 async def test_update_place_belonging_to_others(
     helpers: Helpers, db_session: AsyncSession
@@ -113,6 +113,43 @@ async def test_users_cannot_update_others(helpers: Helpers):
     assert response.status_code == HTTPStatus.UNAUTHORIZED
 
 
+@pytest.mark.asyncio
+async def test_updated_user_leaves_the_cache(helpers: Helpers):
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/hello-world/user", headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    data = dict(name="Slim Beji")
+    response = await helpers.client.put(
+        f"/api/users/{helpers.user.id}", json=data, headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+
+    response = await helpers.client.get(
+        "/api/hello-world/user", headers=headers
+    )
+    assert response.json()["message"] == "Hello Slim Beji!"
+
+
+@pytest.mark.asyncio
+async def test_user_cache_stats(helpers: Helpers):
+    headers = dict(Authorization=helpers.admin_token)
+    response = await helpers.client.get(
+        "/api/users/cache-stats", headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    data = response.json()
+    assert data["hits"] + data["misses"] >= 1
+
+    headers = dict(Authorization=helpers.user_token)
+    response = await helpers.client.get(
+        "/api/users/cache-stats", headers=headers
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
 @pytest.mark.asyncio
 async def test_delete_user_as_non_admin(helpers: Helpers):
     headers = dict(Authorization=helpers.user_token)
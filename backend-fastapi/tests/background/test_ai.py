@@ -0,0 +1,81 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+
+from background.handlers.ai import EmbeddingBatcher
+from lib.types_ import ApiError
+
+
+class FakeEmbedder:
+    def __init__(self, missing: set[int] | None = None) -> None:
+        self.calls: list[list[int]] = []
+        self.missing = missing or set()
+
+    async def __call__(self, place_ids: list[int]) -> dict[int, list[float]]:
+        self.calls.append(place_ids)
+        return {
+            place_id: [float(place_id)]
+            for place_id in place_ids
+            if place_id not in self.missing
+        }
+
+
+@pytest.mark.asyncio
+async def test_batcher_coalesces_within_window():
+    embed = FakeEmbedder()
+    batcher = EmbeddingBatcher(embed, max_size=10, window=0.01)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in [1, 2, 3]))
+
+    assert results == [[1.0], [2.0], [3.0]]
+    assert embed.calls == [[1, 2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_at_max_size():
+    embed = FakeEmbedder()
+    # The window would time the test out, only the size can flush
+    batcher = EmbeddingBatcher(embed, max_size=2, window=60)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit(1), batcher.submit(2)), timeout=1
+    )
+
+    assert results == [[1.0], [2.0]]
+    assert embed.calls == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_after_window():
+    embed = FakeEmbedder()
+    batcher = EmbeddingBatcher(embed, max_size=10, window=0.01)
+
+    assert await asyncio.wait_for(batcher.submit(1), timeout=1) == [1.0]
+    assert await asyncio.wait_for(batcher.submit(2), timeout=1) == [2.0]
+    assert embed.calls == [[1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_duplicate_ids():
+    embed = FakeEmbedder()
+    batcher = EmbeddingBatcher(embed, max_size=10, window=0.01)
+
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(1))
+
+    assert results == [[1.0], [1.0]]
+    assert embed.calls == [[1]]
+
+
+@pytest.mark.asyncio
+async def test_batcher_missing_id():
+    embed = FakeEmbedder(missing={2})
+    batcher = EmbeddingBatcher(embed, max_size=10, window=0.01)
+
+    found, missing = await asyncio.gather(
+        batcher.submit(1), batcher.submit(2), return_exceptions=True
+    )
+
+    assert found == [1.0]
+    assert isinstance(missing, ApiError)
+    assert missing.code == HTTPStatus.NOT_FOUND
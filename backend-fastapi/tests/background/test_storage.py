@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+from conftest import Helpers
+import pytest
+
+from background.bgconfig import DeleteFilesData
+from background.handlers.storage import delete_files_task
+from lib.types_ import FileToUpload
+from models.cruds import CrudsPlace
+from models.cruds.utils import lock_files
+from models.schemas import Location, PlaceCreateSchema
+from services.instances import cloud_storage, pg_client
+
+
+@pytest.mark.asyncio
+async def test_delete_files_waits_for_reusing_upload(helpers: Helpers):
+    filename = f"sha256/test_{uuid.uuid4().hex}.txt"
+    file = FileToUpload(filename, "text/plain", buffer=b"shared content")
+    await cloud_storage.backend.upload(filename, file)
+
+    async with pg_client.session() as session:
+        cruds = CrudsPlace(session)
+        # An upload finding the file already stored, before its insert
+        await lock_files(session, [filename], shared=True)
+        assert await cloud_storage.file_exists_async(filename)
+
+        # The deletion of the previous reference is waiting for the lock
+        payload = DeleteFilesData(filenames=[filename])
+        task = asyncio.create_task(delete_files_task(payload))
+        await asyncio.sleep(0.5)
+        assert not task.done()
+
+        id_ = await cruds.create(
+            PlaceCreateSchema(
+                title="Shared image place",
+                description="A place reusing a stored image",
+                address="Fulham Road, London",
+                location=Location(lat=51.48, lng=-0.19),
+                image_url=filename,
+                creator_id=helpers.admin.id,
+            )
+        )
+
+    # The reference was committed before the references check
+    await task
+    assert await cloud_storage.file_exists_async(filename)
+
+    async with pg_client.session() as session:
+        await CrudsPlace(session).delete(id_)
+    await delete_files_task(payload)
+    assert not await cloud_storage.file_exists_async(filename)
@@ -0,0 +1,23 @@
+import time
+
+from lib.utils import LocalCache
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache[str](maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+    assert cache.stats() == dict(hits=3, misses=1, size=2)
+
+
+def test_local_cache_expires_values():
+    cache = LocalCache[str](maxsize=2, ttl=0.01)
+    cache.set(1, "a")
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert len(cache) == 0
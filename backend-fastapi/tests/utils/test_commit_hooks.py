@@ -0,0 +1,129 @@
+import pytest
+
+from models.cruds import CrudsPlace, CrudsUser
+from models.cruds.place import PlaceDeleteContext, PlaceUpdateContext
+from models.cruds.user import UserCreateContext
+from models.schemas import PlaceUpdateSchema, UserCreateSchema
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.events: list[str] = []
+
+    async def commit(self) -> None:
+        self.events.append("commit")
+
+    async def rollback(self) -> None:
+        self.events.append("rollback")
+
+
+@pytest.mark.asyncio
+async def test_commit_hooks_run_after_commit():
+    session = FakeSession()
+    cruds = CrudsPlace(session)  # type: ignore[arg-type]
+
+    async def invalidate() -> None:
+        session.events.append("invalidate")
+
+    cruds.on_commit(lambda: session.events.append("publish"))
+    cruds.on_commit(invalidate)
+    assert session.events == []
+
+    await session.commit()
+    await cruds.run_commit_hooks()
+    assert session.events == ["commit", "publish", "invalidate"]
+
+    # Hooks run once
+    await cruds.run_commit_hooks()
+    assert len(session.events) == 3
+
+
+@pytest.mark.asyncio
+async def test_commit_hooks_dropped_on_rollback():
+    session = FakeSession()
+    cruds = CrudsPlace(session)  # type: ignore[arg-type]
+
+    cruds.on_commit(lambda: session.events.append("publish"))
+    await cruds.rollback()
+    await cruds.run_commit_hooks()
+    assert session.events == ["rollback"]
+
+
+@pytest.mark.asyncio
+async def test_image_jobs_published_after_commit(monkeypatch):
+    published = []
+
+    def image_variants(table: str, id_: int, image_url: str | None) -> None:
+        published.append((table, id_, image_url))
+
+    monkeypatch.setattr("models.cruds.place.image_variants", image_variants)
+    monkeypatch.setattr("models.cruds.user.image_variants", image_variants)
+
+    places = CrudsPlace(FakeSession())  # type: ignore[arg-type]
+    context = PlaceUpdateContext(
+        trigger_embedding=False, image_url="old.png", image_variants={}
+    )
+    data = PlaceUpdateSchema(image_url="new.png")
+    await places.after_update(1, data, context)
+
+    users = CrudsUser(FakeSession())  # type: ignore[arg-type]
+    user = UserCreateSchema.model_construct(image_url="user.png")
+    await users.after_create(2, user, UserCreateContext())
+
+    # Nothing is sent for a transaction that may still roll back
+    assert published == []
+    await places.run_commit_hooks()
+    await users.run_commit_hooks()
+    assert published == [("places", 1, "new.png"), ("users", 2, "user.png")]
+
+
+@pytest.mark.asyncio
+async def test_files_deleted_after_commit(monkeypatch):
+    deleted = []
+    monkeypatch.setattr(
+        "models.cruds.place.delete_files", lambda names: deleted.extend(names)
+    )
+
+    places = CrudsPlace(FakeSession())  # type: ignore[arg-type]
+    context = PlaceUpdateContext(
+        trigger_embedding=False,
+        image_url="old.png",
+        image_variants={"small": "old.small.webp"},
+    )
+    await places.after_update(
+        1, PlaceUpdateSchema(image_url="new.png"), context
+    )
+    await places.after_delete(
+        2, PlaceDeleteContext(image_url="gone.png", image_variants={})
+    )
+
+    # A rolled back update or delete keeps its files
+    assert deleted == []
+    await places.rollback()
+    await places.run_commit_hooks()
+    assert deleted == []
+
+    await places.after_delete(
+        2, PlaceDeleteContext(image_url="gone.png", image_variants={})
+    )
+    await places.run_commit_hooks()
+    assert deleted == ["gone.png"]
+
+
+@pytest.mark.asyncio
+async def test_embedding_published_after_update_commit(monkeypatch):
+    published = []
+    monkeypatch.setattr("models.cruds.place.place_embedding", published.append)
+
+    places = CrudsPlace(FakeSession())  # type: ignore[arg-type]
+    context = PlaceUpdateContext(
+        trigger_embedding=True, image_url="", image_variants={}
+    )
+    await places.after_update(
+        1, PlaceUpdateSchema(title="The renamed place"), context
+    )
+
+    # The worker would embed the texts before the update
+    assert published == []
+    await places.run_commit_hooks()
+    assert published == [1]
@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+
+from lib.clients import (
+    CachedEmbedder,
+    CachedEmbedderConfig,
+    HashingEmbedder,
+    RedisClient,
+    RedisClientConfig,
+)
+
+
+def test_hashing_embedder_is_deterministic():
+    embedder = HashingEmbedder()
+    texts = ["Stamford Bridge - Stadium of Chelsea", "Eiffel Tower - Paris"]
+    first = asyncio.run(embedder.embed_texts(texts))
+    second = asyncio.run(embedder.embed_texts(list(reversed(texts))))
+    assert first == list(reversed(second))
+    assert len(first[0]) == 384
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+
+
+def test_hashing_embedder_brings_similar_texts_closer():
+    embedder = HashingEmbedder()
+    query, close, far = asyncio.run(
+        embedder.embed_texts(
+            ["football stadium", "a football stadium in London", "art museum"]
+        )
+    )
+    assert np.dot(query, close) > np.dot(query, far)
+
+
+def test_cached_embedder_keys_and_encoding():
+    redis_client = RedisClient(RedisClientConfig("redis://localhost"))
+    embedder = CachedEmbedder(
+        HashingEmbedder(), CachedEmbedderConfig(redis_client)
+    )
+    assert embedder.cache_key("Some  place\n") == embedder.cache_key(
+        "Some place"
+    )
+    assert embedder.cache_key("Some place") != embedder.cache_key("Other place")
+
+    [embedding] = asyncio.run(embedder.embedder.embed_texts(["Some place"]))
+    raw = embedder.encode(embedding)
+    assert len(raw) == 4 * 384
+    assert embedder.decode(raw) == embedding
+    # Vectors of another size are treated as missing
+    assert embedder.decode(raw[:-4]) is None
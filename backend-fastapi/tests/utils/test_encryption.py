@@ -0,0 +1,52 @@
+import pytest
+
+from lib.utils import (
+    HmacCodec,
+    JoseCodec,
+    JwtError,
+    JwtExpiredError,
+    decode_payload,
+    encode_payload,
+    hash_input_async,
+    hash_pool,
+    verify_hash_async,
+)
+
+SECRET = "secret"
+
+
+def test_jwt_codecs_are_interchangeable():
+    payload = dict(user_id=1, email="mslimbeji@gmail.com")
+    for encoder, decoder in [
+        (JoseCodec(), HmacCodec()),
+        (HmacCodec(), JoseCodec()),
+    ]:
+        token = encode_payload(payload, SECRET, 60, encoder)
+        data = decode_payload(token, SECRET, decoder)
+        assert data["user_id"] == 1
+        assert data["email"] == "mslimbeji@gmail.com"
+
+
+def test_hmac_codec_rejects_invalid_tokens():
+    codec = HmacCodec()
+    token = encode_payload(dict(user_id=1), SECRET, 60, codec)
+    with pytest.raises(JwtError):
+        codec.decode(token, "other secret")
+    with pytest.raises(JwtError):
+        codec.decode(token[:-2], SECRET)
+    with pytest.raises(JwtError):
+        codec.decode("not.a.token", SECRET)
+
+    expired = encode_payload(dict(user_id=1), SECRET, -60, codec)
+    with pytest.raises(JwtExpiredError):
+        codec.decode(expired, SECRET)
+
+
+@pytest.mark.asyncio
+async def test_hash_off_the_event_loop():
+    calls = hash_pool.calls
+    hashed = await hash_input_async("password", 4)
+    assert await verify_hash_async("password", hashed)
+    assert not await verify_hash_async("other", hashed)
+    assert hash_pool.calls == calls + 3
+    assert hash_pool.pending == 0
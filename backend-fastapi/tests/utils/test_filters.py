@@ -0,0 +1,42 @@
+from pydantic import ValidationError
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from lib.sqlalchemy_ import apply_where, where_params, where_shape
+from models.orm import Place
+from models.schemas import PlaceSearchSchema
+
+
+def _sql(where) -> str:
+    stmt = apply_where(
+        select(Place.id), where, lambda field: getattr(Place, field)
+    )
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_eq_none_is_null():
+    where = {"image_url": [{"op": "eq", "val": None}]}
+    assert "places.image_url IS NULL" in _sql(where)
+    assert where_params(where) == {}
+
+    where = {"image_url": [{"op": "ne", "val": None}]}
+    assert "places.image_url IS NOT NULL" in _sql(where)
+
+
+def test_eq_none_has_its_own_shape():
+    none = {"image_url": [{"op": "eq", "val": None}]}
+    value = {"image_url": [{"op": "eq", "val": "a.jpg"}]}
+    assert where_shape(none) != where_shape(value)
+    assert "places.image_url = %(where_image_url_eq_0)s" in _sql(value)
+
+
+def test_search_only_on_the_indexed_vector():
+    where = {"search_vector": [{"op": "search", "val": "chelsea"}]}
+    assert "places.search_vector @@ websearch_to_tsquery" in _sql(where)
+
+    # Plain text columns would be vectorized row by row, unindexed
+    with pytest.raises(ValueError):
+        _sql({"title": [{"op": "search", "val": "chelsea"}]})
+    with pytest.raises(ValidationError):
+        PlaceSearchSchema(title="search:chelsea")
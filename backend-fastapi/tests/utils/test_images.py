@@ -0,0 +1,27 @@
+from io import BytesIO
+
+from PIL import Image
+
+from lib.utils import resize_image
+
+
+def _png(width: int, height: int, mode: str = "RGBA") -> bytes:
+    output = BytesIO()
+    Image.new(mode, (width, height)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_resize_image_keeps_aspect_ratio():
+    resized = resize_image(_png(800, 400), 200, "webp")
+    with Image.open(BytesIO(resized)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (200, 100)
+
+
+def test_resize_image_converts_to_jpeg():
+    resized = resize_image(_png(100, 50), 200, "jpeg")
+    with Image.open(BytesIO(resized)) as image:
+        assert image.format == "JPEG"
+        assert image.mode == "RGB"
+        # Smaller images are not upscaled
+        assert image.size == (100, 50)
@@ -0,0 +1,68 @@
+from datetime import UTC, datetime
+from typing import Any
+
+import pytest
+
+from models.cruds import CrudsPlace
+from models.schemas import PlaceReadSchema
+
+
+class FakeCache:
+    def __init__(self) -> None:
+        self.values: dict[str, Any] = {}
+
+    async def get(self, key: str, format_: str = "") -> Any:
+        return self.values.get(key)
+
+    async def mget(self, keys: list[str], format_: Any = "") -> list:
+        return [self.values.get(key) for key in keys]
+
+    async def set_many(self, values: dict, expiration: int | None) -> None:
+        self.values.update(values)
+
+    async def incr(self, key: str) -> int:
+        value = self.values.get(key, 0) + 1
+        self.values[key] = value
+        return value
+
+
+def _place(title: str) -> PlaceReadSchema:
+    return PlaceReadSchema(
+        id=1,
+        title=title,
+        description="A place to test the records cache",
+        address="Somewhere",
+        creator_id=1,
+        created_at=datetime.now(UTC),
+    )
+
+
+@pytest.mark.asyncio
+async def test_late_fill_does_not_outlive_the_write():
+    cruds = CrudsPlace(None)  # type: ignore[arg-type]
+    cruds.cache = FakeCache()  # type: ignore[assignment]
+    rows = {1: _place("The place before")}
+
+    async def fetch_then_write(ids: list[int]) -> dict:
+        fetched = {id_: rows[id_] for id_ in ids}
+        # A concurrent update commits before the reader fills the cache
+        rows[1] = _place("The place after")
+        await cruds.invalidate_records([1])
+        return fetched
+
+    cruds._fetch_reads = fetch_then_write  # type: ignore[method-assign]
+    [stale] = await cruds.get_many_cached([1])
+    assert stale.title == "The place before"
+
+    async def fetch(ids: list[int]) -> dict:
+        return {id_: rows[id_] for id_ in ids}
+
+    # The stale fill is keyed by the previous write version
+    cruds._fetch_reads = fetch  # type: ignore[method-assign]
+    [fresh] = await cruds.get_many_cached([1])
+    assert fresh.title == "The place after"
+
+    # Cached until the next write
+    rows[1] = _place("The place unseen")
+    [cached] = await cruds.get_many_cached([1])
+    assert cached.title == "The place after"
@@ -0,0 +1,114 @@
+import httpx
+import pytest
+
+from lib.clients.storage import HttpStorageBackend
+from lib.types_ import FileToUpload
+
+
+async def _backend(handler) -> HttpStorageBackend:
+    backend = HttpStorageBackend(
+        "http://storage.test",
+        "bucket",
+        None,
+        transport=httpx.MockTransport(handler),
+    )
+    await backend.connect()
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_delete_many_reports_failures():
+    def handler(request: httpx.Request) -> httpx.Response:
+        name = request.url.path.rsplit("/", 1)[1]
+        if name == "missing.png":
+            return httpx.Response(404)
+        if name == "broken.png":
+            return httpx.Response(503)
+        return httpx.Response(204)
+
+    backend = await _backend(handler)
+    names = ["a.png", "broken.png", "missing.png", "b.png"]
+    # Missing files are already deleted, not failures
+    assert await backend.delete_many(names) == ["broken.png"]
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_stat():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("missing.png"):
+            return httpx.Response(404)
+        return httpx.Response(
+            200, json=dict(size="2048", contentType="image/png")
+        )
+
+    backend = await _backend(handler)
+    stored = await backend.stat("places/1/a.png")
+    assert stored is not None
+    assert (stored.size, stored.content_type) == (2048, "image/png")
+    assert await backend.stat("places/1/missing.png") is None
+    await backend.close()
+
+
+class ResumableServer:
+    """Records the chunks, partial maps a request number to the bytes kept"""
+
+    def __init__(self, partial: dict[int, int] | None = None) -> None:
+        self.content = b""
+        self.ranges: list[str] = []
+        self.partial = partial or {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            assert request.url.params["uploadType"] == "resumable"
+            location = "http://storage.test/upload/session/1"
+            return httpx.Response(200, headers=dict(Location=location))
+
+        content_range = request.headers["Content-Range"]
+        self.ranges.append(content_range)
+        start = int(content_range.split(" ")[1].split("-")[0])
+        assert start == len(self.content)
+
+        body = request.content
+        kept = self.partial.get(len(self.ranges), len(body))
+        self.content += body[:kept]
+        if not content_range.endswith("/*") and kept == len(body):
+            return httpx.Response(200)
+        persisted = f"bytes=0-{len(self.content) - 1}"
+        return httpx.Response(308, headers=dict(Range=persisted))
+
+
+def _file(content: bytes) -> FileToUpload:
+    file = FileToUpload("big.bin", "application/octet-stream", buffer=content)
+    file.CHUNK_SIZE = 4
+    return file
+
+
+@pytest.mark.asyncio
+async def test_upload_chunks_with_last_partial():
+    server = ResumableServer()
+    backend = await _backend(server)
+    await backend.upload("big.bin", _file(b"0123456789"))
+
+    assert server.content == b"0123456789"
+    # The total size is only known with the last chunk
+    assert server.ranges == ["bytes 0-3/*", "bytes 4-7/*", "bytes 8-9/10"]
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_upload_resumes_from_range_header():
+    # Only 2 bytes of the second chunk and 1 of the last one are persisted
+    server = ResumableServer(partial={2: 2, 4: 1})
+    backend = await _backend(server)
+    await backend.upload("big.bin", _file(b"0123456789"))
+
+    assert server.content == b"0123456789"
+    assert server.ranges == [
+        "bytes 0-3/*",
+        "bytes 4-7/*",
+        "bytes 6-7/*",
+        "bytes 8-9/10",
+        "bytes 9-9/10",
+    ]
+    await backend.close()
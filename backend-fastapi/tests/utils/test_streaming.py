@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+import pyarrow as pa
+from pydantic import BaseModel
+import pytest
+
+from lib.fastapi_.streaming import arrow_schema, decode_json_array, encode_arrow
+from lib.types_ import ApiError
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _decode(*chunks: bytes) -> list:
+    return [item async for item in decode_json_array(_chunks(*chunks))]
+
+
+@pytest.mark.asyncio
+async def test_decode_json_array_across_chunks():
+    items = await _decode(b'[{"a": "x,]"}, 1', b".5, [2", b', "}"], "b"]')
+    assert items == [{"a": "x,]"}, 1.5, [2, "}"], "b"]
+
+
+@pytest.mark.asyncio
+async def test_decode_json_array_malformed_items():
+    items = await _decode(
+        b'[{"a": 1}, {"a": 2,, "b": 3}, tru',
+        b'e, nope, {"a": 4}, {"a": ',
+    )
+
+    # The malformed items are reported and the next ones still decoded
+    assert items[0] == {"a": 1}
+    assert items[2] is True
+    assert items[4] == {"a": 4}
+    for index in (1, 3, 5):
+        assert isinstance(items[index], ApiError)
+        assert items[index].code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert items[index].details["index"] == index
+    # The truncated item ends the body
+    assert len(items) == 6
+
+
+class _Row(BaseModel):
+    id: int
+    price: float
+    image_url: str | None
+
+
+@pytest.mark.asyncio
+async def test_encode_arrow_batches_inferring_differently():
+    async def batches():
+        yield [{"id": 1, "price": 1, "image_url": None}]
+        yield [{"id": 2, "price": 2.5, "image_url": "a.png"}]
+
+    schema = arrow_schema(_Row, ["price", "image_url"])
+    body = b"".join([chunk async for chunk in encode_arrow(batches(), schema)])
+    table = pa.ipc.open_stream(body).read_all()
+
+    assert table.schema == schema
+    assert table.to_pylist() == [
+        {"price": 1.0, "image_url": None, "id": 1},
+        {"price": 2.5, "image_url": "a.png", "id": 2},
+    ]
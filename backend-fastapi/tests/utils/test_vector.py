@@ -0,0 +1,20 @@
+from pgvector import Vector
+from sqlalchemy.dialects import postgresql
+
+from lib.sqlalchemy_ import BinaryVector
+
+
+def test_binary_vector_round_trip():
+    vector_type = BinaryVector(3)
+    dialect = postgresql.dialect()
+    bind = vector_type.bind_processor(dialect)
+    result = vector_type.result_processor(dialect, None)
+
+    # Bound as a Vector, for the binary codec registered on asyncpg
+    bound = bind([0.5, -1.25, 3.0])
+    assert isinstance(bound, Vector)
+    assert bind(bound) is bound
+    assert bind(None) is None
+
+    decoded = Vector.from_binary(bound.to_binary())
+    assert result(decoded) == [0.5, -1.25, 3.0]